@@ -0,0 +1,74 @@
+"""
+App-only (client credentials) authentication
+
+Uses the app registration's application permissions instead of a signed-in
+user, so no browser step or teams_tokens.json is needed and one process can
+work across every organizer in a tenant. Calls must then address users
+explicitly ('users/{id}/onlineMeetings/...', the user_id= argument of the
+graph_client helpers).
+
+Requires application permissions OnlineMeetings.Read.All and
+OnlineMeetingTranscript.Read.All with admin consent, plus a Teams application
+access policy granted to the organizers.
+
+Tokens are cached per tenant in memory and reused until shortly before they
+expire.
+"""
+
+import threading
+import time
+
+import graph_client
+from http_resilience import http_request
+from settings import CLIENT_ID, CLIENT_SECRET, TENANT_ID
+
+TOKEN_URL = "https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+APP_SCOPE = "https://graph.microsoft.com/.default"
+
+# Fetch a new token when less than this many seconds are left
+EXPIRY_MARGIN = 300
+
+_tokens = {}  # tenant_id -> (access_token, expires_at)
+_lock = threading.Lock()
+
+
+class AppAuthError(Exception):
+    """The token endpoint refused the client credentials"""
+
+    def __init__(self, tenant_id, payload):
+        self.tenant_id = tenant_id
+        self.payload = payload
+        super().__init__(f"App token request failed for tenant {tenant_id}: {payload}")
+
+
+def request_app_token(tenant_id=TENANT_ID):
+    """Request a fresh app-only token; returns the token response"""
+    response = http_request('POST', TOKEN_URL.format(tenant_id=tenant_id), session=graph_client.session, data={
+        'client_id': CLIENT_ID,
+        'client_secret': CLIENT_SECRET,
+        'scope': APP_SCOPE,
+        'grant_type': 'client_credentials'
+    })
+    token_response = response.json()
+    if 'access_token' not in token_response:
+        raise AppAuthError(tenant_id, token_response)
+    return token_response
+
+
+def get_app_token(tenant_id=TENANT_ID, force_refresh=False):
+    """Cached app-only access token for a tenant"""
+    with _lock:
+        cached = _tokens.get(tenant_id)
+        if cached and not force_refresh and cached[1] - EXPIRY_MARGIN > time.time():
+            return cached[0]
+
+        token_response = request_app_token(tenant_id)
+        access_token = token_response['access_token']
+        _tokens[tenant_id] = (access_token, time.time() + int(token_response.get('expires_in', 3599)))
+        return access_token
+
+
+def clear_app_token(tenant_id=TENANT_ID):
+    """Forget a tenant's cached token, e.g. after a 401"""
+    with _lock:
+        _tokens.pop(tenant_id, None)
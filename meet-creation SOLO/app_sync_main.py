@@ -0,0 +1,118 @@
+"""
+Pull transcripts for many organizers with an app-only token
+
+No browser step: the app authenticates with its client secret (app_auth.py)
+and lists each organizer's transcripts with one paged getAllTranscripts call.
+Organizers are listed in a file, one per line, either "user_id" (TENANT_ID is
+used) or "tenant_id user_id"; or in ORGANIZER_USER_IDS (comma separated).
+
+Listing and downloading run on a thread pool across organizers; saving,
+archiving, indexing and the manifest are handled on the main thread.
+"""
+
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import requests
+
+from app_auth import TENANT_ID, AppAuthError, clear_app_token, get_app_token
+from graph_client import GraphError, iter_organizer_transcripts
+from manifest import is_downloaded, load_manifest, manifest_key
+from postprocess import PostProcessor
+from transcript_download import download_transcript_content, store_downloaded_transcript, transfer_stats
+
+SYNC_DAYS = int(os.getenv("APP_SYNC_DAYS", "7"))
+SYNC_WORKERS = int(os.getenv("APP_SYNC_WORKERS", "8"))
+
+
+def read_organizers(path=None):
+    """[(tenant_id, user_id)] from a file or ORGANIZER_USER_IDS"""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [line.split() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        lines = [[user_id.strip()] for user_id in os.getenv("ORGANIZER_USER_IDS", "").split(',') if user_id.strip()]
+    return [(parts[0], parts[1]) if len(parts) > 1 else (TENANT_ID, parts[0]) for parts in lines]
+
+
+def fetch_organizer_transcripts(tenant_id, user_id, since, manifest):
+    """List one organizer's transcripts and download those not in the manifest
+
+    Returns [(transcript, content)]. Runs on a worker thread.
+    """
+    for attempt in range(2):
+        access_token = get_app_token(tenant_id)
+        try:
+            transcripts = list(iter_organizer_transcripts(access_token, user_id, start=since))
+            break
+        except GraphError as e:
+            if e.status_code == 401 and attempt == 0:
+                clear_app_token(tenant_id)
+                continue
+            raise
+
+    downloads = []
+    for transcript in transcripts:
+        if is_downloaded(manifest.get(manifest_key(transcript.meeting_id, transcript.id))):
+            continue
+        content = download_transcript_content(access_token, transcript.meeting_id, transcript.id, user_id=user_id)
+        if content:
+            downloads.append((transcript, content))
+    return downloads
+
+
+def sync_organizers(organizers, days=SYNC_DAYS, max_workers=SYNC_WORKERS):
+    """Download new transcripts for every organizer; returns the number saved"""
+    since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    manifest = load_manifest()
+    saved = 0
+
+    with PostProcessor() as post_processor, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_organizer_transcripts, tenant_id, user_id, since, manifest): user_id
+            for tenant_id, user_id in organizers
+        }
+        for future in as_completed(futures):
+            user_id = futures[future]
+            try:
+                downloads = future.result()
+            except (GraphError, AppAuthError, requests.RequestException) as e:
+                # Connection errors and open circuit breakers skip this organizer, not the whole sync
+                print(f"❌ {user_id}: {e}")
+                continue
+
+            if downloads:
+                print(f"\n{user_id}: {len(downloads)} new transcript(s)")
+            for transcript, content in downloads:
+                try:
+                    if store_downloaded_transcript(content, transcript.meeting_id, transcript.id,
+                                                   transcript.created or 'Unknown', post_processor):
+                        saved += 1
+                except sqlite3.Error as e:
+                    # Not in the manifest yet, so the next run picks it up again
+                    print(f"❌ {transcript.id[:30]}...: {e}")
+
+        if post_processor.pending:
+            print(f"\nWaiting for {len(post_processor.pending)} conversion(s) to TXT/JSON/SRT...")
+
+    return saved
+
+
+def main():
+    organizers = read_organizers(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not organizers:
+        print("No organizers given: pass a file (one user id per line) or set ORGANIZER_USER_IDS")
+        return
+
+    print(f"Syncing transcripts from the last {SYNC_DAYS} day(s) for {len(organizers)} organizer(s)...")
+    saved = sync_organizers(organizers)
+    print(f"\nApp-only sync complete: {saved} new transcript(s) saved")
+    if transfer_stats.summary():
+        print(f"Downloaded {transfer_stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Attendance report and call record export
+
+Pages through every meeting's attendanceReports and their attendanceRecords
+(and, with --call-records, the tenant's call records, which need an app-only
+token with CallRecords.Read.All) on a thread pool, through the shared Graph
+session and a RateBudget like the sharded poller's. Works the way the
+transcript pull does: fetched rows are appended to JSON Lines files under
+exports/ and recorded in exports/manifest.jsonl, so an interrupted export
+resumes and a re-run only fetches reports it has not seen.
+
+Each run then rebuilds the columnar tables from those rows, all keyed by
+meeting_id:
+
+- attendance_records - one row per attendee per report
+- call_records - one row per call record matched to a meeting by join URL
+- meetings - one row per meeting joining catalog details, attendance totals,
+  call records and downloaded transcripts
+
+Tables are written as Parquet when pyarrow is installed, CSV otherwise.
+
+    python attendance_export.py                     # catalog meetings of the last EXPORT_DAYS days
+    python attendance_export.py <refs...> | @file   # meeting ids, join ids or join URLs
+    python attendance_export.py --call-records ...
+"""
+
+import csv
+import json
+import os
+import sys
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+import requests
+
+from app_auth import AppAuthError, get_app_token
+from delegated_auth import DELEGATED_SCOPE, current_access_token
+from graph_client import (GraphError, get_online_meeting, iter_attendance_records, iter_attendance_reports,
+                          iter_call_records)
+from manifest import MANIFEST_PATH, load_manifest, manifest_key, record_entry
+from meeting_catalog import MeetingCatalog, normalize_time
+from meeting_resolver import resolve_meeting_ids
+from poller_shards import RateBudget
+from settings import TENANT_ID
+
+EXPORT_DIR = 'exports'
+EXPORT_DAYS = int(os.getenv("EXPORT_DAYS", "30"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "8"))
+# Graph calls per second across all export threads
+EXPORT_RATE = float(os.getenv("EXPORT_RATE", "10"))
+ATTENDANCE_SCOPE = 'https://graph.microsoft.com/OnlineMeetingArtifact.Read.All'
+
+ATTENDANCE_COLUMNS = ('meeting_id', 'report_id', 'meeting_start', 'meeting_end', 'participants', 'record_id',
+                      'email', 'display_name', 'user_id', 'role', 'total_seconds', 'first_join', 'last_leave',
+                      'intervals')
+CALL_RECORD_COLUMNS = ('meeting_id', 'call_record_id', 'start', 'end', 'type', 'modalities', 'organizer_id')
+MEETING_COLUMNS = ('meeting_id', 'subject', 'start', 'end', 'join_url', 'reports', 'attendees',
+                   'attendance_seconds', 'call_records', 'call_start', 'call_end', 'transcripts')
+
+
+def export_paths(out_dir=EXPORT_DIR):
+    return {
+        'manifest': os.path.join(out_dir, 'manifest.jsonl'),
+        'attendance': os.path.join(out_dir, 'attendance_records.jsonl'),
+        'call_records': os.path.join(out_dir, 'call_records.jsonl'),
+    }
+
+
+def _normalize_join_url(join_url):
+    # Call records and meetings do not always encode the join URL the same way
+    return urllib.parse.unquote(join_url or '').split('?')[0].rstrip('/').lower()
+
+
+def fetch_meeting_attendance(access_token, meeting_id, exported, budget, user_id=None):
+    """Attendance rows of the reports not exported yet; runs on a worker thread
+
+    Returns {report_id: [row]}.
+    """
+    new_reports = {}
+    for report in iter_attendance_reports(access_token, meeting_id, user_id=user_id, budget=budget):
+        if manifest_key(meeting_id, report.id) in exported:
+            continue
+        new_reports[report.id] = [{
+            'meeting_id': meeting_id,
+            'report_id': report.id,
+            'meeting_start': report.start,
+            'meeting_end': report.end,
+            'participants': report.participants,
+            'record_id': record.id,
+            'email': record.email,
+            'display_name': record.display_name,
+            'user_id': record.user_id,
+            'role': record.role,
+            'total_seconds': record.total_seconds,
+            'first_join': record.first_join,
+            'last_leave': record.last_leave,
+            'intervals': record.intervals,
+        } for record in iter_attendance_records(access_token, meeting_id, report.id, user_id=user_id,
+                                                 budget=budget)]
+    return new_reports
+
+
+def fetch_call_records(app_token, join_urls, since, budget):
+    """Call records of the meetings, matched by join URL (join_urls: normalized join URL -> meeting_id)"""
+    rows = []
+    for record in iter_call_records(app_token, since, budget=budget):
+        meeting_id = join_urls.get(_normalize_join_url(record.join_url))
+        if meeting_id:
+            rows.append({
+                'meeting_id': meeting_id,
+                'call_record_id': record.id,
+                'start': record.start,
+                'end': record.end,
+                'type': record.type,
+                'modalities': record.modalities,
+                'organizer_id': record.organizer_id,
+            })
+    return rows
+
+
+def _append_rows(path, rows):
+    with open(path, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+
+
+def _read_rows(path):
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted run
+                continue
+    return rows
+
+
+def write_table(rows, columns, path_base):
+    """Write rows as Parquet (with pyarrow) or CSV; returns the file written"""
+    if pyarrow is not None:
+        table = pyarrow.table({column: [row.get(column) for row in rows] for column in columns})
+        path = f"{path_base}.parquet"
+        pyarrow.parquet.write_table(table, path)
+        return path
+
+    path = f"{path_base}.csv"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def _unique_rows(rows, key_columns):
+    """Last row per key (a report re-exported after a lost manifest line is not counted twice)"""
+    return list({tuple(row.get(column) for column in key_columns): row for row in rows}.values())
+
+
+def build_tables(meetings, out_dir=EXPORT_DIR):
+    """Rebuild the columnar tables from every row exported so far; returns the files"""
+    paths = export_paths(out_dir)
+    attendance = _unique_rows(_read_rows(paths['attendance']), ('meeting_id', 'report_id', 'record_id'))
+    call_records = _unique_rows(_read_rows(paths['call_records']), ('meeting_id', 'call_record_id'))
+    transcripts = load_manifest(MANIFEST_PATH)
+
+    summary = {meeting['meeting_id']: {
+        'meeting_id': meeting['meeting_id'], 'subject': meeting.get('subject'), 'start': meeting.get('start_time'),
+        'end': meeting.get('end_time'), 'join_url': meeting.get('join_url'), 'reports': set(), 'attendees': set(),
+        'attendance_seconds': 0, 'call_records': 0, 'call_start': None, 'call_end': None, 'transcripts': 0
+    } for meeting in meetings}
+    for row in attendance:
+        meeting = summary.get(row['meeting_id'])
+        if meeting:
+            meeting['reports'].add(row['report_id'])
+            meeting['attendees'].add(row['email'] or row['user_id'] or row['display_name'])
+            meeting['attendance_seconds'] += row['total_seconds'] or 0
+    for row in call_records:
+        meeting = summary.get(row['meeting_id'])
+        if meeting:
+            meeting['call_records'] += 1
+            meeting['call_start'] = min(filter(None, (meeting['call_start'], row['start'])), default=None)
+            meeting['call_end'] = max(filter(None, (meeting['call_end'], row['end'])), default=None)
+    for entry in transcripts.values():
+        meeting = summary.get(entry.get('meeting_id'))
+        if meeting and entry.get('file'):
+            meeting['transcripts'] += 1
+    for meeting in summary.values():
+        meeting['reports'] = len(meeting['reports'])
+        meeting['attendees'] = len(meeting['attendees'])
+
+    return [
+        write_table(attendance, ATTENDANCE_COLUMNS, os.path.join(out_dir, 'attendance_records')),
+        write_table(call_records, CALL_RECORD_COLUMNS, os.path.join(out_dir, 'call_records')),
+        write_table(list(summary.values()), MEETING_COLUMNS, os.path.join(out_dir, 'meetings')),
+    ]
+
+
+def export_attendance(access_token, meetings, out_dir=EXPORT_DIR, workers=EXPORT_WORKERS, rate=EXPORT_RATE,
+                      call_records=False, tenant_id=TENANT_ID, user_id=None):
+    """Export attendance (and optionally call records) for catalog-style meeting dicts
+
+    Returns (attendance rows written, call record rows written, table files).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = export_paths(out_dir)
+    exported = load_manifest(paths['manifest'])
+    budget = RateBudget(rate)
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_meeting_attendance, access_token, meeting['meeting_id'], exported, budget, user_id):
+                meeting['meeting_id']
+            for meeting in meetings
+        }
+        for future in as_completed(futures):
+            meeting_id = futures[future]
+            try:
+                new_reports = future.result()
+            except GraphError as e:
+                print(f"❌ {meeting_id[:20]}...: attendance not available (Status: {e.status_code})")
+                continue
+            except requests.RequestException as e:
+                # Connection errors and an open breaker skip this meeting; the rest is still exported
+                print(f"❌ {meeting_id[:20]}...: attendance not fetched ({e})")
+                continue
+            # Rows first, then the manifest: a crash in between re-exports (deduplicated), never loses
+            for report_id, rows in new_reports.items():
+                _append_rows(paths['attendance'], rows)
+                record_entry(meeting_id, report_id, path=paths['manifest'], rows=len(rows))
+                written += len(rows)
+            if new_reports:
+                print(f"✅ {meeting_id[:20]}...: {len(new_reports)} new report(s)")
+
+    call_rows = 0
+    if call_records:
+        call_rows = export_call_records(meetings, exported, paths, budget, tenant_id)
+
+    return written, call_rows, build_tables(meetings, out_dir)
+
+
+def export_call_records(meetings, exported, paths, budget, tenant_id=TENANT_ID):
+    """Append call records of the meetings not exported yet; returns the number written"""
+    join_urls = {_normalize_join_url(meeting['join_url']): meeting['meeting_id']
+                 for meeting in meetings if meeting.get('join_url')}
+    starts = [normalize_time(meeting['start_time']) for meeting in meetings if meeting.get('start_time')]
+    if not join_urls or not starts:
+        return 0
+    # Call records are listed by start time; allow for meetings that began early
+    since = (datetime.strptime(min(starts), "%Y-%m-%dT%H:%M:%SZ") - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    try:
+        rows = fetch_call_records(get_app_token(tenant_id), join_urls, since, budget)
+    except (AppAuthError, GraphError, requests.RequestException) as e:
+        print(f"⚠️  Call records skipped: {e}")
+        return 0
+
+    new_rows = [row for row in rows
+                if manifest_key(row['meeting_id'], f"callRecord:{row['call_record_id']}") not in exported]
+    _append_rows(paths['call_records'], new_rows)
+    for row in new_rows:
+        record_entry(row['meeting_id'], f"callRecord:{row['call_record_id']}", path=paths['manifest'])
+    return len(new_rows)
+
+
+def meetings_to_export(access_token, references, days=EXPORT_DAYS):
+    """Catalog-style meeting dicts for the given references, or recent catalog meetings"""
+    with MeetingCatalog() as catalog:
+        if not references:
+            return catalog.meetings_between(datetime.utcnow() - timedelta(days=days), datetime.utcnow())
+
+        resolved = resolve_meeting_ids(access_token, references)
+        meetings = []
+        for reference in references:
+            meeting_id = resolved[reference]
+            if not meeting_id:
+                print(f"❌ No meeting found for {reference}")
+                continue
+            row = catalog.get(meeting_id)
+            if row is None:
+                # Not created here: the join URL (for call records) comes from Graph
+                try:
+                    meeting = get_online_meeting(access_token, meeting_id)
+                    row = {'meeting_id': meeting_id, 'subject': meeting.subject, 'start_time': meeting.start,
+                           'end_time': meeting.end, 'join_url': meeting.join_url}
+                except GraphError:
+                    row = {'meeting_id': meeting_id}
+            meetings.append(row)
+    return list({meeting['meeting_id']: meeting for meeting in meetings}.values())
+
+
+def main():
+    references = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(references) == 1 and references[0].startswith('@'):
+        with open(references[0][1:], 'r', encoding='utf-8') as f:
+            references = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    access_token = current_access_token(scope=f"{DELEGATED_SCOPE} {ATTENDANCE_SCOPE}")
+    if not access_token:
+        return
+
+    meetings = meetings_to_export(access_token, references)
+    if not meetings:
+        print("No meetings to export")
+        return
+
+    print(f"Exporting attendance for {len(meetings)} meeting(s)...")
+    written, call_rows, files = export_attendance(access_token, meetings, call_records='--call-records' in sys.argv)
+    print(f"\nExport complete: {written} new attendance row(s), {call_rows} new call record(s)")
+    for path in files:
+        print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,27 @@
-import requests
-import base64
-import hashlib
 import secrets
-import json
 import os
+import sys
+import webbrowser
 from urllib.parse import urlencode, parse_qs, urlparse
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from delegated_auth import save_token_file
+from http_resilience import http_request
+from oauth_loopback import LoopbackAuthServer, generate_pkce, is_loopback
+from settings import CLIENT_ID, CLIENT_SECRET, TOKEN_FILE
+from token_store import TOKEN_STORE_PATH, TokenStore
 
 # 'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 REDIRECT_URI = os.getenv("REDIRECT_URI", "http://localhost:8000/api/plugins/teams/code")
+SCOPE = 'OnlineMeetings.ReadWrite User.Read'
+# Seconds to wait for users to finish signing in
+AUTH_TIMEOUT = int(os.getenv("AUTH_TIMEOUT", "600"))
 
 def get_user_info(access_token):
     """Get user information using access token"""
     try:
-        user_response = requests.get('https://graph.microsoft.com/v1.0/me', 
+        user_response = http_request('GET', 'https://graph.microsoft.com/v1.0/me', 
                                    headers={'Authorization': f'Bearer {access_token}'})
         if user_response.status_code == 200:
             user_data = user_response.json()
@@ -32,18 +33,31 @@ def get_user_info(access_token):
         print(f"Error getting user info: {e}")
         return None, None, None
 
-def main():
-    code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-    code_challenge = base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode()).digest()).decode('utf-8').rstrip('=')
+def save_single_user(token_response, user_info):
+    """Write the signed-in user's tokens to teams_tokens.json (read by the other scripts)"""
+    complete_data = {
+        'tokens': token_response,
+        'user_info': user_info,
+        'created_at': datetime.utcnow().isoformat()
+    }
+    
+    save_token_file(complete_data)
+    print(f"\nTokens and user info saved to {TOKEN_FILE}")
+    return complete_data
+
+def paste_redirect_flow():
+    """Sign in by pasting the redirect URL (when REDIRECT_URI is not on this machine)"""
+    code_verifier, code_challenge = generate_pkce()
+    state = secrets.token_urlsafe(24)
     
     params = {
         'client_id': CLIENT_ID,
         'response_type': 'code',
         'redirect_uri': REDIRECT_URI,
-        'scope': 'OnlineMeetings.ReadWrite User.Read',
+        'scope': SCOPE,
         'code_challenge': code_challenge,
         'code_challenge_method': 'S256',
-        'state': '27112000'
+        'state': state
     }
     
     auth_url = "https://login.microsoftonline.com/common/oauth2/v2.0/authorize?" + urlencode(params)
@@ -52,8 +66,11 @@ def main():
     redirect_url = input("\nPaste the full redirect URL you got (or just the authorization code): ").strip()
     
     if redirect_url.startswith('http'):
-        parsed = urlparse(redirect_url)
-        auth_code = parse_qs(parsed.query)['code'][0]
+        query = parse_qs(urlparse(redirect_url).query)
+        if query.get('state', [state])[0] != state:
+            print("State mismatch: this redirect belongs to a different sign-in")
+            return None
+        auth_code = query['code'][0]
     else:
         auth_code = redirect_url
     
@@ -61,48 +78,88 @@ def main():
     data = {
         'client_id': CLIENT_ID,
         'client_secret': CLIENT_SECRET,
-        'scope': 'OnlineMeetings.ReadWrite User.Read',
+        'scope': SCOPE,
         'code': auth_code,
         'redirect_uri': REDIRECT_URI,
         'grant_type': 'authorization_code',
         'code_verifier': code_verifier
     }
     
-    response = requests.post(token_url, data=data)
+    response = http_request('POST', token_url, data=data)
     token_response = response.json()
     
     if 'access_token' not in token_response:
         print("\nError getting tokens:")
         print(token_response)
-        return token_response
-    
-    access_token = token_response['access_token']
-    user_id, display_name, email = get_user_info(access_token)
+        return None
     
+    user_id, display_name, email = get_user_info(token_response['access_token'])
     if not user_id:
         print("Failed to get user information")
-        return
+        return None
+    
+    user_info = {'id': user_id, 'displayName': display_name, 'email': email}
+    TokenStore().save(user_info, token_response)
+    return {'tokens': token_response, 'user_info': user_info}
+
+def onboard_users(login_hints, timeout=AUTH_TIMEOUT):
+    """Sign in several users at once through the loopback callback server
+
+    Prints one sign-in URL per user. The redirect goes to localhost, so each URL
+    must be opened in a browser on this machine (use a private window per user
+    so sessions don't mix); every completed sign-in is stored in the token
+    store. Returns the finished results.
+    """
+    with LoopbackAuthServer(CLIENT_ID, CLIENT_SECRET, REDIRECT_URI, SCOPE) as server:
+        states = {}
+        for login_hint in login_hints:
+            state, auth_url = server.begin(login_hint=login_hint)
+            states[state] = login_hint
+            print(f"\n{login_hint or 'Sign-in'}: {auth_url}")
+        
+        if len(states) == 1:
+            webbrowser.open(auth_url)
+        
+        print(f"\nWaiting up to {timeout // 60} minutes for {len(states)} sign-in(s) on {REDIRECT_URI}...")
+        results = server.wait(list(states), timeout=timeout)
     
-    print(f"\nUser authenticated: {display_name} ({email})")
-    print(f"User ID: {user_id}")
+    completed = []
+    for state, (result, error) in results.items():
+        if result:
+            user_info = result['user_info']
+            print(f"✅ {user_info['displayName']} ({user_info['email']})")
+            completed.append(result)
+        else:
+            print(f"❌ {states[state] or 'Sign-in'}: {error}")
+    return completed
+
+def main():
+    # python auth.py users.txt -> onboard everyone listed (one email per line)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            login_hints = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        completed = onboard_users(login_hints)
+        print(f"\n{len(completed)}/{len(login_hints)} user(s) onboarded into {TOKEN_STORE_PATH}")
+        return completed
     
-    complete_data = {
-        'tokens': token_response,
-        'user_info': {
-            'id': user_id,
-            'displayName': display_name,
-            'email': email
-        },
-        'created_at': datetime.utcnow().isoformat()
-    }
+    if is_loopback(REDIRECT_URI):
+        completed = onboard_users([None])
+        result = completed[0] if completed else None
+    else:
+        result = paste_redirect_flow()
+    
+    if not result:
+        return
+    
+    user_info = result['user_info']
+    print(f"\nUser authenticated: {user_info['displayName']} ({user_info['email']})")
+    print(f"User ID: {user_info['id']}")
     
-    with open('teams_tokens.json', 'w') as f:
-        json.dump(complete_data, f, indent=2)
-    print("\nTokens and user info saved to teams_tokens.json")
+    complete_data = save_single_user(result['tokens'], user_info)
     
     print("\n" + "="*50)
     print("APP INSTALLATION COMPLETE!")
-    print(f"User: {display_name}")
+    print(f"User: {user_info['displayName']}")
     print("Ready to create meetings with transcript subscriptions!")
     print("="*50)
     
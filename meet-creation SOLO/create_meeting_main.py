@@ -1,52 +1,19 @@
-import requests
-import json
-import os
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-def refresh_access_token():
-    """Refresh access token using saved refresh token"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            data['tokens'] = new_tokens
-            with open('teams_tokens.json', 'w') as f:
-                json.dump(data, f, indent=2)
-            print("Tokens refreshed and saved")
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-            
-    except FileNotFoundError:
-        print("teams_tokens.json not found. Run the auth script first.")
-        return None
+import graph_client
+from delegated_auth import refresh_access_token
+from graph_client import MissingScopeError, require_permission
+from graph_models import OnlineMeeting
+from http_resilience import http_request
+from meeting_catalog import record_created_meeting
 
 def create_teams_meeting(access_token, subject="Test Meeting"):
     """Create Teams meeting with access token"""
     url = "https://graph.microsoft.com/v1.0/me/onlineMeetings"
+    try:
+        require_permission(access_token, 'meetings_write', url)
+    except MissingScopeError as e:
+        return e.status_code, e.payload
     
     start_time = datetime.utcnow() + timedelta(minutes=5)
     end_time = start_time + timedelta(hours=1)
@@ -65,11 +32,19 @@ def create_teams_meeting(access_token, subject="Test Meeting"):
         "recordAutomatically": True
     }
     
-    response = requests.post(url, json=data, headers=headers)
-    return response.status_code, response.json()
+    response = http_request('POST', url, session=graph_client.session, json=data, headers=headers)
+    meeting_data = response.json()
+    
+    # Remember the meeting locally so the poller and puller can find it
+    if response.status_code == 201:
+        record_created_meeting(OnlineMeeting.from_graph(meeting_data))
+    
+    return response.status_code, meeting_data
 
 def main():
-    access_token = refresh_access_token()
+    # Both hosts' connections in parallel, before the token refresh needs the first
+    graph_client.prewarm()
+    access_token = refresh_access_token(verbose=True)
     if not access_token:
         return
     
@@ -77,12 +52,14 @@ def main():
     status_code, meeting_data = create_teams_meeting(access_token, subject)
     
     if status_code == 201:
+        meeting = OnlineMeeting.from_graph(meeting_data)
         print("Meeting created successfully!")
-        print(f"Join URL: {meeting_data.get('joinWebUrl', 'N/A')}")
-        print(f"Meeting ID: {meeting_data.get('id', 'N/A')}")
-        print(f"Join Meeting ID: {meeting_data.get('joinMeetingIdSettings', {}).get('joinMeetingId', 'N/A')}")
+        print(f"Join URL: {meeting.join_url or 'N/A'}")
+        print(f"Meeting ID: {meeting.id or 'N/A'}")
+        print(f"Join Meeting ID: {meeting.join_meeting_id or 'N/A'}")
         print("\nNote: Recording and transcription will start automatically when you join the meeting.")
         print("Use the transcript puller script after the meeting to download the transcript.")
+        print("The meeting was added to the local catalog (meetings.db), so the puller and poller can find it.")
     else:
         print(f"Failed to create meeting (Status: {status_code})")
         print(meeting_data)
@@ -0,0 +1,95 @@
+"""
+Delegated (signed-in user) access tokens
+
+auth.py saves the signed-in user's tokens to teams_tokens.json; every script
+and CLI command gets a fresh access token from the saved refresh token with
+refresh_access_token(). The rotated tokens are written back by replacing the
+file, so processes refreshing at the same time (poller shards, job workers)
+never read a half-written file.
+
+current_access_token() returns the saved access token as long as its claims
+(token_claims.py) show it has the requested scopes and more than
+EXPIRY_MARGIN seconds left, and refreshes only otherwise - long-running
+workers and pollers skip a token endpoint round trip per job or cycle.
+"""
+
+import json
+import os
+import time
+
+import requests
+
+import graph_client
+from http_resilience import http_request
+from settings import CLIENT_ID, CLIENT_SECRET, TOKEN_FILE
+from token_claims import expires_at, grants_scope
+
+TOKEN_URL = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
+DELEGATED_SCOPE = ('https://graph.microsoft.com/OnlineMeetings.ReadWrite '
+                   'https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access')
+# Refresh a saved access token with less than this many seconds left
+EXPIRY_MARGIN = 300
+
+
+def load_token_file(path=TOKEN_FILE):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_token_file(data, path=TOKEN_FILE):
+    """Write teams_tokens.json atomically"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def refresh_access_token(scope=DELEGATED_SCOPE, path=TOKEN_FILE, verbose=False):
+    """Fresh access token from the saved refresh token; None (with a message) on failure"""
+    try:
+        data = load_token_file(path)
+    except FileNotFoundError:
+        print(f"{path} not found. Run the auth script first.")
+        return None
+
+    try:
+        refresh_token = data['tokens']['refresh_token']
+        response = http_request('POST', TOKEN_URL, session=graph_client.session, data={
+            'client_id': CLIENT_ID,
+            'client_secret': CLIENT_SECRET,
+            'scope': scope,
+            'refresh_token': refresh_token,
+            'grant_type': 'refresh_token'
+        })
+        new_tokens = response.json()
+    except (KeyError, ValueError, requests.RequestException) as e:
+        print(f"Error refreshing access token: {e}")
+        return None
+
+    if 'access_token' not in new_tokens:
+        print("Failed to refresh token:", new_tokens)
+        return None
+
+    # Keep user_info and subscription; a response without a new refresh token keeps the old one
+    new_tokens.setdefault('refresh_token', refresh_token)
+    # For tokens whose exp claim cannot be read
+    new_tokens['expires_at'] = int(time.time()) + int(new_tokens.get('expires_in', 3599))
+    data['tokens'] = new_tokens
+    save_token_file(data, path)
+    if verbose:
+        print("Tokens refreshed and saved")
+    return new_tokens['access_token']
+
+
+def current_access_token(scope=DELEGATED_SCOPE, path=TOKEN_FILE, margin=EXPIRY_MARGIN):
+    """The saved access token while it has the scopes and time left, otherwise a refreshed one"""
+    try:
+        tokens = load_token_file(path).get('tokens', {})
+    except (FileNotFoundError, ValueError):
+        tokens = {}
+    access_token = tokens.get('access_token')
+    if access_token:
+        expires = expires_at(access_token) or tokens.get('expires_at')
+        if expires and expires - time.time() > margin and grants_scope(access_token, scope):
+            return access_token
+    return refresh_access_token(scope, path)
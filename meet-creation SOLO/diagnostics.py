@@ -0,0 +1,237 @@
+"""
+Concurrent diagnostics with a time budget
+
+The scripts in utils/ each get their own token and run their checks one after
+another, which takes minutes on a large account. This runs the independent
+checks at the same time, with one access token and the shared Graph session,
+and stops waiting when the budget (DIAG_BUDGET seconds) is spent:
+
+- token - scopes, roles and expiry read from the token's claims (no request)
+- subscriptions - consolidated/per-meeting transcript subscriptions, expiry,
+  notification URL, and whether each is in the clientState registry
+- webhook - the ngrok tunnel (local admin API) and a validation round trip to
+  WEBHOOK_BASE_URL/teams/webhook, the same GET Graph makes
+- tenant - organization access and whether the latest meeting allows transcription
+- transcripts/<meeting id> - transcript count for each of the DIAG_MEETINGS
+  most recent catalog meetings, one check per meeting
+
+Each check reports 'ok', 'warn', 'fail', 'skipped' or 'timeout' (still
+running when the budget ran out), with its details and elapsed time. The
+report is JSON, on stdout or in the --out file, and the run exits with 1
+when any check failed or timed out.
+
+    python diagnostics.py [--budget SECONDS] [--meetings N] [--out report.json]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+import graph_client
+from delegated_auth import current_access_token
+from graph_client import GraphError, get_online_meeting, graph_get, iter_transcripts
+from http_resilience import http_request
+from meeting_catalog import MeetingCatalog, normalize_time
+from settings import WEBHOOK_BASE_URL
+from subscriptions import list_transcript_subscriptions
+from token_claims import PERMISSIONS, token_claims
+
+DIAG_BUDGET = float(os.getenv("DIAG_BUDGET", "20"))
+DIAG_MEETINGS = int(os.getenv("DIAG_MEETINGS", "10"))
+NGROK_API = "http://localhost:4040/api/tunnels"
+# Webhook and ngrok checks give up well inside the budget
+PROBE_TIMEOUT = (3, 5)
+# Permission kinds the transcript tools cannot work without
+REQUIRED_PERMISSIONS = ('meetings_read', 'transcripts')
+
+OK = 'ok'
+WARN = 'warn'
+FAIL = 'fail'
+SKIPPED = 'skipped'
+TIMEOUT = 'timeout'
+# Worst first, for the overall status
+SEVERITY = (FAIL, TIMEOUT, WARN, SKIPPED, OK)
+
+
+def check_token(access_token):
+    claims = token_claims(access_token)
+    if claims is None:
+        return WARN, {'error': "Token is not a JWT; permissions cannot be read locally"}
+    missing = {kind: list(accepted) for kind, accepted in PERMISSIONS.items() if not claims.grants_any(accepted)}
+    status = OK
+    if missing:
+        status = FAIL if any(kind in missing for kind in REQUIRED_PERMISSIONS) else WARN
+    return status, {
+        'scopes': sorted(claims.scopes),
+        'roles': sorted(claims.roles),
+        'tenant_id': claims.tenant_id,
+        'expires_in_seconds': int(claims.expires_in()),
+        'missing': missing,
+    }
+
+
+def check_subscriptions(access_token):
+    consolidated, per_meeting = list_transcript_subscriptions(access_token)
+    soon = normalize_time(datetime.utcnow() + timedelta(hours=1))
+    problems = []
+    subscriptions = []
+    with MeetingCatalog() as catalog:
+        for sub in consolidated + per_meeting:
+            expires = normalize_time(sub.get('expirationDateTime'))
+            registered = catalog.subscription_client_state(sub['id']) is not None
+            if expires and expires < soon:
+                problems.append(f"{sub['id']} expires at {expires}")
+            if not (sub.get('notificationUrl') or '').startswith(WEBHOOK_BASE_URL):
+                problems.append(f"{sub['id']} notifies {sub.get('notificationUrl')}, not WEBHOOK_BASE_URL")
+            if not registered:
+                problems.append(f"{sub['id']} is not in the clientState registry; its notifications are dropped")
+            subscriptions.append({'id': sub['id'], 'resource': sub.get('resource'), 'expires': expires,
+                                  'registered': registered})
+    if not consolidated:
+        problems.append("No user-level getAllTranscripts subscription (run subscription_manager.py)")
+    details = {'consolidated': len(consolidated), 'per_meeting': len(per_meeting),
+               'subscriptions': subscriptions, 'problems': problems}
+    return (WARN if problems else OK), details
+
+
+def check_webhook():
+    details = {'webhook_url': f"{WEBHOOK_BASE_URL}/teams/webhook"}
+    try:
+        tunnels = requests.get(NGROK_API, timeout=PROBE_TIMEOUT).json().get('tunnels', [])
+        details['ngrok_tunnels'] = [tunnel.get('public_url') for tunnel in tunnels]
+        details['ngrok_matches'] = any(WEBHOOK_BASE_URL.rstrip('/') == (tunnel.get('public_url') or '').rstrip('/')
+                                       for tunnel in tunnels)
+    except (requests.RequestException, ValueError):
+        details['ngrok_tunnels'] = None
+
+    # Graph validates a notification URL by expecting the token echoed back
+    probe = f"diagnostics-{int(time.time())}"
+    try:
+        response = http_request('GET', details['webhook_url'], endpoint='webhook', timeout=PROBE_TIMEOUT,
+                                params={'validationToken': probe})
+    except requests.RequestException as e:
+        details['error'] = str(e)
+        return FAIL, details
+    details['status_code'] = response.status_code
+    details['echoes_validation_token'] = response.status_code == 200 and response.text == probe
+    if not details['echoes_validation_token']:
+        return FAIL, details
+    return (WARN if details.get('ngrok_matches') is False else OK), details
+
+
+def check_tenant(access_token, meeting_id=None):
+    organization = graph_get(access_token, "organization", select=('id', 'displayName'))
+    details = {'organization': [org.get('displayName') for org in organization.get('value', [])]}
+    if not meeting_id:
+        return OK, details
+    meeting = get_online_meeting(access_token, meeting_id)
+    details['latest_meeting'] = meeting_id
+    details['allow_transcription'] = meeting.allow_transcription
+    # Teams leaves it unset when the tenant's meeting policy decides
+    if meeting.allow_transcription is False:
+        return WARN, details
+    return OK, details
+
+
+def check_meeting_transcripts(access_token, meeting):
+    transcripts = list(iter_transcripts(access_token, meeting['meeting_id'], use_cache=False))
+    details = {'subject': meeting.get('subject'), 'end_time': meeting.get('end_time'),
+               'catalog_state': meeting.get('transcript_state'), 'transcripts': len(transcripts),
+               'latest_transcript': max((t.created or '' for t in transcripts), default=None)}
+    ended = normalize_time(meeting.get('end_time'))
+    # Transcripts can take 15 minutes after a meeting ends to appear
+    if not transcripts and ended and ended < normalize_time(datetime.utcnow() - timedelta(minutes=15)):
+        return WARN, details
+    return OK, details
+
+
+def _run_check(check, args, result):
+    started = time.monotonic()
+    try:
+        status, details = check(*args)
+    except GraphError as e:
+        status, details = FAIL, {'status_code': e.status_code, 'error': e.payload, 'url': e.url}
+    except Exception as e:
+        status, details = FAIL, {'error': f"{type(e).__name__}: {e}"}
+    result.update(details, status=status, elapsed_ms=round((time.monotonic() - started) * 1000))
+
+
+def run_checks(checks, budget=DIAG_BUDGET):
+    """Run {name: (check, args)} on daemon threads; returns {name: result} once all finish or budget runs out
+
+    Threads still running at the deadline are left behind (they are daemons, so
+    they do not hold up exit) and reported as 'timeout'.
+    """
+    deadline = time.monotonic() + budget
+    results = {name: {} for name in checks}
+    threads = {}
+    for name, (check, args) in checks.items():
+        thread = threading.Thread(target=_run_check, args=(check, args, results[name]), name=f"diag-{name}",
+                                  daemon=True)
+        thread.start()
+        threads[name] = thread
+
+    for name, thread in threads.items():
+        thread.join(max(deadline - time.monotonic(), 0))
+        if thread.is_alive():
+            results[name] = {'status': TIMEOUT, 'elapsed_ms': round(budget * 1000)}
+    return results
+
+
+def diagnose(budget=DIAG_BUDGET, meeting_limit=DIAG_MEETINGS, access_token=None):
+    """Run every check within budget seconds and return the report"""
+    started = time.monotonic()
+    generated_at = datetime.utcnow().isoformat() + 'Z'
+    with MeetingCatalog() as catalog:
+        meetings = catalog.latest(meeting_limit)
+
+    checks = {'webhook': (check_webhook, ())}
+    access_token = access_token or current_access_token()
+    if access_token:
+        checks['token'] = (check_token, (access_token,))
+        checks['subscriptions'] = (check_subscriptions, (access_token,))
+        checks['tenant'] = (check_tenant, (access_token, meetings[0]['meeting_id'] if meetings else None))
+        for meeting in meetings:
+            checks[f"transcripts/{meeting['meeting_id']}"] = (check_meeting_transcripts, (access_token, meeting))
+
+    results = run_checks(checks, max(budget - (time.monotonic() - started), 0))
+    if not access_token:
+        results['token'] = {'status': FAIL, 'error': "No access token (run auth.py)"}
+        for name in ('subscriptions', 'tenant'):
+            results[name] = {'status': SKIPPED, 'reason': "no access token"}
+
+    statuses = {result['status'] for result in results.values()}
+    return {
+        'generated_at': generated_at,
+        'status': next(status for status in SEVERITY if status in statuses),
+        'budget_seconds': budget,
+        'elapsed_ms': round((time.monotonic() - started) * 1000),
+        'checks': results,
+    }
+
+
+def main():
+    args = sys.argv[1:]
+    budget = float(args[args.index('--budget') + 1]) if '--budget' in args else DIAG_BUDGET
+    meeting_limit = int(args[args.index('--meetings') + 1]) if '--meetings' in args else DIAG_MEETINGS
+
+    graph_client.prewarm()
+    report = diagnose(budget, meeting_limit)
+    output = json.dumps(report, indent=2, default=str)
+    if '--out' in args:
+        with open(args[args.index('--out') + 1], 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"Diagnostics {report['status']} in {report['elapsed_ms']} ms, report in {args[args.index('--out') + 1]}")
+    else:
+        print(output)
+    if report['status'] in (FAIL, TIMEOUT):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,25 @@
-import requests
 import base64
 import hashlib
 import secrets
-import json
 import os
 from urllib.parse import urlencode, parse_qs, urlparse
+import sys
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delegated_auth import save_token_file
+from graph_client import GraphError
+from http_resilience import http_request
+from settings import CLIENT_ID, CLIENT_SECRET, WEBHOOK_BASE_URL
+from subscriptions import migrate_meeting_subscriptions
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 REDIRECT_URI = os.getenv("REDIRECT_URI", "http://localhost:8000/api/plugins/teams/code")
-WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "https://your-webhook-url.ngrok-free.app")
 
 def get_user_info(access_token):
     """Get user information using access token"""
     try:
-        user_response = requests.get('https://graph.microsoft.com/v1.0/me', 
+        user_response = http_request('GET', 'https://graph.microsoft.com/v1.0/me', 
                                    headers={'Authorization': f'Bearer {access_token}'})
         if user_response.status_code == 200:
             user_data = user_response.json()
@@ -32,40 +32,28 @@ def get_user_info(access_token):
         return None, None, None
 
 def create_transcript_subscription(access_token, user_id):
-    """Create subscription for user's meeting transcripts"""
+    """Create (or reuse) the user's single subscription covering all meeting transcripts"""
     try:
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        
-        # Subscription expires in 3 days for transcript subscriptions
-        expiration_time = (datetime.utcnow() + timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
-        
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        # Lists the subscriptions once, ensures the user's one and folds per-meeting ones into it
+        result = migrate_meeting_subscriptions(
+            access_token, user_id,
+            notification_url=f"{WEBHOOK_BASE_URL}/teams/webhook",
+            lifecycle_url=f"{WEBHOOK_BASE_URL}/teams/lifecycle"
+        )
+        subscription_data = result['subscription']
+        print("SUCCESS: Transcript subscription ready!")
+        print(f"Subscription ID: {subscription_data.get('id')}")
+        print(f"Expires: {subscription_data.get('expirationDateTime')}")
         
-        data = {
-            "changeType": "created",
-            "notificationUrl": f"{WEBHOOK_BASE_URL}/teams/webhook",
-            "lifecycleNotificationUrl": f"{WEBHOOK_BASE_URL}/teams/lifecycle",
-            "resource": f"users/{user_id}/onlineMeetings/getAllTranscripts",
-            "expirationDateTime": expiration_time,
-            "clientState": f"transcript-webhook-{user_id}"
-        }
+        if result['migrated'] or result['failed']:
+            print(f"\nMigrated per-meeting subscriptions: {len(result['migrated'])}, failed: {len(result['failed'])}")
         
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 201:
-            subscription_data = response.json()
-            print("SUCCESS: Transcript subscription created!")
-            print(f"Subscription ID: {subscription_data.get('id')}")
-            print(f"Expires: {subscription_data.get('expirationDateTime')}")
-            return subscription_data
-        else:
-            print(f"FAILED: Failed to create subscription (Status: {response.status_code})")
-            print(response.json())
-            return None
-            
+        return subscription_data
+    
+    except GraphError as e:
+        print(f"FAILED: Failed to create subscription (Status: {e.status_code})")
+        print(e.payload)
+        return None
     except Exception as e:
         print(f"Error creating subscription: {e}")
         return None
@@ -75,6 +63,9 @@ def main():
     code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
     code_challenge = base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode()).digest()).decode('utf-8').rstrip('=')
     
+    # A fresh state per sign-in ties the redirect back to this request
+    state = secrets.token_urlsafe(24)
+    
     # Generate auth URL with updated scope
     params = {
         'client_id': CLIENT_ID,
@@ -83,7 +74,7 @@ def main():
         'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
         'code_challenge': code_challenge,
         'code_challenge_method': 'S256',
-        'state': '27112000'
+        'state': state
     }
     
     auth_url = "https://login.microsoftonline.com/common/oauth2/v2.0/authorize?" + urlencode(params)
@@ -94,8 +85,11 @@ def main():
     
     # Extract code from URL if full URL was pasted
     if redirect_url.startswith('http'):
-        parsed = urlparse(redirect_url)
-        auth_code = parse_qs(parsed.query)['code'][0]
+        query = parse_qs(urlparse(redirect_url).query)
+        if query.get('state', [state])[0] != state:
+            print("State mismatch: this redirect belongs to a different sign-in")
+            return None
+        auth_code = query['code'][0]
     else:
         auth_code = redirect_url
     
@@ -111,7 +105,7 @@ def main():
         'code_verifier': code_verifier
     }
     
-    response = requests.post(token_url, data=data)
+    response = http_request('POST', token_url, data=data)
     token_response = response.json()
     
     if 'access_token' not in token_response:
@@ -146,8 +140,7 @@ def main():
         'created_at': datetime.utcnow().isoformat()
     }
     
-    with open('teams_tokens.json', 'w') as f:
-        json.dump(complete_data, f, indent=2)
+    save_token_file(complete_data)
     print("\nComplete installation data saved to teams_tokens.json")
     
     print("\n" + "="*50)
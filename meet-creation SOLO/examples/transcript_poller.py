@@ -1,81 +1,59 @@
 #!/usr/bin/env python3
-import requests
 import json
 import time
 import os
+import sys
+import multiprocessing
+from dataclasses import asdict
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+import graph_client
+from delegated_auth import current_access_token
+from graph_client import GraphError, iter_transcripts
+from job_queue import JobQueue
+from job_worker import download_key, meeting_group
+from meeting_catalog import MeetingCatalog
+from poller_shards import MEMBER_TTL, RateBudget, ShardMembership
+from settings import COALESCE_WINDOW
+from subscriptions import list_transcript_subscriptions, meeting_id_from_resource
 
-def get_access_token():
-    """Get fresh access token"""
+# Catalog meetings that ended more than this many days ago are no longer polled
+WATCH_DAYS = 7
+POLL_INTERVAL = 120
+# Graph calls per second each shard may make
+SHARD_RATE = float(os.getenv("POLLER_SHARD_RATE", "4"))
+# Ring key whose owner lists /subscriptions for older setups, so only one shard does
+SUBSCRIPTIONS_KEY = 'per-meeting-subscriptions'
+
+def get_meetings_from_catalog():
+    """Get meetings still waiting on transcripts from the local meeting catalog"""
     try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            data['tokens'] = new_tokens
-            with open('teams_tokens.json', 'w') as f:
-                json.dump(data, f, indent=2)
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
+        with MeetingCatalog() as catalog:
+            rows = catalog.meetings_to_watch(datetime.utcnow() - timedelta(days=WATCH_DAYS))
+        return [{
+            'meeting_id': row['meeting_id'],
+            'subscription_id': None,
+            'label': row['subject'] or 'catalog'
+        } for row in rows]
     except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+        print(f"Error reading meeting catalog: {e}")
+        return []
 
 def get_meetings_with_subscriptions(access_token):
-    """Get meeting IDs from active subscriptions"""
+    """Get meeting IDs from older per-meeting subscriptions"""
     try:
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            subscriptions = response.json()
-            
-            meeting_ids = []
-            for sub in subscriptions.get('value', []):
-                resource = sub.get('resource', '')
-                if '/transcripts' in resource and '/onlineMeetings/' in resource:
-                    try:
-                        meeting_id = resource.split('/onlineMeetings/')[1].split('/transcripts')[0]
-                        meeting_ids.append({
-                            'meeting_id': meeting_id,
-                            'subscription_id': sub.get('id'),
-                            'client_state': sub.get('clientState', 'Unknown')
-                        })
-                    except:
-                        continue
-            
-            return meeting_ids
-        else:
-            print(f"Failed to get subscriptions: {response.status_code}")
-            return []
+        _, per_meeting = list_transcript_subscriptions(access_token)
+        return [{
+            'meeting_id': meeting_id_from_resource(sub['resource']),
+            'subscription_id': sub.get('id'),
+            # Never the clientState: the webhook server checks notifications against it
+            'label': f"subscription {sub.get('id')}"
+        } for sub in per_meeting]
+    except GraphError as e:
+        print(f"Failed to get subscriptions: {e.status_code}")
+        return []
     except Exception as e:
         print(f"Error getting subscriptions: {e}")
         return []
@@ -84,40 +62,31 @@ def check_meeting_transcripts(access_token, meeting_info, last_check_time):
     """Check a specific meeting for new transcripts"""
     try:
         meeting_id = meeting_info['meeting_id']
-        url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}/transcripts"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
+        new_transcripts = []
         
-        if response.status_code == 200:
-            transcripts = response.json()
-            new_transcripts = []
-            
-            for transcript in transcripts.get('value', []):
-                created_time_str = transcript.get('createdDateTime')
-                if created_time_str:
-                    try:
-                        created_time = datetime.fromisoformat(created_time_str.replace('Z', '+00:00'))
-                        # Remove timezone info for comparison
-                        created_time = created_time.replace(tzinfo=None)
-                        
-                        if created_time > last_check_time:
-                            new_transcripts.append(transcript)
-                    except:
-                        # If we can't parse time, include it to be safe
+        for transcript in iter_transcripts(access_token, meeting_id):
+            created_time_str = transcript.created
+            if created_time_str:
+                try:
+                    created_time = datetime.fromisoformat(created_time_str.replace('Z', '+00:00'))
+                    # Remove timezone info for comparison
+                    created_time = created_time.replace(tzinfo=None)
+                    
+                    if created_time > last_check_time:
                         new_transcripts.append(transcript)
-            
-            return new_transcripts
-        else:
-            if response.status_code != 404:  # 404 is normal for meetings without transcripts
-                print(f"Error checking meeting {meeting_id[:30]}...: {response.status_code}")
+                except:
+                    # If we can't parse time, include it to be safe
+                    new_transcripts.append(transcript)
+        
+        return new_transcripts
+    except GraphError as e:
+        if e.status_code == 404:  # 404 is normal for meetings without transcripts
             return []
+        print(f"Error checking meeting {meeting_id[:30]}...: {e.status_code}")
+        return None
     except Exception as e:
         print(f"Error checking transcripts for meeting: {e}")
-        return []
+        return None
 
 def process_new_transcript(meeting_info, transcript):
     """Process a newly found transcript (simulate notification)"""
@@ -126,9 +95,9 @@ def process_new_transcript(meeting_info, transcript):
     print("\n" + "🎉" * 20 + " NEW TRANSCRIPT FOUND! " + "🎉" * 20)
     print(f"⏰ FOUND AT: {timestamp}")
     print(f"📅 Meeting: {meeting_info['meeting_id'][:30]}...")
-    print(f"📝 Transcript ID: {transcript.get('id')}")
-    print(f"🕐 Created: {transcript.get('createdDateTime')}")
-    print(f"🎯 Subscription: {meeting_info['client_state']}")
+    print(f"📝 Transcript ID: {transcript.id}")
+    print(f"🕐 Created: {transcript.created}")
+    print(f"🎯 Source: {meeting_info['label']}")
     print("🎉" * 70)
     
     # Save to file (like webhook would)
@@ -138,7 +107,7 @@ def process_new_transcript(meeting_info, transcript):
         'source': 'Transcript Poller (not webhook)',
         'meeting_id': meeting_info['meeting_id'],
         'subscription_id': meeting_info['subscription_id'],
-        'transcript_data': transcript
+        'transcript_data': asdict(transcript)
     }
     
     with open('transcript_notifications.json', 'a') as f:
@@ -146,6 +115,131 @@ def process_new_transcript(meeting_info, transcript):
         f.write('\n')
     
     print(f"💾 Saved to transcript_notifications.json")
+    
+    # Durable download job: survives a poller crash, run by job_worker.py
+    with JobQueue() as queue:
+        queue.enqueue('download_transcript', {
+            'meeting_id': meeting_info['meeting_id'],
+            'transcript_id': transcript.id,
+            'created': transcript.created
+        }, key=download_key(meeting_info['meeting_id'], transcript.id))
+    print(f"📥 Queued for download (python job_worker.py)")
+
+def get_meetings_to_watch(access_token):
+    """Meetings to poll and whether they came from the catalog"""
+    meetings = get_meetings_from_catalog()
+    if meetings:
+        return meetings, True
+    return get_meetings_with_subscriptions(access_token), False
+
+def poll_meetings(access_token, meetings, last_check, use_catalog, budget=None, unpolled=None):
+    """Check each meeting once; returns True if anything new was found
+
+    A meeting dict may carry its own 'since' to look back further than last_check.
+    unpolled ({meeting_id: since}) is kept by the caller across cycles: a meeting
+    skipped here (another process claimed its listing) or whose check failed
+    stays in it, so the next cycle still looks back to where this one would have.
+    """
+    unpolled = {} if unpolled is None else unpolled
+    found_new = False
+    with JobQueue() as queue:
+        for meeting in meetings:
+            meeting_id = meeting['meeting_id']
+            since = min(meeting.get('since', last_check), unpolled.get(meeting_id, last_check))
+            # Skip meetings a webhook-triggered listing is about to cover (or just did)
+            if not queue.claim_group(meeting_group(meeting_id), COALESCE_WINDOW):
+                unpolled[meeting_id] = since
+                continue
+            if budget:
+                budget.acquire()
+            new_transcripts = check_meeting_transcripts(access_token, meeting, since)
+            if new_transcripts is None:
+                unpolled[meeting_id] = since
+                continue
+            unpolled.pop(meeting_id, None)
+            
+            for transcript in new_transcripts:
+                process_new_transcript(meeting, transcript)
+                found_new = True
+            
+            if new_transcripts and use_catalog:
+                with MeetingCatalog() as catalog:
+                    catalog.set_transcript_state(meeting['meeting_id'], 'available')
+    
+    # Meetings no longer watched (or moved to another shard) are not carried over
+    watched = {meeting['meeting_id'] for meeting in meetings}
+    for meeting_id in set(unpolled) - watched:
+        del unpolled[meeting_id]
+    return found_new
+
+def run_shard(worker_id):
+    """One sharded poller process: polls only the meetings the hash ring gives it"""
+    graph_client.reset_session()
+    budget = RateBudget(SHARD_RATE)
+    membership = ShardMembership(worker_id)
+    
+    access_token = current_access_token()
+    if not access_token:
+        membership.leave()
+        return
+    # The lease is renewed in the background: a cycle over many meetings can outlast MEMBER_TTL
+    membership.start_heartbeat()
+    last_check = datetime.utcnow() - timedelta(hours=1)
+    previously_owned = None
+    unpolled = {}
+    
+    try:
+        while True:
+            # Refreshed only when the token is close to expiring
+            access_token = current_access_token() or access_token
+            
+            current_check = datetime.utcnow()
+            if membership.refresh_ring():
+                print(f"[{worker_id}] ⚖️  Rebalanced across {len(membership.ring.members)} worker(s)")
+            
+            meetings = get_meetings_from_catalog()
+            use_catalog = bool(meetings)
+            if use_catalog:
+                owned = [meeting for meeting in meetings if membership.owns(meeting['meeting_id'])]
+            elif membership.owns(SUBSCRIPTIONS_KEY):
+                # Older setups: one shard lists the per-meeting subscriptions and polls them all
+                meetings = owned = get_meetings_with_subscriptions(access_token)
+            else:
+                owned = []
+            
+            if previously_owned is not None:
+                # A meeting that just moved here may have gone unpolled while its old
+                # owner's lease ran out: look back over that TTL and one more cycle
+                moved_since = last_check - timedelta(seconds=MEMBER_TTL) - (current_check - last_check)
+                for meeting in owned:
+                    if meeting['meeting_id'] not in previously_owned:
+                        meeting['since'] = moved_since
+            previously_owned = {meeting['meeting_id'] for meeting in owned}
+            
+            print(f"[{worker_id}] ⏰ {datetime.now().strftime('%H:%M:%S')} - "
+                  f"checking {len(owned)}/{len(meetings)} meetings")
+            
+            poll_meetings(access_token, owned, last_check, use_catalog, budget, unpolled)
+            last_check = current_check
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        membership.leave()
+
+def run_shards(count):
+    """Start count sharded poller processes on this machine"""
+    prefix = f"{os.uname().nodename}-{os.getpid()}"
+    processes = [multiprocessing.Process(target=run_shard, args=(f"{prefix}-{i}",)) for i in range(count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Sharded poller stopped by user")
+        for process in processes:
+            process.join()
 
 def main():
     print("🔄 TRANSCRIPT POLLER - WEBHOOK ALTERNATIVE")
@@ -154,46 +248,51 @@ def main():
     print("this script polls for new transcripts every 2 minutes.")
     print("=" * 60)
     
-    access_token = get_access_token()
+    # --shards N: split the meetings over N processes (more on other machines sharing POLLER_DB)
+    if '--shards' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--shards') + 1])
+        print(f"🧩 Starting {count} poller shard(s)...")
+        run_shards(count)
+        return
+    
+    access_token = current_access_token()
     if not access_token:
         return
     
-    # Get meetings to monitor
-    meetings = get_meetings_with_subscriptions(access_token)
+    # Get meetings to monitor: the local catalog first, subscriptions for older setups
+    meetings, use_catalog = get_meetings_to_watch(access_token)
     
     if not meetings:
-        print("❌ No meetings with transcript subscriptions found")
+        print("❌ No meetings in the catalog or with transcript subscriptions found")
         return
     
     print(f"📋 Monitoring {len(meetings)} meetings for new transcripts:")
     for meeting in meetings:
-        print(f"   📅 {meeting['meeting_id'][:30]}... ({meeting['client_state']})")
+        print(f"   📅 {meeting['meeting_id'][:30]}... ({meeting['label']})")
     
     print(f"\n🔄 Starting polling every 2 minutes...")
     print(f"💡 This will catch transcripts that webhooks miss!")
     
     last_check = datetime.utcnow() - timedelta(hours=1)  # Check last hour initially
+    unpolled = {}
     
     try:
         while True:
             print(f"\n⏰ {datetime.now().strftime('%H:%M:%S')} - Checking for new transcripts...")
             
-            # Refresh token periodically
-            if datetime.now().minute % 30 == 0:  # Every 30 minutes
-                access_token = get_access_token()
-                if not access_token:
-                    print("❌ Failed to refresh token, stopping")
-                    break
+            # Refresh the token when it is close to expiring
+            access_token = current_access_token()
+            if not access_token:
+                print("❌ Failed to refresh token, stopping")
+                break
             
             current_check = datetime.utcnow()
-            found_new = False
             
-            for meeting in meetings:
-                new_transcripts = check_meeting_transcripts(access_token, meeting, last_check)
-                
-                for transcript in new_transcripts:
-                    process_new_transcript(meeting, transcript)
-                    found_new = True
+            # Pick up meetings created since the last cycle (a local query, no Graph call)
+            if use_catalog:
+                meetings = get_meetings_from_catalog()
+            
+            found_new = poll_meetings(access_token, meetings, last_check, use_catalog, unpolled=unpolled)
             
             if not found_new:
                 print("   📭 No new transcripts found")
@@ -201,7 +300,7 @@ def main():
             last_check = current_check
             
             print(f"   😴 Sleeping 2 minutes until next check...")
-            time.sleep(120)  # 2 minutes
+            time.sleep(POLL_INTERVAL)
             
     except KeyboardInterrupt:
         print(f"\n🛑 Transcript poller stopped by user")
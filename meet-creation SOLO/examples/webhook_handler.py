@@ -1,82 +1,74 @@
 from flask import Flask, request, jsonify
 import json
-import requests
 import os
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+import sys
+from datetime import datetime
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import graph_client
+from delegated_auth import current_access_token
+from graph_client import GraphError
+from http_resilience import breaker_metrics
+from job_queue import JobQueue
+from job_worker import request_meeting_sync
+from meeting_catalog import MeetingCatalog
+from settings import WEBHOOK_BASE_URL
+from subscriptions import (ensure_user_subscription, register_existing_subscriptions, renew_subscription,
+                           route_notification)
+from webhook_security import NotificationVerificationError, signing_keys, verify_notifications
 
 app = Flask(__name__)
 
-# Configuration
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+def verified_notifications(notification_data):
+    """notification_data with only the notifications that passed webhook_security's checks"""
+    with MeetingCatalog() as catalog:
+        accepted = verify_notifications(notification_data, catalog)
+    return {**notification_data, 'value': accepted}
 
-def get_fresh_access_token():
-    """Get fresh access token for renewal operations"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        # Access tokens from the nested structure
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/CallRecords.Read.All https://graph.microsoft.com/OnlineMeetings.ReadWrite',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            # Update only the tokens section, preserve user_info and subscription
-            data['tokens'] = new_tokens
-            with open('teams_tokens.json', 'w') as f:
-                json.dump(data, f, indent=2)
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-    except Exception as e:
-        print(f"Error refreshing token: {e}")
-        return None
+def route_transcript_notifications(notification_data):
+    """Map each notification of the consolidated subscription to its meeting"""
+    routed = []
+    with MeetingCatalog() as catalog:
+        for notification in notification_data.get('value', []):
+            meeting_id, transcript_id, meeting = route_notification(notification, catalog)
+            if not meeting_id:
+                continue
+            
+            if meeting:
+                print(f"📅 Meeting: {meeting['subject']} ({meeting_id[:30]}...)")
+                catalog.set_transcript_state(meeting_id, 'available')
+            else:
+                print(f"📅 Meeting not in local catalog: {meeting_id[:30]}...")
+            
+            routed.append({'meeting_id': meeting_id, 'transcript_id': transcript_id, 'known': meeting is not None})
+    
+    # Answer Graph quickly; job_worker.py lists and downloads. A burst of
+    # notifications for one meeting becomes a single listing after COALESCE_WINDOW
+    with JobQueue() as queue:
+        for item in routed:
+            item['coalesced'] = request_meeting_sync(queue, item['meeting_id']) is None
+    return routed
 
-def renew_subscription(subscription_id, access_token):
-    """Renew a subscription by extending its expiration time"""
+def recreate_subscription(access_token):
+    """Recreate the user's consolidated transcript subscription after it was removed"""
     try:
-        url = f"https://graph.microsoft.com/v1.0/subscriptions/{subscription_id}"
-        
-        # Extend by 3 days for transcript subscriptions
-        new_expiration = (datetime.utcnow() + timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
-        
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        data = {
-            "expirationDateTime": new_expiration
-        }
-        
-        response = requests.patch(url, json=data, headers=headers)
+        with open('teams_tokens.json', 'r') as f:
+            user_id = json.load(f)['user_info']['id']
         
-        if response.status_code == 200:
-            print(f"SUCCESS: Subscription {subscription_id} renewed successfully")
-            return True
-        else:
-            print(f"FAILED: Failed to renew subscription {subscription_id}: {response.status_code}")
-            print(response.json())
-            return False
-            
+        subscription = ensure_user_subscription(
+            access_token, user_id,
+            notification_url=f"{WEBHOOK_BASE_URL}/teams/webhook",
+            lifecycle_url=f"{WEBHOOK_BASE_URL}/teams/lifecycle"
+        )
+        print(f"SUCCESS: Subscription {subscription.get('id')} recreated")
+        return True
+    except GraphError as e:
+        print(f"FAILED: Failed to recreate subscription: {e.status_code}")
+        print(e.payload)
+        return False
     except Exception as e:
-        print(f"Error renewing subscription: {e}")
+        print(f"Error recreating subscription: {e}")
         return False
 
 @app.route('/teams/webhook', methods=['GET', 'POST'])
@@ -95,9 +87,13 @@ def transcript_webhook():
         return validation_token, 200, {'Content-Type': 'text/plain'}
     
     if request.method == 'POST':
-        # how to verify that teams sent the request?
         try:
-            notification_data = request.get_json()
+            notification_data = verified_notifications(request.get_json() or {})
+        except NotificationVerificationError as e:
+            print(f"REJECTED: {e}")
+            return jsonify({'error': 'notification could not be verified'}), 403
+        
+        try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             print("\n" + "🔔" * 20 + " REAL TRANSCRIPT NOTIFICATION " + "🔔" * 20)
@@ -109,12 +105,16 @@ def transcript_webhook():
             print("✅ This is a REAL notification from Microsoft Teams!")
             print("🔔" * 70)
             
+            # One subscription covers all meetings: route each notification locally
+            routed = route_transcript_notifications(notification_data)
+            
             # Save transcript notification data with clear labeling
             with open('transcript_notifications.json', 'a') as f:
                 json.dump({
                     'timestamp': timestamp,
                     'type': 'REAL_TEAMS_TRANSCRIPT_NOTIFICATION',
                     'source': 'Microsoft Teams via Graph API',
+                    'meetings': routed,
                     'data': notification_data
                 }, f, indent=2)
                 f.write('\n')
@@ -140,7 +140,12 @@ def lifecycle_webhook():
     
     if request.method == 'POST':
         try:
-            lifecycle_data = request.get_json()
+            lifecycle_data = verified_notifications(request.get_json() or {})
+        except NotificationVerificationError as e:
+            print(f"REJECTED: {e}")
+            return jsonify({'error': 'notification could not be verified'}), 403
+        
+        try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
             print(f"\n[{timestamp}] LIFECYCLE NOTIFICATION:")
@@ -167,20 +172,33 @@ def lifecycle_webhook():
                     
                     if lifecycle_event == 'reauthorizationRequired' and subscription_id:
                         print("AUTO-RENEWING: Starting subscription renewal...")
-                        access_token = get_fresh_access_token()
+                        access_token = current_access_token()
                         
+                        success = False
                         if access_token:
-                            success = renew_subscription(subscription_id, access_token)
-                            if success:
-                                print("SUCCESS: Subscription auto-renewed successfully!")
-                            else:
-                                print("FAILED: Failed to auto-renew subscription")
+                            try:
+                                renew_subscription(access_token, subscription_id)
+                                success = True
+                            except GraphError as e:
+                                print(f"FAILED: Failed to renew subscription {subscription_id}: {e.status_code}")
+                                print(e.payload)
+                            except Exception as e:
+                                print(f"Error renewing subscription: {e}")
+                        if success:
+                            print("SUCCESS: Subscription auto-renewed successfully!")
                         else:
-                            print("FAILED: Failed to get access token for renewal")
+                            # Keep retrying with backoff from the job queue
+                            with JobQueue() as queue:
+                                queue.enqueue('renew_subscription', {'subscription_id': subscription_id})
+                            print("FAILED: Failed to auto-renew subscription, queued for retry")
                     
                     elif lifecycle_event == 'subscriptionRemoved':
-                        print("WARNING: Subscription was removed/expired")
-                        # TODO: Optionally recreate subscription here
+                        print("WARNING: Subscription was removed/expired, recreating...")
+                        access_token = current_access_token()
+                        if access_token:
+                            recreate_subscription(access_token)
+                        else:
+                            print("FAILED: Failed to get access token for recreation")
                     
                     elif lifecycle_event == 'missed':
                         print("WARNING: Some notifications were missed")
@@ -211,13 +229,40 @@ def index():
         'message': 'Teams Transcript Webhook Server',
         'endpoints': {
             'transcript_notifications': '/teams/webhook',
+            'metrics': '/metrics',
         }
     }), 200
 
-if __name__ == '__main__':
+@app.route('/metrics')
+def metrics():
+    """Circuit breaker state and counters for the Graph and login endpoints this server called"""
+    return jsonify({'timestamp': datetime.now().isoformat(), 'breakers': breaker_metrics()}), 200
+
+def main():
     print("Starting Teams Transcript Webhook Server...")
     print("Transcript notifications: /teams/webhook")
     print("Lifecycle notifications: /teams/lifecycle")
     print("Health check: /health")
+    print("Circuit breaker metrics: /metrics")
     print("=" * 50)
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    graph_client.prewarm()
+    graph_client.keep_connections_warm()
+    # Notifications are then verified against cached keys, without a request each
+    try:
+        signing_keys().refresh()
+    except Exception as e:
+        print(f"Could not fetch webhook signing keys yet: {e}")
+    # Subscriptions made before the clientState registry existed would otherwise be dropped
+    access_token = current_access_token()
+    if access_token:
+        try:
+            registered, unknown = register_existing_subscriptions(access_token, WEBHOOK_BASE_URL)
+            print(f"Subscription registry: {registered} existing subscription(s) added, {unknown} unverifiable")
+        except GraphError as e:
+            print(f"Could not backfill the subscription registry: {e.status_code}")
+    # No reloader: it re-runs sys.argv, which is not a script under 'teams serve'
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,432 @@
+"""
+Shared Microsoft Graph client helpers
+
+All scripts go through one HTTP session so connections are reused, and
+list endpoints are read with iter_graph_items(), which follows
+@odata.nextLink lazily instead of stopping at the first page. Passing
+select= sends $select so Graph returns only the listed properties.
+
+Meeting metadata and transcript listings are served through a read-through
+cache (see meeting_cache.py), including cached 404s.
+
+Many small GETs can be sent together with graph_batch(), which uses Graph
+JSON batching ($batch, up to 20 requests per round trip).
+
+Requests are sent through http_resilience.http_request(), which applies
+per-endpoint timeouts and circuit breakers (and hedges slow GETs when
+GRAPH_HEDGE=1). The session comes from http_transport.py: HTTP/2 when
+GRAPH_HTTP2=1 and httpx is installed; the token endpoint calls share it, so
+prewarm() can open both hosts' connections up front.
+
+Helpers check the access token's claims first (token_claims.py) and raise
+MissingScopeError - without sending anything - when it has none of the
+permissions the call needs.
+
+Meeting helpers take an optional user_id: None addresses the signed-in user
+('me/...', delegated tokens); an organizer's id addresses 'users/{id}/...',
+which is what app-only tokens (see app_auth.py) must use.
+"""
+
+import os
+import urllib.parse
+
+import http_transport
+from graph_models import (AttendanceRecord, AttendanceReport, CallRecord, CallRecording, CallTranscript,
+                          OnlineMeeting)
+from http_resilience import http_request
+from meeting_cache import MISSING, NOT_FOUND, MeetingCache
+from settings import GRAPH_CACHE_DB, GRAPH_PREWARM
+from token_claims import missing_permissions
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+
+# Seconds a meeting's metadata / transcript listing / 404 is served from cache
+MEETING_TTL = int(os.getenv("GRAPH_MEETING_TTL", "3600"))
+TRANSCRIPTS_TTL = int(os.getenv("GRAPH_TRANSCRIPTS_TTL", "60"))
+NOT_FOUND_TTL = int(os.getenv("GRAPH_NOT_FOUND_TTL", "300"))
+# A join URL / join meeting id never changes meeting, so lookups are kept longer
+RESOLVE_TTL = int(os.getenv("GRAPH_RESOLVE_TTL", "86400"))
+
+# Graph accepts at most 20 requests per $batch call
+BATCH_LIMIT = 20
+
+session = http_transport.new_session()
+
+
+def reset_session(pool_size=10):
+    """Give this process its own connection pool (call in a newly started worker process)"""
+    global session
+    session = http_transport.new_session(pool_size)
+    return session
+
+
+def prewarm():
+    """Open the Graph and token endpoint connections in parallel (unless GRAPH_PREWARM=0)"""
+    if GRAPH_PREWARM:
+        return http_transport.prewarm(session)
+    return {}
+
+
+def keep_connections_warm(interval=http_transport.KEEPALIVE_INTERVAL):
+    """Ping both hosts in the background so a long-running process keeps its connections open"""
+    return http_transport.start_keepalive(lambda: session, interval)
+
+
+# Set GRAPH_CACHE_DB to a file path to keep cached metadata across runs
+cache = MeetingCache(db_path=GRAPH_CACHE_DB)
+
+
+class GraphError(Exception):
+    """A Graph request that did not return a success status"""
+
+    def __init__(self, status_code, payload=None, url=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.url = url
+        super().__init__(f"Graph request failed (Status: {status_code})")
+
+
+class MissingScopeError(GraphError):
+    """The token has none of the permissions a call needs; raised before the request is sent"""
+
+    def __init__(self, kind, accepted, url=None):
+        super().__init__(403, {'error': {'code': 'MissingScope',
+                                         'message': f"Token has none of: {', '.join(accepted)}"}}, url)
+        self.kind = kind
+        self.accepted = accepted
+        self.args = (f"Token lacks the permission for {kind} ({' or '.join(accepted)})",)
+
+
+def require_permission(access_token, kind, url=None):
+    """Raise MissingScopeError if the token's claims rule out a call of this kind (token_claims.PERMISSIONS)"""
+    accepted = missing_permissions(access_token, kind)
+    if accepted:
+        raise MissingScopeError(kind, accepted, url)
+
+
+def graph_headers(access_token):
+    return {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+
+
+def graph_url(path):
+    """Absolute Graph URL for a path like 'me/onlineMeetings'"""
+    if path.startswith('https://'):
+        return path
+    return f"{GRAPH_URL}/{path.lstrip('/')}"
+
+
+def _error_payload(response):
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def _with_select(params, select):
+    params = dict(params or {})
+    if select:
+        params['$select'] = ','.join(select)
+    return params
+
+
+def graph_get(access_token, path, params=None, select=None):
+    """GET a Graph resource and return its JSON body, raising GraphError on failure"""
+    url = graph_url(path)
+    if select:
+        params = _with_select(params, select)
+    response = http_request('GET', url, session=session, headers=graph_headers(access_token), params=params)
+    if response.status_code != 200:
+        raise GraphError(response.status_code, _error_payload(response), url)
+    return response.json()
+
+
+def graph_send(access_token, method, path, body=None):
+    """POST/PATCH/DELETE a Graph resource; returns the JSON body (None for 204)"""
+    url = graph_url(path)
+    response = http_request(method, url, session=session, headers=graph_headers(access_token), json=body)
+    if response.status_code not in (200, 201, 204):
+        raise GraphError(response.status_code, _error_payload(response), url)
+    return response.json() if response.status_code != 204 and response.content else None
+
+
+def iter_graph_items(access_token, path, params=None, page_size=None, select=None, budget=None):
+    """Yield every item of a Graph collection, one page at a time
+
+    Pages are fetched only as the caller consumes items, so breaking out of the
+    loop (or using itertools.islice) stops further requests. page_size sets
+    $top and select sets $select on the first request; Graph carries both
+    into each @odata.nextLink. A budget (poller_shards.RateBudget) is charged
+    one call per page.
+    """
+    params = _with_select(params, select)
+    if page_size:
+        params['$top'] = page_size
+
+    url = graph_url(path)
+    while url:
+        if budget is not None:
+            budget.acquire()
+        page = graph_get(access_token, url, params)
+        for item in page.get('value', []):
+            yield item
+        # nextLink already carries the original query string
+        url = page.get('@odata.nextLink')
+        params = None
+
+
+def graph_batch(access_token, batch_requests):
+    """Send GET requests through Graph JSON batching
+
+    batch_requests maps a caller-chosen id to a path relative to the API
+    version ('me/onlineMeetings?...'). Returns {id: (status, body)}. Requests
+    are sent BATCH_LIMIT at a time; a failed batch call raises GraphError.
+    """
+    items = list(batch_requests.items())
+    results = {}
+    for offset in range(0, len(items), BATCH_LIMIT):
+        chunk = items[offset:offset + BATCH_LIMIT]
+        # Batch ids are positional; caller ids (often URLs) are mapped back below
+        body = {'requests': [
+            {'id': str(i), 'method': 'GET', 'url': '/' + path.lstrip('/')}
+            for i, (_, path) in enumerate(chunk)
+        ]}
+        url = graph_url('$batch')
+        response = http_request('POST', url, session=session, headers=graph_headers(access_token), json=body)
+        if response.status_code != 200:
+            raise GraphError(response.status_code, _error_payload(response), url)
+
+        for item in response.json().get('responses', []):
+            results[chunk[int(item['id'])][0]] = (item.get('status'), item.get('body'))
+    return results
+
+
+def user_path(user_id=None):
+    """'me' for the signed-in user, 'users/{id}' for a given organizer"""
+    if user_id is None:
+        return "me"
+    return f"users/{urllib.parse.quote(user_id, safe='')}"
+
+
+def meeting_path(meeting_id, user_id=None):
+    return f"{user_path(user_id)}/onlineMeetings/{urllib.parse.quote(meeting_id, safe='')}"
+
+
+def _cache_key(path, select):
+    return f"{path}?$select={','.join(select or ())}"
+
+
+def cached_graph_get(access_token, path, select=None, ttl=MEETING_TTL, not_found_ttl=NOT_FOUND_TTL):
+    """graph_get() through the cache; 404s are cached for not_found_ttl"""
+    key = _cache_key(path, select)
+    cached = cache.get(key)
+    if cached is NOT_FOUND:
+        raise GraphError(404, 'Not found (cached)', graph_url(path))
+    if cached is not MISSING:
+        return cached
+
+    try:
+        data = graph_get(access_token, path, select=select)
+    except GraphError as e:
+        if e.status_code == 404:
+            cache.set_missing(key, not_found_ttl)
+        raise
+    cache.set(key, data, ttl)
+    return data
+
+
+def get_online_meeting(access_token, meeting_id, select=OnlineMeeting.SELECT, use_cache=True, user_id=None):
+    """Fetch one meeting with only the selected properties"""
+    require_permission(access_token, 'meetings_read')
+    path = meeting_path(meeting_id, user_id)
+    if use_cache:
+        data = cached_graph_get(access_token, path, select)
+    else:
+        data = graph_get(access_token, path, select=select)
+    return OnlineMeeting.from_graph(data)
+
+
+def iter_online_meetings(access_token, select=OnlineMeeting.SELECT, page_size=None, user_id=None):
+    """Yield the user's meetings as OnlineMeeting models"""
+    require_permission(access_token, 'meetings_read')
+    path = f"{user_path(user_id)}/onlineMeetings"
+    for item in iter_graph_items(access_token, path, page_size=page_size, select=select):
+        yield OnlineMeeting.from_graph(item)
+
+
+def iter_transcripts(access_token, meeting_id, select=CallTranscript.SELECT, page_size=None, use_cache=True,
+                     user_id=None):
+    """Yield a meeting's transcripts as CallTranscript models
+
+    With use_cache the whole listing is cached for TRANSCRIPTS_TTL seconds
+    (transcript lists are short, so it is read in full on a miss).
+    """
+    require_permission(access_token, 'transcripts')
+    path = f"{meeting_path(meeting_id, user_id)}/transcripts"
+    if not use_cache:
+        for item in iter_graph_items(access_token, path, page_size=page_size, select=select):
+            yield CallTranscript.from_graph(item)
+        return
+
+    key = _cache_key(path, select)
+    items = cache.get(key)
+    if items is NOT_FOUND:
+        raise GraphError(404, 'Not found (cached)', graph_url(path))
+    if items is MISSING:
+        try:
+            items = list(iter_graph_items(access_token, path, page_size=page_size, select=select))
+        except GraphError as e:
+            if e.status_code == 404:
+                cache.set_missing(key, NOT_FOUND_TTL)
+            raise
+        cache.set(key, items, TRANSCRIPTS_TTL)
+
+    for item in items:
+        yield CallTranscript.from_graph(item)
+
+
+def transcript_content_path(meeting_id, transcript_id, user_id=None):
+    return (f"{meeting_path(meeting_id, user_id)}/transcripts/"
+            f"{urllib.parse.quote(transcript_id, safe='')}/content")
+
+
+def iter_recordings(access_token, meeting_id, select=CallRecording.SELECT, page_size=None, user_id=None):
+    """Yield a meeting's recordings as CallRecording models (needs OnlineMeetingRecording.Read.All)"""
+    require_permission(access_token, 'recordings')
+    path = f"{meeting_path(meeting_id, user_id)}/recordings"
+    for item in iter_graph_items(access_token, path, page_size=page_size, select=select):
+        yield CallRecording.from_graph(item)
+
+
+def recording_content_path(meeting_id, recording_id, user_id=None):
+    return (f"{meeting_path(meeting_id, user_id)}/recordings/"
+            f"{urllib.parse.quote(recording_id, safe='')}/content")
+
+
+def iter_attendance_reports(access_token, meeting_id, select=AttendanceReport.SELECT, user_id=None, budget=None):
+    """Yield a meeting's attendance reports (one per time the meeting was held)"""
+    require_permission(access_token, 'attendance')
+    path = f"{meeting_path(meeting_id, user_id)}/attendanceReports"
+    for item in iter_graph_items(access_token, path, select=select, budget=budget):
+        yield AttendanceReport.from_graph(item)
+
+
+def iter_attendance_records(access_token, meeting_id, report_id, select=AttendanceRecord.SELECT, user_id=None,
+                            budget=None):
+    """Yield the attendee records of one attendance report"""
+    require_permission(access_token, 'attendance')
+    path = (f"{meeting_path(meeting_id, user_id)}/attendanceReports/"
+            f"{urllib.parse.quote(report_id, safe='')}/attendanceRecords")
+    for item in iter_graph_items(access_token, path, select=select, budget=budget):
+        yield AttendanceRecord.from_graph(item)
+
+
+def iter_call_records(access_token, start, end=None, select=CallRecord.SELECT, budget=None):
+    """Yield call records started in [start, end) (app-only, CallRecords.Read.All)"""
+    require_permission(access_token, 'call_records')
+    conditions = [f"startDateTime ge {start}"]
+    if end:
+        conditions.append(f"startDateTime lt {end}")
+    params = {'$filter': ' and '.join(conditions)}
+    for item in iter_graph_items(access_token, "communications/callRecords", params=params, select=select,
+                                 budget=budget):
+        yield CallRecord.from_graph(item)
+
+
+def iter_organizer_transcripts(access_token, user_id, start=None, end=None, select=CallTranscript.SELECT,
+                               page_size=None):
+    """Yield every transcript of meetings organized by user_id, across all meetings
+
+    One paged call per organizer (getAllTranscripts) instead of one listing per
+    meeting; start / end are ISO timestamps bounding the transcript creation
+    time. Requires an app-only token with an application access policy.
+    """
+    require_permission(access_token, 'transcripts')
+    arguments = [f"meetingOrganizerUserId='{user_id}'"]
+    if start:
+        arguments.append(f"startDateTime={start}")
+    if end:
+        arguments.append(f"endDateTime={end}")
+    path = f"{user_path(user_id)}/onlineMeetings/getAllTranscripts({','.join(arguments)})"
+    for item in iter_graph_items(access_token, path, page_size=page_size, select=select):
+        yield CallTranscript.from_graph(item)
+
+
+def _quote_filter_value(value):
+    """OData string literal: single quotes are escaped by doubling them"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def meeting_filter_path(join_url=None, join_meeting_id=None, select=OnlineMeeting.SELECT, user_id=None):
+    """'me/onlineMeetings?$filter=...' for one join URL or join meeting id"""
+    if join_url:
+        condition = f"JoinWebUrl eq {_quote_filter_value(join_url)}"
+    else:
+        condition = f"joinMeetingIdSettings/joinMeetingId eq {_quote_filter_value(join_meeting_id)}"
+    query = urllib.parse.urlencode(
+        _with_select({'$filter': condition}, select), safe="$,/'", quote_via=urllib.parse.quote)
+    return f"{user_path(user_id)}/onlineMeetings?{query}"
+
+
+def find_online_meeting(access_token, join_url=None, join_meeting_id=None, select=OnlineMeeting.SELECT,
+                        user_id=None):
+    """Look up a meeting by join URL or join meeting id with one filtered query
+
+    Returns an OnlineMeeting or None. Results (including misses) are cached.
+    """
+    require_permission(access_token, 'meetings_read')
+    path = meeting_filter_path(join_url, join_meeting_id, select, user_id)
+    key = _cache_key(path, select)
+    cached = cache.get(key)
+    if cached is NOT_FOUND:
+        return None
+    if cached is MISSING:
+        items = graph_get(access_token, path).get('value', [])
+        if not items:
+            cache.set_missing(key, NOT_FOUND_TTL)
+            return None
+        cached = items[0]
+        cache.set(key, cached, RESOLVE_TTL)
+    return OnlineMeeting.from_graph(cached)
+
+
+def find_online_meetings(access_token, join_urls=(), join_meeting_ids=(), select=OnlineMeeting.SELECT,
+                         user_id=None):
+    """Bulk find_online_meeting(): cached lookups first, the rest in $batch calls
+
+    Returns {join URL or join meeting id: OnlineMeeting or None}.
+    """
+    require_permission(access_token, 'meetings_read')
+    paths = {}
+    for join_url in join_urls:
+        paths[join_url] = meeting_filter_path(join_url=join_url, select=select, user_id=user_id)
+    for join_meeting_id in join_meeting_ids:
+        paths[join_meeting_id] = meeting_filter_path(join_meeting_id=join_meeting_id, select=select,
+                                                     user_id=user_id)
+
+    found = {}
+    to_fetch = {}
+    for reference, path in paths.items():
+        cached = cache.get(_cache_key(path, select))
+        if cached is NOT_FOUND:
+            found[reference] = None
+        elif cached is MISSING:
+            to_fetch[reference] = path
+        else:
+            found[reference] = OnlineMeeting.from_graph(cached)
+
+    if to_fetch:
+        for reference, (status, body) in graph_batch(access_token, to_fetch).items():
+            key = _cache_key(to_fetch[reference], select)
+            items = (body or {}).get('value', []) if status == 200 else []
+            if items:
+                cache.set(key, items[0], RESOLVE_TTL)
+                found[reference] = OnlineMeeting.from_graph(items[0])
+            else:
+                # Throttled or failed requests are left uncached so they are retried
+                if status in (200, 404):
+                    cache.set_missing(key, NOT_FOUND_TTL)
+                found[reference] = None
+    return found
@@ -0,0 +1,178 @@
+"""
+Lightweight models for Graph meeting and transcript resources
+
+Each model lists the Graph properties it needs in SELECT, which the client
+sends as $select so Graph only returns (and we only parse) those fields.
+Models use __slots__ to keep per-object memory small on large scans.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass
+class OnlineMeeting:
+    __slots__ = ('id', 'subject', 'start', 'end', 'created', 'join_url',
+                 'join_meeting_id', 'passcode', 'allow_transcription')
+
+    id: str
+    subject: str
+    start: str
+    end: str
+    created: str
+    join_url: str
+    join_meeting_id: str
+    passcode: str
+    allow_transcription: object
+
+    SELECT = ('id', 'subject', 'startDateTime', 'endDateTime', 'creationDateTime',
+              'joinWebUrl', 'joinMeetingIdSettings', 'allowTranscription')
+
+    @classmethod
+    def from_graph(cls, data):
+        join_settings = data.get('joinMeetingIdSettings') or {}
+        return cls(
+            id=data.get('id'),
+            subject=data.get('subject'),
+            start=data.get('startDateTime'),
+            end=data.get('endDateTime'),
+            created=data.get('creationDateTime'),
+            join_url=data.get('joinWebUrl'),
+            join_meeting_id=join_settings.get('joinMeetingId'),
+            passcode=join_settings.get('passcode'),
+            allow_transcription=data.get('allowTranscription')
+        )
+
+
+@dataclass
+class CallTranscript:
+    __slots__ = ('id', 'meeting_id', 'created', 'content_url', 'organizer_id')
+
+    id: str
+    meeting_id: str
+    created: str
+    content_url: str
+    organizer_id: str
+
+    SELECT = ('id', 'meetingId', 'createdDateTime', 'transcriptContentUrl', 'meetingOrganizer')
+
+    @classmethod
+    def from_graph(cls, data):
+        organizer = (data.get('meetingOrganizer') or {}).get('user') or {}
+        return cls(
+            id=data.get('id'),
+            meeting_id=data.get('meetingId'),
+            created=data.get('createdDateTime'),
+            content_url=data.get('transcriptContentUrl'),
+            organizer_id=organizer.get('id')
+        )
+
+
+@dataclass
+class CallRecording:
+    __slots__ = ('id', 'meeting_id', 'created', 'ended', 'content_url', 'organizer_id')
+
+    id: str
+    meeting_id: str
+    created: str
+    ended: str
+    content_url: str
+    organizer_id: str
+
+    SELECT = ('id', 'meetingId', 'createdDateTime', 'endDateTime', 'recordingContentUrl', 'meetingOrganizer')
+
+    @classmethod
+    def from_graph(cls, data):
+        organizer = (data.get('meetingOrganizer') or {}).get('user') or {}
+        return cls(
+            id=data.get('id'),
+            meeting_id=data.get('meetingId'),
+            created=data.get('createdDateTime'),
+            ended=data.get('endDateTime'),
+            content_url=data.get('recordingContentUrl'),
+            organizer_id=organizer.get('id')
+        )
+
+
+@dataclass
+class AttendanceReport:
+    __slots__ = ('id', 'participants', 'start', 'end')
+
+    id: str
+    participants: int
+    start: str
+    end: str
+
+    SELECT = ('id', 'totalParticipantCount', 'meetingStartDateTime', 'meetingEndDateTime')
+
+    @classmethod
+    def from_graph(cls, data):
+        return cls(
+            id=data.get('id'),
+            participants=data.get('totalParticipantCount'),
+            start=data.get('meetingStartDateTime'),
+            end=data.get('meetingEndDateTime')
+        )
+
+
+@dataclass
+class AttendanceRecord:
+    __slots__ = ('id', 'email', 'display_name', 'user_id', 'role', 'total_seconds',
+                 'first_join', 'last_leave', 'intervals')
+
+    id: str
+    email: str
+    display_name: str
+    user_id: str
+    role: str
+    total_seconds: int
+    first_join: str
+    last_leave: str
+    intervals: int
+
+    SELECT = ('id', 'emailAddress', 'identity', 'role', 'totalAttendanceInSeconds', 'attendanceIntervals')
+
+    @classmethod
+    def from_graph(cls, data):
+        identity = data.get('identity') or {}
+        intervals = data.get('attendanceIntervals') or []
+        joins = [interval['joinDateTime'] for interval in intervals if interval.get('joinDateTime')]
+        leaves = [interval['leaveDateTime'] for interval in intervals if interval.get('leaveDateTime')]
+        return cls(
+            id=data.get('id'),
+            email=data.get('emailAddress'),
+            display_name=identity.get('displayName'),
+            user_id=identity.get('id'),
+            role=data.get('role'),
+            total_seconds=data.get('totalAttendanceInSeconds'),
+            first_join=min(joins) if joins else None,
+            last_leave=max(leaves) if leaves else None,
+            intervals=len(intervals)
+        )
+
+
+@dataclass
+class CallRecord:
+    __slots__ = ('id', 'join_url', 'start', 'end', 'type', 'modalities', 'organizer_id')
+
+    id: str
+    join_url: str
+    start: str
+    end: str
+    type: str
+    modalities: str
+    organizer_id: str
+
+    SELECT = ('id', 'joinWebUrl', 'startDateTime', 'endDateTime', 'type', 'modalities', 'organizer_v2')
+
+    @classmethod
+    def from_graph(cls, data):
+        organizer = data.get('organizer_v2') or {}
+        return cls(
+            id=data.get('id'),
+            join_url=data.get('joinWebUrl'),
+            start=data.get('startDateTime'),
+            end=data.get('endDateTime'),
+            type=data.get('type'),
+            modalities=','.join(data.get('modalities') or []),
+            organizer_id=organizer.get('id')
+        )
@@ -0,0 +1,269 @@
+"""
+Timeouts, circuit breakers and hedged reads for outgoing HTTP calls
+
+Graph and token endpoint requests go through http_request(), which adds:
+
+- Timeouts per endpoint - Graph API calls, content downloads (transcripts,
+  recordings) and the identity platform's token endpoint each get their own
+  (connect, read) timeout, so a stalled server costs seconds, not a hung socket.
+- A circuit breaker per endpoint. After BREAKER_FAILURES consecutive failures
+  (timeouts, connection errors, 5xx) it opens and calls fail at once with
+  CircuitOpenError. After BREAKER_RESET seconds one probe request is let
+  through; its result closes the breaker or opens it again. 4xx answers are
+  the caller's problem and count as the endpoint being up.
+- Hedged GETs (GRAPH_HEDGE=1): a read still running after the endpoint's
+  recent p95 latency gets a duplicate request, and whichever answers first
+  is used and the other one is closed. Streamed downloads and writes are
+  never hedged. A streamed body that breaks off mid-read counts as a failure
+  of its endpoint too.
+
+CircuitOpenError is a requests.RequestException, so code that already handles
+network errors (and the job queue's retry with backoff) treats an open
+breaker like an unreachable server. breaker_metrics() reports each
+endpoint's state and counters; the webhook server serves them at /metrics.
+"""
+
+import math
+import os
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import requests
+
+import settings  # noqa: F401 - reads .env before the settings below
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Seconds to wait for the next bytes of a response, per endpoint
+TIMEOUTS = {
+    'graph': (CONNECT_TIMEOUT, float(os.getenv("GRAPH_TIMEOUT", "30"))),
+    'graph_content': (CONNECT_TIMEOUT, float(os.getenv("GRAPH_CONTENT_TIMEOUT", "120"))),
+    'login': (CONNECT_TIMEOUT, float(os.getenv("LOGIN_TIMEOUT", "15"))),
+}
+
+# Consecutive failures that open a breaker, and seconds before it lets a probe through
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+HEDGE = os.getenv("GRAPH_HEDGE", "0") == "1"
+# Latencies kept per endpoint, and how many are needed before p95 is trusted for hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = 16
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.RequestException):
+    """An endpoint's breaker is open; the request was not sent"""
+
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(f"Circuit open for {endpoint}, next probe in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe -> closed (or open again)"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = dict.fromkeys(('calls', 'successes', 'failures', 'rejected', 'opened', 'hedged'), 0)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Admit a call (returning the state it runs under) or raise CircuitOpenError"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self.probing):
+                self.probing = self.state == HALF_OPEN
+                self.counters['calls'] += 1
+                return self.state
+            self.counters['rejected'] += 1
+            retry_after = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self, latency=None):
+        with self._lock:
+            self.counters['successes'] += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.probing = False
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def record_failure(self):
+        with self._lock:
+            self.counters['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters['opened'] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def count_hedge(self):
+        with self._lock:
+            self.counters['hedged'] += 1
+
+    def p95(self):
+        """Recent 95th percentile latency in seconds; None until there are enough samples"""
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(max(math.ceil(len(ordered) * 0.95) - 1, 0), len(ordered) - 1)]
+
+    def metrics(self):
+        p95 = self.p95()
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'p95_ms': round(p95 * 1000) if p95 is not None else None,
+                **self.counters,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_pool = (None, None)  # (pid, executor) - a forked worker process builds its own
+
+
+def get_breaker(endpoint):
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def breaker_metrics():
+    """{endpoint: {state, counters, p95_ms}} for every endpoint called so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.metrics() for breaker in breakers}
+
+
+def endpoint_for(url):
+    """'login', 'graph_content' or 'graph' for a request URL"""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.hostname == 'login.microsoftonline.com':
+        return 'login'
+    if parsed.path.endswith(('/content', '/$value')):
+        return 'graph_content'
+    return 'graph'
+
+
+def _hedge_executor():
+    global _hedge_pool
+    pid, executor = _hedge_pool
+    if pid != os.getpid():
+        executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+        _hedge_pool = (os.getpid(), executor)
+    return executor
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _hedged(breaker, send, delay):
+    """Run send(); if it is still running after delay seconds, race a second copy
+
+    The copy that loses is closed when it finishes, so its connection goes back to the pool.
+    """
+    executor = _hedge_executor()
+    first = executor.submit(send)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeout:
+        pass
+
+    breaker.count_hedge()
+    pending = {first, executor.submit(send)}
+    fallback, error = None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except requests.RequestException as e:
+                error = e
+                continue
+            if response.status_code < 500:
+                if fallback is not None:
+                    fallback.close()
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                return response
+            if fallback is not None:
+                fallback.close()
+            fallback = response
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+def _count_stream_failures(response, breaker):
+    """Record a failure on the breaker when reading a streamed body breaks off"""
+    iter_content = response.iter_content
+
+    def guarded_iter_content(*args, **kwargs):
+        try:
+            yield from iter_content(*args, **kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+
+    response.iter_content = guarded_iter_content
+    return response
+
+
+def http_request(method, url, endpoint=None, session=None, hedge=None, **kwargs):
+    """session.request() with the endpoint's timeout, circuit breaker and (for GETs) hedging
+
+    session defaults to a plain requests call; endpoint defaults to endpoint_for(url).
+    """
+    endpoint = endpoint or endpoint_for(url)
+    breaker = get_breaker(endpoint)
+    kwargs.setdefault('timeout', TIMEOUTS.get(endpoint, TIMEOUTS['graph']))
+    send_request = (session or requests).request
+
+    def send():
+        return send_request(method, url, **kwargs)
+
+    state = breaker.allow()
+    delay = None
+    if (HEDGE if hedge is None else hedge) and state == CLOSED and method == 'GET' and not kwargs.get('stream'):
+        delay = breaker.p95()
+
+    started = time.monotonic()
+    try:
+        response = _hedged(breaker, send, delay) if delay else send()
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success(time.monotonic() - started)
+    if kwargs.get('stream'):
+        return _count_stream_failures(response, breaker)
+    return response
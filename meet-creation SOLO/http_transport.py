@@ -0,0 +1,160 @@
+"""
+Connection handling for Graph and the token endpoint
+
+One session carries the requests to both hosts (graph_client.session), so
+the connections opened for one call are reused by the next:
+
+- HTTP/2 (GRAPH_HTTP2=1, needs `pip install httpx[http2]`): the session is
+  an httpx client speaking HTTP/2, so concurrent requests from threads are
+  multiplexed as streams over one connection per host instead of one
+  connection each. Without httpx it stays a requests.Session (HTTP/1.1,
+  pooled keep-alive connections).
+- Pre-warming (GRAPH_PREWARM, on by default): prewarm() opens the
+  login.microsoftonline.com and graph.microsoft.com connections in parallel,
+  so a short command pays DNS + TCP + TLS once, not once per host in turn.
+- Keep-alive pings: start_keepalive() sends a HEAD to each host every
+  KEEPALIVE_INTERVAL seconds, so a long-running server does not find its
+  connections closed by the other end when a notification comes in.
+
+Http2Session answers with responses that behave like requests' for the parts
+this code uses (status_code, headers, json(), text, content, iter_content,
+with-blocks) and raises requests' Timeout/ConnectionError, so callers and
+http_resilience work the same with either session.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from settings import GRAPH_HTTP2
+
+# httpx is only imported when HTTP/2 is switched on, to keep command startup fast
+httpx = None
+if GRAPH_HTTP2:
+    try:
+        import httpx
+    except ImportError:
+        pass
+
+GRAPH_ORIGIN = "https://graph.microsoft.com/"
+LOGIN_ORIGIN = "https://login.microsoftonline.com/"
+WARM_URLS = (LOGIN_ORIGIN, GRAPH_ORIGIN)
+WARM_TIMEOUT = 5
+KEEPALIVE_INTERVAL = int(os.getenv("HTTP_KEEPALIVE_INTERVAL", "60"))
+
+
+class Http2Response:
+    """An httpx response with the requests.Response methods used here"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    @property
+    def content(self):
+        return self._read().content
+
+    @property
+    def text(self):
+        return self._read().text
+
+    def json(self):
+        return self._read().json()
+
+    def _read(self):
+        try:
+            self._response.read()
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return self._response
+
+    def iter_content(self, chunk_size=None):
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+
+    def close(self):
+        self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Http2Session:
+    """The requests.Session.request() interface on an HTTP/2 httpx client"""
+
+    def __init__(self, pool_size=10):
+        self.client = httpx.Client(http2=True, follow_redirects=True,
+                                   limits=httpx.Limits(max_connections=pool_size,
+                                                       max_keepalive_connections=pool_size))
+
+    def request(self, method, url, params=None, data=None, json=None, headers=None, timeout=None,
+                stream=False):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        request = self.client.build_request(method, url, params=params, data=data, json=json, headers=headers,
+                                            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+        try:
+            return Http2Response(self.client.send(request, stream=stream))
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+
+    def close(self):
+        self.client.close()
+
+
+def new_session(pool_size=10, http2=GRAPH_HTTP2):
+    """HTTP/2 session when asked for and httpx is installed, otherwise a pooled requests.Session"""
+    if http2 and httpx is not None:
+        return Http2Session(pool_size)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    return session
+
+
+def _touch(session, url):
+    started = time.monotonic()
+    try:
+        response = session.request('HEAD', url, timeout=WARM_TIMEOUT)
+        response.close()
+    except requests.RequestException:
+        return None
+    return time.monotonic() - started
+
+
+def prewarm(session, urls=WARM_URLS):
+    """Open a connection to each URL's host in parallel; returns {url: seconds or None}"""
+    with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+        return dict(zip(urls, executor.map(lambda url: _touch(session, url), urls)))
+
+
+def start_keepalive(get_session, interval=KEEPALIVE_INTERVAL, urls=WARM_URLS):
+    """Ping each host every interval seconds from a daemon thread; returns a stop Event
+
+    get_session is called on every round, so a session replaced by
+    graph_client.reset_session() is the one kept warm.
+    """
+    stop = threading.Event()
+
+    def ping():
+        while not stop.wait(interval):
+            prewarm(get_session(), urls)
+
+    threading.Thread(target=ping, name='http-keepalive', daemon=True).start()
+    return stop
@@ -0,0 +1,346 @@
+"""
+Durable local job queue
+
+Work (meeting creation, transcript downloads, subscription renewals,
+post-processing) is recorded in a SQLite table before it is done, so a run
+that dies part-way resumes where it stopped instead of starting over.
+
+A worker leases a job for a limited time, then acks it (done) or fails it
+(retried later with exponential backoff, until max_attempts). Leases that
+run out - because the worker crashed or hung - make the job available again;
+leases held by dead processes on this machine are reclaimed immediately.
+The database runs in WAL mode and leases are taken in an IMMEDIATE
+transaction, so several worker processes can drain one queue concurrently.
+
+Jobs can carry a dedupe key: enqueueing a key that already exists is a no-op,
+which makes re-enqueueing after a restart safe.
+
+Bursts of events about the same thing (a meeting's transcript notifications)
+are coalesced by group: enqueue_coalesced schedules one job a window ahead
+and folds every further call into it until a worker starts it. claim_group
+lets a process that does the work itself (the poller) take the group's
+window instead, so the same group is not also handled by a queued job.
+"""
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+
+from settings import JOB_QUEUE_DB
+
+JOB_QUEUE_PATH = JOB_QUEUE_DB
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+# Retry delay: BACKOFF_BASE * 2**(attempt - 1), capped, with jitter
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    __slots__ = ('id', 'kind', 'payload', 'key', 'attempts', 'max_attempts')
+
+    id: int
+    kind: str
+    payload: dict
+    key: str
+    attempts: int
+    max_attempts: int
+
+
+def worker_name():
+    """'host:pid' identifying this process as a lease owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed queue; open one per process"""
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        # Transactions are managed explicitly (BEGIN IMMEDIATE) below
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                key TEXT UNIQUE,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, run_at);
+            CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (state, lease_expires);
+            CREATE TABLE IF NOT EXISTS coalesce_groups (
+                name TEXT PRIMARY KEY,
+                scheduled_at REAL,
+                started_at REAL
+            );
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self):
+        return _Immediate(self.conn)
+
+    def enqueue(self, kind, payload, key=None, delay=0, max_attempts=MAX_ATTEMPTS, requeue=False):
+        """Add a job; returns its id, or None if a job with this key already exists
+
+        With requeue, an existing done or failed job with the same key is queued
+        again (fresh attempts, new payload); queued or leased jobs are left alone.
+        """
+        now = time.time()
+        with self._transaction():
+            cursor = self.conn.execute("""
+                INSERT OR IGNORE INTO jobs (kind, payload, key, max_attempts, run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (kind, json.dumps(payload), key, max_attempts, now + delay, now, now))
+            if cursor.rowcount:
+                return cursor.lastrowid
+            if not (requeue and key):
+                return None
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND state IN ('done', 'failed')", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("""
+                UPDATE jobs SET state = 'queued', payload = ?, attempts = 0, max_attempts = ?,
+                                run_at = ?, last_error = NULL, updated_at = ?
+                WHERE id = ?
+            """, (json.dumps(payload), max_attempts, now + delay, now, row['id']))
+            return row['id']
+
+    def enqueue_coalesced(self, kind, payload, group, window, max_attempts=MAX_ATTEMPTS):
+        """Queue one job per group per window; returns its id, or None if folded into a pending one
+
+        The first call schedules the job window seconds out, so the rest of a burst
+        lands in it; calls until a worker starts it (start_group) are no-ops. A job
+        that has not started within LEASE_SECONDS of its slot no longer absorbs calls.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT scheduled_at FROM coalesce_groups WHERE name = ?", (group,)).fetchone()
+            if row and row['scheduled_at'] and row['scheduled_at'] > now - LEASE_SECONDS:
+                return None
+            run_at = now + window
+            cursor = self.conn.execute("""
+                INSERT OR IGNORE INTO jobs (kind, payload, key, max_attempts, run_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (kind, json.dumps(payload), f"{group}@{run_at:.3f}", max_attempts, run_at, now, now))
+            self.conn.execute("""
+                INSERT INTO coalesce_groups (name, scheduled_at) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET scheduled_at = excluded.scheduled_at
+            """, (group, run_at))
+            return cursor.lastrowid
+
+    def start_group(self, group):
+        """Called by the coalesced job as it starts: later calls schedule a new job"""
+        now = time.time()
+        with self._transaction():
+            self.conn.execute("""
+                INSERT INTO coalesce_groups (name, scheduled_at, started_at) VALUES (?, NULL, ?)
+                ON CONFLICT (name) DO UPDATE SET scheduled_at = NULL, started_at = excluded.started_at
+            """, (group, now))
+
+    def claim_group(self, group, window):
+        """Take the group's window to do its work in-process; False if a job is pending or it ran recently"""
+        now = time.time()
+        with self._transaction():
+            row = self.conn.execute(
+                "SELECT scheduled_at, started_at FROM coalesce_groups WHERE name = ?", (group,)).fetchone()
+            if row:
+                if row['scheduled_at'] and row['scheduled_at'] > now - LEASE_SECONDS:
+                    return False
+                if row['started_at'] and row['started_at'] > now - window:
+                    return False
+            self.conn.execute("""
+                INSERT INTO coalesce_groups (name, scheduled_at, started_at) VALUES (?, NULL, ?)
+                ON CONFLICT (name) DO UPDATE SET scheduled_at = NULL, started_at = excluded.started_at
+            """, (group, now))
+            return True
+
+    def lease(self, owner=None, kinds=None, lease_seconds=LEASE_SECONDS):
+        """Claim the next runnable job (or one whose lease ran out); None when idle"""
+        owner = owner or worker_name()
+        now = time.time()
+        kind_filter, params = '', [now, now]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params += list(kinds)
+
+        with self._transaction():
+            while True:
+                row = self.conn.execute(f"""
+                    SELECT * FROM jobs
+                    WHERE ((state = 'queued' AND run_at <= ?) OR (state = 'leased' AND lease_expires <= ?))
+                    {kind_filter}
+                    ORDER BY run_at, id
+                    LIMIT 1
+                """, params).fetchone()
+                if row is None:
+                    return None
+                # A job that keeps killing (or hanging) its worker is not retried forever
+                if row['state'] == LEASED and row['attempts'] >= row['max_attempts']:
+                    self.conn.execute("""
+                        UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_expires = NULL,
+                                        last_error = 'lease expired', updated_at = ?
+                        WHERE id = ?
+                    """, (now, row['id']))
+                    continue
+                break
+            self.conn.execute("""
+                UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?,
+                                lease_expires = ?, updated_at = ?
+                WHERE id = ?
+            """, (owner, now + lease_seconds, now, row['id']))
+
+        return Job(id=row['id'], kind=row['kind'], payload=json.loads(row['payload']), key=row['key'],
+                   attempts=row['attempts'] + 1, max_attempts=row['max_attempts'])
+
+    def extend(self, job, owner=None, lease_seconds=LEASE_SECONDS):
+        """Push a long-running job's lease out; False if the lease was lost"""
+        now = time.time()
+        with self._transaction():
+            cursor = self.conn.execute("""
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (now + lease_seconds, now, job.id, owner or worker_name()))
+        return cursor.rowcount == 1
+
+    def ack(self, job, owner=None):
+        """Mark a leased job done"""
+        with self._transaction():
+            cursor = self.conn.execute("""
+                UPDATE jobs SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                                last_error = NULL, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (time.time(), job.id, owner or worker_name()))
+        return cursor.rowcount == 1
+
+    def fail(self, job, error, owner=None, retry=True):
+        """Record a failure: retry after a backoff, or give up after max_attempts"""
+        now = time.time()
+        give_up = not retry or job.attempts >= job.max_attempts
+        with self._transaction():
+            cursor = self.conn.execute("""
+                UPDATE jobs SET state = ?, run_at = ?, lease_owner = NULL, lease_expires = NULL,
+                                last_error = ?, updated_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, (FAILED if give_up else QUEUED, now + (0 if give_up else backoff_delay(job.attempts)),
+                  str(error)[:2000], now, job.id, owner or worker_name()))
+        return cursor.rowcount == 1
+
+    def reclaim_dead_leases(self):
+        """Requeue jobs leased by processes on this host that no longer exist (fail those out of attempts)"""
+        host = socket.gethostname()
+        reclaimed = 0
+        with self._transaction():
+            rows = self.conn.execute(
+                "SELECT id, lease_owner, attempts, max_attempts FROM jobs "
+                "WHERE state = 'leased' AND lease_owner LIKE ?", (host + ':%',)).fetchall()
+            for row in rows:
+                pid = int(row['lease_owner'].rsplit(':', 1)[1])
+                if not _process_alive(pid):
+                    # A job that keeps killing its worker gives up like one whose lease keeps running out
+                    if row['attempts'] >= row['max_attempts']:
+                        self.conn.execute("""
+                            UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_expires = NULL,
+                                            last_error = 'lease expired', updated_at = ?
+                            WHERE id = ?
+                        """, (time.time(), row['id']))
+                    else:
+                        self.conn.execute("""
+                            UPDATE jobs SET state = 'queued', run_at = ?, lease_owner = NULL, lease_expires = NULL
+                            WHERE id = ?
+                        """, (time.time(), row['id']))
+                    reclaimed += 1
+        return reclaimed
+
+    def retry_failed(self, kinds=None):
+        """Give failed jobs another full set of attempts"""
+        kind_filter, params = '', [time.time()]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params += list(kinds)
+        with self._transaction():
+            cursor = self.conn.execute(f"""
+                UPDATE jobs SET state = 'queued', attempts = 0, run_at = ?
+                WHERE state = 'failed' {kind_filter}
+            """, params)
+        return cursor.rowcount
+
+    def counts(self):
+        """{(kind, state): count}"""
+        return {(row[0], row[1]): row[2] for row in self.conn.execute(
+            "SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state")}
+
+    def failed_jobs(self, limit=20):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT id, kind, key, attempts, last_error FROM jobs WHERE state = 'failed' "
+            "ORDER BY updated_at DESC LIMIT ?", (limit,))]
+
+    def purge_done(self, older_than=7 * 86400):
+        """Delete finished jobs (their keys can then be enqueued again)"""
+        with self._transaction():
+            cursor = self.conn.execute("DELETE FROM jobs WHERE state = 'done' AND updated_at < ?",
+                                       (time.time() - older_than,))
+            self.conn.execute("DELETE FROM coalesce_groups WHERE scheduled_at IS NULL AND started_at < ?",
+                              (time.time() - older_than,))
+        return cursor.rowcount
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK, taking the write lock up front"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, *exc_info):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
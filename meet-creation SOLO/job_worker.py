@@ -0,0 +1,306 @@
+"""
+Workers for the durable job queue (job_queue.py)
+
+Job kinds and their payloads:
+
+- create_meeting: {subject, start, end} - idempotent via Graph createOrGet,
+  keyed on the job, so a retry after a crash returns the same meeting
+- download_transcript: {meeting_id, transcript_id, created, user_id?, tenant_id?}
+  - saves, archives and indexes, then queues post-processing
+- postprocess: {meeting_id, transcript_id, file} - TXT/JSON/SRT conversion
+- renew_subscription: {subscription_id}
+- download_recording: {meeting_id, recording_id, user_id?, tenant_id?} -
+  parallel ranged download that resumes from its checkpoint on retry
+- sync_meeting: {meeting_id, user_id?, tenant_id?} - list the meeting's
+  transcripts once and queue downloads for the new ones. Queued through
+  request_meeting_sync, which folds every event for a meeting within
+  COALESCE_WINDOW seconds into one job
+
+Handlers are plain functions registered in HANDLERS (register_handler adds
+more). Run several worker processes with:
+
+    python job_worker.py 4          # drain the queue with 4 processes, then exit
+    python job_worker.py 4 --follow # keep polling for new jobs
+"""
+
+import multiprocessing
+import sys
+import time
+
+from app_auth import get_app_token
+from delegated_auth import DELEGATED_SCOPE, current_access_token
+import graph_client
+from graph_client import GraphError, graph_send, iter_transcripts, require_permission
+from graph_models import OnlineMeeting
+from http_resilience import breaker_metrics
+from job_queue import JOB_QUEUE_PATH, LEASE_SECONDS, JobQueue, worker_name
+from manifest import is_downloaded, load_manifest, manifest_key, record_entry
+from meeting_catalog import record_created_meeting
+from postprocess import FORMATS, convert_transcript
+from recording_download import RECORDING_SCOPE, download_recording
+from settings import COALESCE_WINDOW
+from subscriptions import renew_subscription
+from transcript_download import download_transcript_content, store_downloaded_transcript, transfer_stats
+
+# Seconds between polls for new jobs when following the queue
+POLL_INTERVAL = 5
+
+
+class PermanentJobError(Exception):
+    """A job that cannot succeed on retry (bad payload, 403, 404...)"""
+
+
+def job_access_token(payload, context, scope=DELEGATED_SCOPE):
+    """Token for a job: app-only for payloads with tenant_id, otherwise the signed-in user's
+
+    The saved delegated token is reused until its claims show it about to
+    expire (or missing one of the scopes), so most jobs make no token request.
+    """
+    if payload.get('tenant_id'):
+        return get_app_token(payload['tenant_id'])
+    if context.get('access_token'):
+        return context['access_token']
+    token = current_access_token(scope)
+    if not token:
+        raise RuntimeError("Could not refresh the access token")
+    return token
+
+
+def download_key(meeting_id, transcript_id):
+    return f"download:{meeting_id}/{transcript_id}"
+
+
+def meeting_group(meeting_id):
+    return f"meeting:{meeting_id}"
+
+
+def request_meeting_sync(queue, meeting_id, user_id=None, tenant_id=None, window=COALESCE_WINDOW):
+    """Ask for the meeting's transcripts to be listed; returns the job id, or None if coalesced"""
+    payload = {'meeting_id': meeting_id}
+    if user_id:
+        payload['user_id'] = user_id
+    if tenant_id:
+        payload['tenant_id'] = tenant_id
+    return queue.enqueue_coalesced('sync_meeting', payload, meeting_group(meeting_id), window)
+
+
+def handle_create_meeting(job, context):
+    payload = job.payload
+    access_token = job_access_token(payload, context)
+    require_permission(access_token, 'meetings_write')
+    meeting_data = graph_send(access_token, 'POST', "me/onlineMeetings/createOrGet", {
+        "externalId": f"job-{job.key or job.id}",
+        "subject": payload.get('subject', "API Created Meeting"),
+        "startDateTime": payload['start'],
+        "endDateTime": payload['end']
+    })
+    record_created_meeting(OnlineMeeting.from_graph(meeting_data))
+
+
+def handle_download_transcript(job, context):
+    payload = job.payload
+    meeting_id, transcript_id = payload['meeting_id'], payload['transcript_id']
+    content = download_transcript_content(job_access_token(payload, context), meeting_id, transcript_id,
+                                          user_id=payload.get('user_id'))
+    if not content:
+        raise RuntimeError("Transcript content could not be downloaded")
+
+    post_processor = context.get('post_processor')
+    filename = store_downloaded_transcript(content, meeting_id, transcript_id,
+                                           payload.get('created') or 'Unknown', post_processor)
+    if not filename:
+        raise RuntimeError("Transcript could not be saved")
+    if post_processor is None:
+        context['queue'].enqueue('postprocess', {
+            'meeting_id': meeting_id, 'transcript_id': transcript_id, 'file': filename
+        }, key=f"postprocess:{meeting_id}/{transcript_id}")
+
+
+def handle_postprocess(job, context):
+    payload = job.payload
+    formats = [(name, extension, converter) for name, (extension, converter) in FORMATS.items()]
+    outputs = convert_transcript(payload['file'], formats)
+    record_entry(payload['meeting_id'], payload['transcript_id'], outputs=outputs)
+
+
+def handle_renew_subscription(job, context):
+    renew_subscription(job_access_token(job.payload, context), job.payload['subscription_id'])
+
+
+def handle_download_recording(job, context):
+    payload = job.payload
+    queue, owner = context['queue'], context.get('owner')
+    extended_at = [time.time()]
+
+    def keep_lease(done_bytes, total_bytes):
+        # A large recording outlives one lease; keep it so no other worker starts the same file.
+        # download_content calls this on this thread, which owns the queue's connection
+        if time.time() - extended_at[0] > LEASE_SECONDS / 3:
+            queue.extend(job, owner=owner)
+            extended_at[0] = time.time()
+
+    access_token = job_access_token(payload, context, scope=f"{DELEGATED_SCOPE} {RECORDING_SCOPE}")
+    download_recording(access_token, payload['meeting_id'], payload['recording_id'],
+                       user_id=payload.get('user_id'), progress=keep_lease)
+
+
+def handle_sync_meeting(job, context):
+    payload = job.payload
+    meeting_id = payload['meeting_id']
+    queue = context['queue']
+    # Events from here on schedule a new listing, as this one may already be too early for them
+    queue.start_group(meeting_group(meeting_id))
+
+    manifest = load_manifest()
+    queued = 0
+    for transcript in iter_transcripts(job_access_token(payload, context), meeting_id, use_cache=False,
+                                       user_id=payload.get('user_id')):
+        if is_downloaded(manifest.get(manifest_key(meeting_id, transcript.id))):
+            continue
+        download = {'meeting_id': meeting_id, 'transcript_id': transcript.id, 'created': transcript.created}
+        for field in ('user_id', 'tenant_id'):
+            if payload.get(field):
+                download[field] = payload[field]
+        if queue.enqueue('download_transcript', download, key=download_key(meeting_id, transcript.id)):
+            queued += 1
+    if queued:
+        print(f"📥 Meeting {meeting_id[:30]}...: queued {queued} transcript download(s)")
+
+
+HANDLERS = {
+    'create_meeting': handle_create_meeting,
+    'download_transcript': handle_download_transcript,
+    'postprocess': handle_postprocess,
+    'renew_subscription': handle_renew_subscription,
+    'download_recording': handle_download_recording,
+    'sync_meeting': handle_sync_meeting,
+}
+
+# Payload fields each job kind cannot run without; a job missing one fails permanently
+REQUIRED_FIELDS = {
+    'create_meeting': ('start', 'end'),
+    'download_transcript': ('meeting_id', 'transcript_id'),
+    'postprocess': ('meeting_id', 'transcript_id', 'file'),
+    'renew_subscription': ('subscription_id',),
+    'download_recording': ('meeting_id', 'recording_id'),
+    'sync_meeting': ('meeting_id',),
+}
+
+
+def register_handler(kind, handler, required_fields=()):
+    """Add or replace the handler for a job kind"""
+    HANDLERS[kind] = handler
+    REQUIRED_FIELDS[kind] = tuple(required_fields)
+
+
+def validate_payload(job):
+    missing = [field for field in REQUIRED_FIELDS.get(job.kind, ()) if not job.payload.get(field)]
+    if missing:
+        raise PermanentJobError(f"Payload is missing {', '.join(missing)}")
+
+
+def run_job(queue, job, context, owner=None):
+    """Run one leased job and ack or fail it; returns True on success"""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No handler for job kind '{job.kind}'")
+        validate_payload(job)
+        handler(job, context)
+    except PermanentJobError as e:
+        queue.fail(job, f"{type(e).__name__}: {e}", owner=owner, retry=False)
+        print(f"❌ Job {job.id} ({job.kind}) failed permanently: {e}")
+        return False
+    except GraphError as e:
+        # 400/403/404 will not change on retry; throttling and 5xx will
+        retry = e.status_code not in (400, 403, 404)
+        queue.fail(job, f"{e} {e.payload}", owner=owner, retry=retry)
+        print(f"❌ Job {job.id} ({job.kind}) attempt {job.attempts}: {e}")
+        return False
+    except Exception as e:
+        queue.fail(job, f"{type(e).__name__}: {e}", owner=owner)
+        print(f"❌ Job {job.id} ({job.kind}) attempt {job.attempts}: {e}")
+        return False
+
+    queue.ack(job, owner=owner)
+    return True
+
+
+def drain(queue, kinds=None, context=None, follow=False, owner=None):
+    """Lease and run jobs until none are runnable (or forever with follow); returns (done, failed)"""
+    context = dict(context or {})
+    owner = owner or worker_name()
+    context['queue'] = queue
+    context['owner'] = owner
+    done = failed = 0
+    while True:
+        job = queue.lease(owner, kinds=kinds)
+        if job is None:
+            if not follow:
+                return done, failed
+            time.sleep(POLL_INTERVAL)
+            continue
+        if run_job(queue, job, context, owner=owner):
+            done += 1
+        else:
+            failed += 1
+
+
+def worker_process(path=JOB_QUEUE_PATH, kinds=None, follow=False):
+    """Entry point of one worker process"""
+    # A forked process must not share the parent's connections
+    graph_client.reset_session()
+    if follow:
+        graph_client.keep_connections_warm()
+    with JobQueue(path) as queue:
+        done, failed = drain(queue, kinds=kinds, follow=follow)
+    print(f"Worker {worker_name()}: {done} done, {failed} failed")
+    if transfer_stats.summary():
+        print(f"  Transcripts: {transfer_stats.summary()}")
+    for endpoint, stats in breaker_metrics().items():
+        if stats['failures'] or stats['rejected']:
+            print(f"  {endpoint}: breaker {stats['state']}, {stats['failures']} failed, "
+                  f"{stats['rejected']} rejected, opened {stats['opened']}x")
+
+
+def run_workers(count, path=JOB_QUEUE_PATH, kinds=None, follow=False):
+    """Drain the queue with count worker processes"""
+    with JobQueue(path) as queue:
+        reclaimed = queue.reclaim_dead_leases()
+    if reclaimed:
+        print(f"Reclaimed {reclaimed} job(s) left by stopped workers")
+
+    processes = [multiprocessing.Process(target=worker_process, args=(path, kinds, follow))
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def print_status(path=JOB_QUEUE_PATH):
+    with JobQueue(path) as queue:
+        counts = queue.counts()
+        failed = queue.failed_jobs()
+    for (kind, state), count in sorted(counts.items()):
+        print(f"  {kind:<20} {state:<8} {count}")
+    for job in failed:
+        print(f"  ❌ {job['kind']} {job['key'] or job['id']}: {job['last_error']}")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    count = int(args[0]) if args else 1
+    if '--status' in sys.argv:
+        print_status()
+        return
+    if '--retry-failed' in sys.argv:
+        with JobQueue() as queue:
+            print(f"Requeued {queue.retry_failed()} failed job(s)")
+
+    run_workers(count, follow='--follow' in sys.argv)
+    print_status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Transcript manifest
+
+An append-only JSON Lines log under transcripts/ recording what has been
+downloaded and produced for each (meeting, transcript). Later lines update
+earlier ones, so a run that dies halfway loses nothing it already recorded and
+the next run can pick up where it stopped.
+"""
+
+import json
+import os
+from datetime import datetime
+
+MANIFEST_PATH = os.path.join('transcripts', 'manifest.jsonl')
+
+
+def manifest_key(meeting_id, transcript_id):
+    return f"{meeting_id}/{transcript_id}"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Fold the manifest log into {key: entry}"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted write
+                continue
+            key = manifest_key(record['meeting_id'], record['transcript_id'])
+            entry = entries.setdefault(key, {})
+            outputs = record.pop('outputs', None)
+            entry.update(record)
+            if outputs:
+                entry.setdefault('outputs', {}).update(outputs)
+    return entries
+
+
+def record_entry(meeting_id, transcript_id, path=MANIFEST_PATH, **fields):
+    """Append an update for one transcript to the manifest"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    record = {
+        'meeting_id': meeting_id,
+        'transcript_id': transcript_id,
+        **fields,
+        'updated_at': datetime.utcnow().isoformat()
+    }
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
+
+
+def is_downloaded(entry):
+    """True when the manifest entry points at a file that still exists"""
+    return bool(entry) and bool(entry.get('file')) and os.path.exists(entry['file'])
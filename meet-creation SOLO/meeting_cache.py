@@ -0,0 +1,120 @@
+"""
+Read-through cache for Graph meeting metadata and transcript listings
+
+Entries live in an in-memory LRU with a per-entry TTL. 404 responses are
+cached too (negative caching) so a missing meeting is not re-requested on
+every check. When a SQLite path is given, entries are also written to disk so
+later runs start warm. The SQLite connection is opened on first use in each
+process, so forked job workers never share their parent's connection.
+
+Keys for 'me/...' paths are not user-scoped: use one cache file per signed-in
+user. 'users/{id}/...' keys (app-only mode) are.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() when nothing usable is cached
+MISSING = object()
+# Stored (and returned by get()) for cached 404s
+NOT_FOUND = object()
+
+
+class MeetingCache:
+    """TTL + LRU cache with negative entries and an optional SQLite tier"""
+
+    def __init__(self, max_entries=2048, db_path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.db_path = db_path
+        self._db = None
+        self._db_pid = None
+
+    @property
+    def db(self):
+        """This process's SQLite connection (opened lazily, again after a fork), or None"""
+        if not self.db_path:
+            return None
+        if self._db_pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS graph_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.commit()
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _remember(self, key, expires_at, value):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        """Cached value, NOT_FOUND for a cached 404, or MISSING"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires_at FROM graph_cache WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    value = NOT_FOUND if row[0] is None else json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl):
+        """Cache a JSON-serialisable value (or NOT_FOUND) for ttl seconds"""
+        expires_at = time.time() + ttl
+        with self.lock:
+            self._remember(key, expires_at, value)
+            if self.db is not None:
+                stored = None if value is NOT_FOUND else json.dumps(value)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO graph_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, stored, expires_at))
+                self.db.commit()
+
+    def set_missing(self, key, ttl):
+        """Negative-cache a 404"""
+        self.set(key, NOT_FOUND, ttl)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            if self.db is not None:
+                self.db.execute("DELETE FROM graph_cache WHERE key = ?", (key,))
+                self.db.commit()
+
+    def purge_expired(self):
+        """Drop expired rows from the SQLite tier"""
+        if self.db is None:
+            return 0
+        with self.lock:
+            cursor = self.db.execute("DELETE FROM graph_cache WHERE expires_at <= ?", (time.time(),))
+            self.db.commit()
+            return cursor.rowcount
@@ -0,0 +1,192 @@
+"""
+Local catalog of meetings created through this SDK
+
+create_teams_meeting records every meeting it creates in an indexed SQLite
+table, so the poller, puller and diagnostics can resolve the meetings to watch
+(or look one up by join id / time window) without listing /subscriptions and
+parsing resource strings.
+
+Transcript states: 'pending' (nothing found yet), 'available' (Graph lists
+transcripts), 'downloaded' (pulled locally).
+
+The same database keeps the registry of our change-notification
+subscriptions and the clientState secret each was created with, which the
+webhook server checks every notification against.
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+from settings import MEETING_CATALOG_DB
+
+CATALOG_PATH = MEETING_CATALOG_DB
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Columns find_many() may look meetings up by (all indexed)
+LOOKUP_COLUMNS = ('meeting_id', 'join_meeting_id', 'join_url')
+# Stay under SQLite's default host-parameter limit
+LOOKUP_CHUNK = 500
+
+
+def normalize_time(value):
+    """Graph timestamps (any precision, Z or offset) or datetimes -> sortable UTC string"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = value.replace('Z', '+00:00')
+        # fromisoformat only accepts up to 6 fractional digits; Graph sends 7
+        if '.' in text:
+            head, _, tail = text.partition('.')
+            digits = ''.join(c for c in tail if c.isdigit())
+            text = head + '.' + digits[:6] + tail[len(digits):]
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(TIME_FORMAT)
+
+
+class MeetingCatalog:
+    """Indexed SQLite catalog of created meetings"""
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meetings (
+                meeting_id TEXT PRIMARY KEY,
+                join_meeting_id TEXT,
+                join_url TEXT,
+                subject TEXT,
+                start_time TEXT,
+                end_time TEXT,
+                created_at TEXT NOT NULL,
+                transcript_state TEXT NOT NULL DEFAULT 'pending',
+                transcript_checked_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS meetings_join_meeting_id ON meetings (join_meeting_id);
+            CREATE INDEX IF NOT EXISTS meetings_join_url ON meetings (join_url);
+            CREATE INDEX IF NOT EXISTS meetings_start_time ON meetings (start_time);
+            CREATE INDEX IF NOT EXISTS meetings_state_end_time ON meetings (transcript_state, end_time);
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                subscription_id TEXT PRIMARY KEY,
+                resource TEXT,
+                client_state TEXT NOT NULL,
+                recorded_at TEXT NOT NULL
+            );
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def record_meeting(self, meeting):
+        """Insert or update a meeting from an OnlineMeeting model"""
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO meetings (meeting_id, join_meeting_id, join_url, subject, start_time, end_time, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (meeting_id) DO UPDATE SET
+                    join_meeting_id = excluded.join_meeting_id,
+                    join_url = excluded.join_url,
+                    subject = excluded.subject,
+                    start_time = excluded.start_time,
+                    end_time = excluded.end_time
+            """, (meeting.id, meeting.join_meeting_id, meeting.join_url, meeting.subject,
+                  normalize_time(meeting.start), normalize_time(meeting.end),
+                  normalize_time(meeting.created) or normalize_time(datetime.utcnow())))
+
+    def set_transcript_state(self, meeting_id, state):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE meetings SET transcript_state = ?, transcript_checked_at = ? WHERE meeting_id = ?",
+                (state, normalize_time(datetime.utcnow()), meeting_id))
+
+    def record_subscription(self, subscription_id, resource, client_state):
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO subscriptions (subscription_id, resource, client_state, recorded_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (subscription_id) DO UPDATE SET
+                    resource = excluded.resource,
+                    client_state = excluded.client_state
+            """, (subscription_id, resource, client_state, normalize_time(datetime.utcnow())))
+
+    def subscription_client_state(self, subscription_id):
+        """clientState a subscription of ours was created with, or None for unknown subscriptions"""
+        row = self.conn.execute("SELECT client_state FROM subscriptions WHERE subscription_id = ?",
+                                (subscription_id,)).fetchone()
+        return row[0] if row else None
+
+    def forget_subscription(self, subscription_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM subscriptions WHERE subscription_id = ?", (subscription_id,))
+
+    def _rows(self, query, params=()):
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def get(self, meeting_id):
+        rows = self._rows("SELECT * FROM meetings WHERE meeting_id = ?", (meeting_id,))
+        return rows[0] if rows else None
+
+    def find_by_join_meeting_id(self, join_meeting_id):
+        rows = self._rows("SELECT * FROM meetings WHERE join_meeting_id = ?", (join_meeting_id,))
+        return rows[0] if rows else None
+
+    def find_by_join_url(self, join_url):
+        rows = self._rows("SELECT * FROM meetings WHERE join_url = ?", (join_url,))
+        return rows[0] if rows else None
+
+    def find_many(self, column, values):
+        """{value: meeting_id} for every value found in an indexed lookup column"""
+        if column not in LOOKUP_COLUMNS:
+            raise ValueError(f"Cannot look meetings up by {column}")
+        values = list(dict.fromkeys(values))
+        found = {}
+        for offset in range(0, len(values), LOOKUP_CHUNK):
+            chunk = values[offset:offset + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                    f"SELECT {column}, meeting_id FROM meetings WHERE {column} IN ({placeholders})", chunk):
+                found[row[0]] = row[1]
+        return found
+
+    def meetings_between(self, start, end):
+        """Meetings starting in [start, end), oldest first"""
+        return self._rows(
+            "SELECT * FROM meetings WHERE start_time >= ? AND start_time < ? ORDER BY start_time",
+            (normalize_time(start), normalize_time(end)))
+
+    def latest(self, limit=10):
+        """Most recently started meetings"""
+        return self._rows("SELECT * FROM meetings ORDER BY start_time DESC LIMIT ?", (limit,))
+
+    def meetings_to_watch(self, ended_since, states=('pending', 'available')):
+        """Meetings still waiting on transcripts that ended after ended_since"""
+        placeholders = ','.join('?' * len(states))
+        return self._rows(
+            f"SELECT * FROM meetings WHERE transcript_state IN ({placeholders}) AND end_time >= ? "
+            f"ORDER BY end_time",
+            (*states, normalize_time(ended_since)))
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+
+
+def record_created_meeting(meeting, path=CATALOG_PATH):
+    """Add a newly created meeting to the catalog"""
+    try:
+        with MeetingCatalog(path) as catalog:
+            catalog.record_meeting(meeting)
+        return True
+    except Exception as e:
+        print(f"Error recording meeting in catalog: {e}")
+        return False
@@ -0,0 +1,79 @@
+"""
+Resolve what users have in hand to a Graph meeting id
+
+A meeting can be referred to by its Graph id (long base64), its numeric Join
+Meeting ID (as printed by create_meeting_main, spaces allowed) or its join URL.
+References are resolved through the local meeting catalog first; anything not
+in the catalog costs one filtered Graph query, whose result is cached. Bulk
+resolution reads the catalog in a few indexed queries and sends the remaining
+lookups through Graph $batch.
+"""
+
+from graph_client import find_online_meeting, find_online_meetings
+from meeting_catalog import CATALOG_PATH, MeetingCatalog
+
+MEETING_ID = 'meeting_id'
+JOIN_MEETING_ID = 'join_meeting_id'
+JOIN_URL = 'join_url'
+
+
+def classify_reference(reference):
+    """(kind, normalized value) for a meeting id, join meeting id or join URL"""
+    reference = reference.strip()
+    if reference.lower().startswith(('https://', 'http://')):
+        return JOIN_URL, reference
+    compact = reference.replace(' ', '')
+    if compact.isdigit():
+        return JOIN_MEETING_ID, compact
+    return MEETING_ID, reference
+
+
+def resolve_meeting_id(access_token, reference, catalog_path=CATALOG_PATH):
+    """Graph meeting id for any kind of reference, or None if no meeting matches"""
+    kind, value = classify_reference(reference)
+    if kind == MEETING_ID:
+        return value
+
+    with MeetingCatalog(catalog_path) as catalog:
+        found = catalog.find_many(kind, [value])
+    if value in found:
+        return found[value]
+
+    if kind == JOIN_URL:
+        meeting = find_online_meeting(access_token, join_url=value)
+    else:
+        meeting = find_online_meeting(access_token, join_meeting_id=value)
+    return meeting.id if meeting else None
+
+
+def resolve_meeting_ids(access_token, references, catalog_path=CATALOG_PATH):
+    """Bulk resolve_meeting_id(): returns {reference: meeting id or None}
+
+    Duplicate references are resolved once; the catalog is queried per kind,
+    not per row, and Graph lookups are batched.
+    """
+    classified = {reference: classify_reference(reference) for reference in references}
+    by_kind = {JOIN_MEETING_ID: set(), JOIN_URL: set()}
+    for kind, value in classified.values():
+        if kind != MEETING_ID:
+            by_kind[kind].add(value)
+
+    resolved = {}
+    with MeetingCatalog(catalog_path) as catalog:
+        for kind, values in by_kind.items():
+            for value, meeting_id in catalog.find_many(kind, values).items():
+                resolved[kind, value] = meeting_id
+
+    missing_urls = [v for v in by_kind[JOIN_URL] if (JOIN_URL, v) not in resolved]
+    missing_ids = [v for v in by_kind[JOIN_MEETING_ID] if (JOIN_MEETING_ID, v) not in resolved]
+    if missing_urls or missing_ids:
+        meetings = find_online_meetings(access_token, join_urls=missing_urls, join_meeting_ids=missing_ids)
+        for value in missing_urls:
+            resolved[JOIN_URL, value] = meetings[value].id if meetings.get(value) else None
+        for value in missing_ids:
+            resolved[JOIN_MEETING_ID, value] = meetings[value].id if meetings.get(value) else None
+
+    return {
+        reference: value if kind == MEETING_ID else resolved.get((kind, value))
+        for reference, (kind, value) in classified.items()
+    }
@@ -0,0 +1,228 @@
+"""
+Loopback OAuth callback server
+
+Listens on the REDIRECT_URI (e.g. http://localhost:8000/callback) and completes
+authorization-code + PKCE sign-ins as the browser is redirected back, so nobody
+has to paste redirect URLs. Every authorization gets its own random state and
+code verifier; any number can be pending at once, and each completed sign-in
+is written straight into the token store.
+
+    server = LoopbackAuthServer(CLIENT_ID, CLIENT_SECRET, REDIRECT_URI, scope)
+    server.start()
+    state, url = server.begin(login_hint="ann@contoso.com")
+    ...  # user opens url
+    results = server.wait([state], timeout=300)
+    server.stop()
+"""
+
+import base64
+import hashlib
+import html
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import requests
+
+import graph_client
+from graph_client import GraphError, graph_get
+from http_resilience import http_request
+from token_store import TokenStore
+
+AUTHORIZE_URL = "https://login.microsoftonline.com/common/oauth2/v2.0/authorize"
+TOKEN_URL = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
+
+# Unfinished authorizations are dropped after this many seconds
+PENDING_TTL = 900
+
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+def generate_pkce():
+    """(code_verifier, code_challenge) for S256 PKCE"""
+    code_verifier = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
+    code_challenge = base64.urlsafe_b64encode(hashlib.sha256(code_verifier.encode()).digest()).decode('utf-8').rstrip('=')
+    return code_verifier, code_challenge
+
+
+def is_loopback(redirect_uri):
+    """True when the redirect URI points back at this machine"""
+    return urlparse(redirect_uri).hostname in LOOPBACK_HOSTS
+
+
+@dataclass
+class PendingAuthorization:
+    __slots__ = ('state', 'code_verifier', 'login_hint', 'created_at', 'claimed', 'done', 'result', 'error')
+
+    state: str
+    code_verifier: str
+    login_hint: str
+    created_at: float
+    claimed: bool
+    done: threading.Event
+    result: dict
+    error: str
+
+
+class _CallbackHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != self.server.auth.callback_path:
+            self.send_error(404)
+            return
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        ok, message = self.server.auth.complete(query)
+        body = (f"<html><body><h3>{'Signed in' if ok else 'Sign-in failed'}</h3>"
+                f"<p>{html.escape(message)}</p><p>You can close this window.</p></body></html>").encode('utf-8')
+        self.send_response(200 if ok else 400)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Query strings carry authorization codes; keep them out of the console
+        pass
+
+
+class LoopbackAuthServer:
+    """Callback server tracking many concurrent authorizations by state"""
+
+    def __init__(self, client_id, client_secret, redirect_uri, scope, store=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.scope = scope
+        self.store = store if store is not None else TokenStore()
+
+        parsed = urlparse(redirect_uri)
+        self.callback_path = parsed.path or '/'
+        self.address = (parsed.hostname, parsed.port or 80)
+
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(self.address, _CallbackHandler)
+        self.httpd.auth = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _expire(self):
+        cutoff = time.time() - PENDING_TTL
+        for state, pending in list(self.pending.items()):
+            if pending.created_at < cutoff:
+                if not pending.claimed:
+                    pending.error = "Authorization expired"
+                    pending.done.set()
+                del self.pending[state]
+
+    def begin(self, login_hint=None):
+        """Register a new authorization; returns (state, authorization URL)"""
+        code_verifier, code_challenge = generate_pkce()
+        state = secrets.token_urlsafe(24)
+        with self.lock:
+            self._expire()
+            self.pending[state] = PendingAuthorization(
+                state=state, code_verifier=code_verifier, login_hint=login_hint,
+                created_at=time.time(), claimed=False, done=threading.Event(), result=None, error=None)
+
+        params = {
+            'client_id': self.client_id,
+            'response_type': 'code',
+            'redirect_uri': self.redirect_uri,
+            'scope': self.scope,
+            'code_challenge': code_challenge,
+            'code_challenge_method': 'S256',
+            'state': state
+        }
+        if login_hint:
+            params['login_hint'] = login_hint
+        return state, f"{AUTHORIZE_URL}?{urlencode(params)}"
+
+    def complete(self, query):
+        """Handle one redirect: check state, redeem the code, store the tokens"""
+        with self.lock:
+            pending = self.pending.get(query.get('state'))
+            # Each state is redeemable once; replays and unknown states are refused
+            if pending is None or pending.claimed:
+                return False, "Unknown or expired sign-in request."
+            pending.claimed = True
+
+        try:
+            if 'error' in query:
+                pending.error = f"{query['error']}: {query.get('error_description', '')}"
+                return False, query['error']
+
+            tokens = self.exchange_code(query.get('code'), pending.code_verifier)
+            if 'access_token' not in tokens:
+                pending.error = str(tokens)
+                return False, tokens.get('error_description', 'Token request failed.')
+
+            me = graph_get(tokens['access_token'], "me", select=('id', 'displayName', 'mail'))
+            user_info = {'id': me['id'], 'displayName': me.get('displayName', 'Unknown'),
+                         'email': me.get('mail', 'Unknown')}
+            self.store.save(user_info, tokens)
+            pending.result = {'tokens': tokens, 'user_info': user_info}
+            return True, f"{user_info['displayName']} ({user_info['email']})"
+        except ValueError as e:
+            # The token endpoint answered with something other than JSON (a proxy or outage page)
+            pending.error = f"Token endpoint returned a non-JSON response: {e}"
+            return False, "Token request failed."
+        except (requests.RequestException, GraphError) as e:
+            pending.error = str(e)
+            return False, "Could not complete sign-in."
+        finally:
+            pending.done.set()
+
+    def exchange_code(self, auth_code, code_verifier):
+        response = http_request('POST', TOKEN_URL, session=graph_client.session, data={
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'scope': self.scope,
+            'code': auth_code,
+            'redirect_uri': self.redirect_uri,
+            'grant_type': 'authorization_code',
+            'code_verifier': code_verifier
+        })
+        return response.json()
+
+    def wait(self, states, timeout=None):
+        """Block until the given authorizations finish; returns {state: (result, error)}
+
+        Authorizations still open at the timeout are reported with error 'timeout'.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.lock:
+            tracked = {state: self.pending.get(state) for state in states}
+
+        results = {}
+        for state, pending in tracked.items():
+            if pending is None:
+                results[state] = (None, "Unknown or expired")
+                continue
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            if pending.done.wait(remaining):
+                results[state] = (pending.result, pending.error)
+            else:
+                results[state] = (None, 'timeout')
+        return results
@@ -0,0 +1,152 @@
+"""
+Sharding for the transcript poller
+
+Meetings are spread over poller workers with a consistent hash ring: each
+worker owns the meeting ids that hash to its arc, so adding or removing a
+worker only moves about 1/N of the meetings. Workers announce themselves in a
+SQLite lease table (POLLER_DB), renewed from a background thread so a long
+poll cycle never outlives it; a worker whose lease is not renewed drops out
+and the others pick up its meetings on their next cycle. Pointing POLLER_DB
+at a shared file lets workers on several machines split the same meetings.
+
+Each worker also gets its own rate budget (token bucket) for Graph calls.
+"""
+
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from settings import POLLER_DB
+
+# Points per worker on the ring; more points spread meetings more evenly
+VIRTUAL_NODES = 64
+# A worker that has not renewed its lease for this long is considered gone
+MEMBER_TTL = 300
+# Leases are renewed this often, independently of the poll cycle
+HEARTBEAT_INTERVAL = MEMBER_TTL / 3
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring mapping keys (meeting ids) to members (worker ids)"""
+
+    def __init__(self, members, virtual_nodes=VIRTUAL_NODES):
+        self.members = tuple(sorted(members))
+        points = sorted((_hash(f"{member}#{i}"), member)
+                        for member in self.members for i in range(virtual_nodes))
+        self.points = [point for point, _ in points]
+        self.owners = [member for _, member in points]
+
+    def owner(self, key):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, _hash(key)) % len(self.points)
+        return self.owners[index]
+
+
+class ShardMembership:
+    """A worker's lease in the shared membership table"""
+
+    def __init__(self, worker_id, path=POLLER_DB, ttl=MEMBER_TTL):
+        self.worker_id = worker_id
+        self.path = path
+        self.ttl = ttl
+        self.conn = self._connect()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS poller_members (
+                worker_id TEXT PRIMARY KEY,
+                host TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.ring = None
+        self._stop_heartbeat = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _renew(self, conn):
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO poller_members (worker_id, host, pid, expires_at) VALUES (?, ?, ?, ?)",
+                (self.worker_id, socket.gethostname(), os.getpid(), now + self.ttl))
+            conn.execute("DELETE FROM poller_members WHERE expires_at < ?", (now,))
+        return [row[0] for row in conn.execute("SELECT worker_id FROM poller_members")]
+
+    def heartbeat(self):
+        """Renew this worker's lease; returns the live member ids"""
+        return self._renew(self.conn)
+
+    def start_heartbeat(self, interval=HEARTBEAT_INTERVAL):
+        """Keep renewing the lease from a daemon thread (with its own connection) until leave()"""
+        stop = threading.Event()
+
+        def beat():
+            conn = self._connect()
+            try:
+                while not stop.wait(interval):
+                    try:
+                        self._renew(conn)
+                    except sqlite3.Error as e:
+                        print(f"[{self.worker_id}] Lease renewal failed: {e}")
+            finally:
+                conn.close()
+
+        threading.Thread(target=beat, name='shard-heartbeat', daemon=True).start()
+        self._stop_heartbeat = stop
+        return stop
+
+    def refresh_ring(self):
+        """Heartbeat and rebuild the ring if membership changed; returns True on a rebalance"""
+        members = self.heartbeat()
+        if self.ring is not None and self.ring.members == tuple(sorted(members)):
+            return False
+        self.ring = HashRing(members)
+        return True
+
+    def owns(self, meeting_id):
+        return self.ring.owner(meeting_id) == self.worker_id
+
+    def leave(self):
+        """Give up the lease so the other workers take over at once"""
+        if self._stop_heartbeat is not None:
+            self._stop_heartbeat.set()
+        with self.conn:
+            self.conn.execute("DELETE FROM poller_members WHERE worker_id = ?", (self.worker_id,))
+        self.conn.close()
+
+
+class RateBudget:
+    """Token bucket: at most rate calls per second on average, bursts up to burst"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a call is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,168 @@
+"""
+Transcript post-processing stage
+
+Converts each downloaded transcript (plain or compressed VTT) into plain text, speaker-merged JSON and SRT.
+Conversions run in a process pool so parsing and formatting never hold up the
+download loop, and finished outputs are recorded in the transcript manifest,
+so rerunning only converts what is still missing.
+
+Extra formats can be added with register_format(); converters must be
+module-level functions (they are sent to worker processes by reference).
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from manifest import MANIFEST_PATH, is_downloaded, load_manifest, record_entry
+from transcript_store import read_transcript, transcript_stem
+from vtt import format_timestamp, parse_vtt
+
+OUTPUT_DIR = os.path.join('transcripts', 'converted')
+
+
+def to_text(cues):
+    """Plain text, one 'Speaker: text' line per cue"""
+    lines = []
+    for cue in cues:
+        lines.append(f"{cue['speaker']}: {cue['text']}" if cue['speaker'] else cue['text'])
+    return '\n'.join(lines) + '\n'
+
+
+def merge_speaker_turns(cues):
+    """Merge consecutive cues from the same speaker into turns"""
+    turns = []
+    for cue in cues:
+        if turns and turns[-1]['speaker'] == cue['speaker']:
+            turns[-1]['end_ms'] = max(turns[-1]['end_ms'], cue['end_ms'])
+            turns[-1]['text'] += ' ' + cue['text']
+        else:
+            turns.append(dict(cue))
+    return turns
+
+
+def to_json(cues):
+    """Speaker-merged turns as JSON"""
+    turns = [{
+        'speaker': turn['speaker'],
+        'start': format_timestamp(turn['start_ms']),
+        'end': format_timestamp(turn['end_ms']),
+        'start_ms': turn['start_ms'],
+        'end_ms': turn['end_ms'],
+        'text': turn['text']
+    } for turn in merge_speaker_turns(cues)]
+    return json.dumps({'turns': turns}, indent=2, ensure_ascii=False) + '\n'
+
+
+def to_srt(cues):
+    """SubRip subtitles"""
+    blocks = []
+    for i, cue in enumerate(cues, 1):
+        text = f"{cue['speaker']}: {cue['text']}" if cue['speaker'] else cue['text']
+        blocks.append(f"{i}\n{format_timestamp(cue['start_ms'], ',')} --> "
+                      f"{format_timestamp(cue['end_ms'], ',')}\n{text}\n")
+    return '\n'.join(blocks)
+
+
+# name -> (file extension, converter taking parsed cues and returning str)
+FORMATS = {
+    'txt': ('.txt', to_text),
+    'json': ('.json', to_json),
+    'srt': ('.srt', to_srt)
+}
+
+
+def register_format(name, extension, converter):
+    """Add an output format to the post-processing stage"""
+    FORMATS[name] = (extension, converter)
+
+
+def convert_transcript(source_path, formats, output_dir=OUTPUT_DIR):
+    """Worker: parse one transcript and write every requested format
+
+    formats is a list of (name, extension, converter) tuples. Returns
+    {name: output path}.
+    """
+    cues = parse_vtt(read_transcript(source_path))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = transcript_stem(source_path)
+
+    outputs = {}
+    for name, extension, converter in formats:
+        output_path = os.path.join(output_dir, stem + extension)
+        with open(output_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(converter(cues))
+        os.replace(output_path + '.tmp', output_path)
+        outputs[name] = output_path
+    return outputs
+
+
+class PostProcessor:
+    """Runs conversions on a process pool and records results in the manifest"""
+
+    def __init__(self, formats=None, max_workers=None, output_dir=OUTPUT_DIR, manifest_path=MANIFEST_PATH):
+        self.formats = list(formats or FORMATS)
+        self.output_dir = output_dir
+        self.manifest_path = manifest_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wait()
+        self.executor.shutdown()
+
+    def missing_formats(self, entry):
+        """Formats not yet produced for a manifest entry"""
+        done = (entry or {}).get('outputs', {})
+        return [name for name in self.formats if not (done.get(name) and os.path.exists(done[name]))]
+
+    def submit(self, meeting_id, transcript_id, source_path, entry=None):
+        """Queue conversion of one transcript; returns False if nothing is missing"""
+        missing = self.missing_formats(entry)
+        if not missing:
+            return False
+        formats = [(name, FORMATS[name][0], FORMATS[name][1]) for name in missing]
+        future = self.executor.submit(convert_transcript, source_path, formats, self.output_dir)
+        self.pending.append((meeting_id, transcript_id, future))
+        return True
+
+    def wait(self):
+        """Collect finished conversions; returns the number that succeeded"""
+        succeeded = 0
+        for meeting_id, transcript_id, future in self.pending:
+            try:
+                outputs = future.result()
+            except Exception as e:
+                print(f"Error post-processing transcript {transcript_id[:30]}...: {e}")
+                continue
+            record_entry(meeting_id, transcript_id, path=self.manifest_path, outputs=outputs)
+            succeeded += 1
+        self.pending = []
+        return succeeded
+
+
+def postprocess_pending(manifest_path=MANIFEST_PATH, formats=None, max_workers=None):
+    """Convert every downloaded transcript in the manifest that is missing outputs"""
+    entries = load_manifest(manifest_path)
+    with PostProcessor(formats, max_workers, manifest_path=manifest_path) as processor:
+        queued = 0
+        for entry in entries.values():
+            if is_downloaded(entry):
+                if processor.submit(entry['meeting_id'], entry['transcript_id'], entry['file'], entry):
+                    queued += 1
+        print(f"Post-processing {queued} transcript(s) on {processor.max_workers} worker(s)...")
+        converted = processor.wait()
+    print(f"Converted {converted} of {queued} transcript(s) to {', '.join(processor.formats)}")
+    return converted
+
+
+def main():
+    postprocess_pending()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,151 +1,143 @@
-import requests
-import json
-import os
-from datetime import datetime
-import urllib.parse
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-def refresh_access_token():
-    """Refresh access token using saved refresh token"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            data['tokens'] = new_tokens
-            with open('teams_tokens.json', 'w') as f:
-                json.dump(data, f, indent=2)
-            print("Tokens refreshed and saved")
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-            
-    except FileNotFoundError:
-        print("teams_tokens.json not found. Run the auth script first.")
-        return None
+import graph_client
+from delegated_auth import refresh_access_token
+from graph_client import GraphError, iter_transcripts
+from job_queue import JobQueue
+from job_worker import download_key, drain
+from meeting_catalog import MeetingCatalog
+from meeting_resolver import resolve_meeting_id, resolve_meeting_ids
+from manifest import is_downloaded, load_manifest, manifest_key
+from postprocess import PostProcessor
+from transcript_download import transfer_stats
 
 def get_meeting_transcripts(access_token, meeting_id):
     """Get all transcripts for a specific meeting"""
-    # URL encode the meeting ID to handle special characters
-    encoded_meeting_id = urllib.parse.quote(meeting_id, safe='')
-    url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{encoded_meeting_id}/transcripts"
-    
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
-    
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        transcripts = response.json()
-        return transcripts.get('value', [])
-    else:
-        print(f"Failed to get transcripts (Status: {response.status_code})")
-        print(response.json())
+    try:
+        return list(iter_transcripts(access_token, meeting_id))
+    except GraphError as e:
+        print(f"Failed to get transcripts (Status: {e.status_code})")
+        print(e.payload)
         return []
 
-def download_transcript_content(access_token, meeting_id, transcript_id):
-    """Download the actual transcript content"""
-    # URL encode both IDs
-    encoded_meeting_id = urllib.parse.quote(meeting_id, safe='')
-    encoded_transcript_id = urllib.parse.quote(transcript_id, safe='')
-    url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{encoded_meeting_id}/transcripts/{encoded_transcript_id}/content?$format=text/vtt"
-    
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Accept': 'text/vtt'
-    }
-    
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return response.text
-    else:
-        print(f"Failed to download transcript content (Status: {response.status_code})")
-        return None
-
-def save_transcript_to_file(transcript_content, meeting_id, transcript_id):
-    """Save transcript content to a file"""
-    if not os.path.exists('transcripts'):
-        os.makedirs('transcripts')
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"transcripts/transcript_{meeting_id[:8]}_{transcript_id[:8]}_{timestamp}.vtt"
+def choose_recent_meeting():
+    """Let the user pick one of the most recent meetings from the local catalog"""
+    with MeetingCatalog() as catalog:
+        recent = catalog.latest(10)
     
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(transcript_content)
-        print(f"Transcript saved to: {filename}")
-        return filename
-    except Exception as e:
-        print(f"Error saving transcript: {e}")
+    if not recent:
         return None
-
-def main():
-    access_token = refresh_access_token()
-    if not access_token:
-        return
     
-    meeting_id = input("Enter the Meeting ID (from when you created the meeting): ").strip()
-    
-    if not meeting_id:
-        print("Meeting ID is required!")
-        return
+    print("\nRecent meetings:")
+    for i, meeting in enumerate(recent, 1):
+        print(f"  {i}. {meeting['start_time']}  {meeting['subject']}  [{meeting['transcript_state']}]")
     
+    choice = input("Pick a meeting number: ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(recent):
+        return recent[int(choice) - 1]['meeting_id']
+    return None
+
+def read_meeting_references(path):
+    """Meeting ids, join meeting ids or join URLs from a file, one per line"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def pull_meeting_transcripts(access_token, meeting_id, manifest, post_processor, queue):
+    """Download every new transcript of one meeting; returns the number found
+
+    New transcripts go through the job queue first, so downloads interrupted
+    by a crash are picked up again by the next run (or by job_worker.py).
+    """
     print(f"Fetching transcripts for meeting: {meeting_id}")
     transcripts = get_meeting_transcripts(access_token, meeting_id)
     
     if not transcripts:
         print("No transcripts found for this meeting.")
         print("Note: Transcripts may take a few minutes to be available after the meeting ends.")
-        return
+        return 0
     
     print(f"Found {len(transcripts)} transcript(s)")
     
     for i, transcript in enumerate(transcripts, 1):
-        transcript_id = transcript.get('id')
-        created_time = transcript.get('createdDateTime', 'Unknown')
+        transcript_id = transcript.id
+        created_time = transcript.created or 'Unknown'
+        entry = manifest.get(manifest_key(meeting_id, transcript_id))
         
         print(f"\nTranscript {i}:")
         print(f"  ID: {transcript_id}")
         print(f"  Created: {created_time}")
         
-        # Download transcript content
-        print("  Downloading content...")
-        content = download_transcript_content(access_token, meeting_id, transcript_id)
+        if is_downloaded(entry):
+            print(f"  ⏭️  Already downloaded to {entry['file']}")
+            post_processor.submit(meeting_id, transcript_id, entry['file'], entry)
+            continue
         
-        if content:
-            filename = save_transcript_to_file(content, meeting_id, transcript_id)
-            if filename:
-                print(f"  ✅ Successfully saved to {filename}")
+        queue.enqueue('download_transcript', {
+            'meeting_id': meeting_id, 'transcript_id': transcript_id, 'created': created_time
+        }, key=download_key(meeting_id, transcript_id), requeue=True)
+        print("  Queued for download")
+    
+    # Also resumes downloads left behind by an earlier, interrupted run
+    print("\nDownloading content...")
+    drain(queue, kinds=('download_transcript',),
+          context={'access_token': access_token, 'post_processor': post_processor})
+    
+    manifest.update(load_manifest())
+    downloaded = sum(1 for transcript in transcripts
+                     if is_downloaded(manifest.get(manifest_key(meeting_id, transcript.id))))
+    with MeetingCatalog() as catalog:
+        catalog.set_transcript_state(meeting_id, 'downloaded' if downloaded == len(transcripts) else 'available')
+    
+    if downloaded < len(transcripts):
+        print(f"  ⚠️  {len(transcripts) - downloaded} transcript(s) not downloaded yet; "
+              f"they stay queued for retry (python job_worker.py)")
+    
+    return len(transcripts)
+
+def main():
+    graph_client.prewarm()
+    access_token = refresh_access_token(verbose=True)
+    if not access_token:
+        return
+    
+    reference = input("Enter the Meeting ID, Join Meeting ID or join URL "
+                      "(@file for a list, or press Enter to pick a recent meeting): ").strip()
+    
+    if reference.startswith('@'):
+        references = read_meeting_references(reference[1:])
+        # Resolved together: one catalog query per kind, Graph lookups batched
+        resolved = resolve_meeting_ids(access_token, references)
+        meeting_ids = []
+        for ref in references:
+            if resolved[ref]:
+                meeting_ids.append(resolved[ref])
             else:
-                print("  ❌ Failed to save transcript")
-        else:
-            print("  ❌ Failed to download transcript content")
+                print(f"❌ No meeting found for {ref}")
+        meeting_ids = list(dict.fromkeys(meeting_ids))
+    elif reference:
+        meeting_ids = [resolve_meeting_id(access_token, reference)]
+        if meeting_ids[0] is None:
+            print(f"No meeting found for {reference}")
+            return
+    else:
+        meeting_ids = [choose_recent_meeting()]
+    
+    meeting_ids = [meeting_id for meeting_id in meeting_ids if meeting_id]
+    if not meeting_ids:
+        print("Meeting ID is required!")
+        return
+    
+    manifest = load_manifest()
+    
+    with PostProcessor() as post_processor, JobQueue() as queue:
+        queue.reclaim_dead_leases()
+        for meeting_id in meeting_ids:
+            pull_meeting_transcripts(access_token, meeting_id, manifest, post_processor, queue)
+        
+        if post_processor.pending:
+            print(f"\nWaiting for {len(post_processor.pending)} conversion(s) to TXT/JSON/SRT...")
     
     print("\nTranscript pulling complete!")
+    if transfer_stats.summary():
+        print(f"Downloaded {transfer_stats.summary()}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,361 @@
+"""
+Downloading meeting recordings
+
+Recordings run to hundreds of MB or more, so content is fetched as parallel
+HTTP Range requests (CHUNK_SIZE each, RECORDING_WORKERS at a time) written
+straight into a preallocated '<file>.part' with positional writes. A
+checkpoint next to it ('<file>.part.json') records the size, ETag and the
+SHA-256 of every finished chunk; an interrupted download resumes from it,
+re-checking finished chunks against their hashes and fetching only what is
+missing. When every chunk is in, the file is read once to verify the size and
+chunk hashes and compute the file's SHA-256, then renamed into place and
+recorded in recordings/manifest.jsonl.
+
+Servers that ignore Range get a single streamed download instead.
+
+    python recording_download.py <meeting id | join id | join URL | @file> ...
+    python recording_download.py --queue ...   # queue download_recording jobs for job_worker.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import graph_client
+from delegated_auth import DELEGATED_SCOPE, current_access_token
+from graph_client import (GraphError, graph_headers, graph_url, iter_recordings, recording_content_path,
+                          require_permission)
+from http_resilience import http_request
+from job_queue import JobQueue
+from manifest import is_downloaded, load_manifest, manifest_key, record_entry
+from meeting_resolver import resolve_meeting_ids
+from settings import RECORDING_WORKERS
+
+RECORDINGS_DIR = 'recordings'
+RECORDINGS_MANIFEST = os.path.join(RECORDINGS_DIR, 'manifest.jsonl')
+
+CHUNK_SIZE = 16 * 1024 * 1024
+# Bytes read from the socket per write
+WRITE_SIZE = 1024 * 1024
+# Attempts per chunk before the download gives up (it can be resumed later)
+CHUNK_ATTEMPTS = 4
+RECORDING_SCOPE = 'https://graph.microsoft.com/OnlineMeetingRecording.Read.All'
+
+
+class RecordingDownloadError(Exception):
+    pass
+
+
+def recording_filename(meeting_id, recording_id, directory=RECORDINGS_DIR):
+    return os.path.join(directory, f"recording_{meeting_id[:8]}_{recording_id[:8]}.mp4")
+
+
+def _content_headers(access_token, byte_range=None):
+    headers = graph_headers(access_token)
+    del headers['Content-Type']
+    if byte_range:
+        headers['Range'] = f"bytes={byte_range[0]}-{byte_range[1]}"
+    return headers
+
+
+def probe_content(access_token, url):
+    """(size, etag, supports_ranges) from a one-byte ranged GET"""
+    response = http_request('GET', url, session=graph_client.session,
+                            headers=_content_headers(access_token, (0, 0)), stream=True)
+    try:
+        if response.status_code == 206:
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit():
+                return int(total), response.headers.get('ETag'), True
+        if response.status_code in (200, 206):
+            size = response.headers.get('Content-Length')
+            return (int(size) if size and response.status_code == 200 else None), response.headers.get('ETag'), False
+        raise GraphError(response.status_code, response.text[:500], url)
+    finally:
+        response.close()
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _chunk_ranges(size, chunk_size):
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+def _hash_range(fd, start, end):
+    digest = hashlib.sha256()
+    offset = start
+    while offset <= end:
+        data = os.pread(fd, min(WRITE_SIZE, end - offset + 1), offset)
+        if not data:
+            break
+        digest.update(data)
+        offset += len(data)
+    return digest.hexdigest()
+
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+    return 2 ** attempt
+
+
+def _fetch_chunk(access_token, url, fd, start, end):
+    """Download bytes start..end into fd at their offset; returns the chunk's SHA-256"""
+    expected = end - start + 1
+    for attempt in range(CHUNK_ATTEMPTS):
+        response = None
+        try:
+            response = http_request('GET', url, session=graph_client.session,
+                                    headers=_content_headers(access_token, (start, end)), stream=True)
+            if response.status_code != 206:
+                if response.status_code in (429, 500, 502, 503, 504) and attempt + 1 < CHUNK_ATTEMPTS:
+                    time.sleep(_retry_delay(response, attempt))
+                    continue
+                raise GraphError(response.status_code, response.text[:500], url)
+
+            digest = hashlib.sha256()
+            offset = start
+            for data in response.iter_content(WRITE_SIZE):
+                if offset + len(data) > end + 1:
+                    raise RecordingDownloadError(f"Server sent more than bytes {start}-{end}")
+                os.pwrite(fd, data, offset)
+                digest.update(data)
+                offset += len(data)
+            if offset - start != expected:
+                raise RecordingDownloadError(f"Short read for bytes {start}-{end}: {offset - start}/{expected}")
+            return digest.hexdigest()
+        except (requests.RequestException, RecordingDownloadError) as e:
+            # Connection drops and short reads are retried; local disk errors are not
+            if attempt + 1 == CHUNK_ATTEMPTS:
+                raise RecordingDownloadError(f"Bytes {start}-{end} failed after {CHUNK_ATTEMPTS} attempts: {e}")
+            time.sleep(_retry_delay(None, attempt))
+        finally:
+            if response is not None:
+                response.close()
+
+
+def _stream_download(access_token, url, part_path, expected_size=None):
+    """Single-connection fallback for content served without Range support
+
+    The byte count is checked against the response's Content-Length (or
+    expected_size from the probe) so a dropped connection is not renamed into
+    place as a finished file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with http_request('GET', url, session=graph_client.session, headers=_content_headers(access_token),
+                      stream=True) as response:
+        if response.status_code != 200:
+            raise GraphError(response.status_code, response.text[:500], url)
+        length = response.headers.get('Content-Length')
+        # requests decodes Content-Encoding, so the header then counts compressed bytes
+        if length and not response.headers.get('Content-Encoding'):
+            expected_size = int(length)
+        with open(part_path, 'wb') as f:
+            for data in response.iter_content(WRITE_SIZE):
+                f.write(data)
+                digest.update(data)
+                size += len(data)
+    if expected_size is not None and size != expected_size:
+        raise RecordingDownloadError(f"Size mismatch: {size} != {expected_size}")
+    return size, digest.hexdigest()
+
+
+def download_content(access_token, url, filename, workers=RECORDING_WORKERS, chunk_size=CHUNK_SIZE,
+                     progress=None):
+    """Download url into filename with parallel ranged requests, resuming from a checkpoint
+
+    progress(done_bytes, total_bytes) is called after each chunk, on the
+    calling thread, so it can use the caller's own connections (a job worker
+    extends its lease from it). Returns (size, sha256).
+    """
+    part_path = f"{filename}.part"
+    checkpoint_path = f"{part_path}.json"
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    size, etag, ranges_ok = probe_content(access_token, url)
+    if not ranges_ok or not size:
+        size, sha256 = _stream_download(access_token, url, part_path, size)
+        os.replace(part_path, filename)
+        return size, sha256
+
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if (not checkpoint or checkpoint.get('size') != size or checkpoint.get('etag') != etag
+            or checkpoint.get('chunk_size') != chunk_size or not os.path.exists(part_path)):
+        checkpoint = {'size': size, 'etag': etag, 'chunk_size': chunk_size, 'chunks': {}}
+
+    ranges = _chunk_ranges(size, chunk_size)
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # Preallocate so chunks can be written at their offsets in any order
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(fd, 0, size)
+                except OSError:
+                    pass
+
+        # Trust finished chunks only if the bytes on disk still match their hashes
+        done = {}
+        for index, sha256 in checkpoint['chunks'].items():
+            start, end = ranges[int(index)]
+            if _hash_range(fd, start, end) == sha256:
+                done[index] = sha256
+        checkpoint['chunks'] = done
+        if done:
+            print(f"   Resuming: {len(done)}/{len(ranges)} chunk(s) already downloaded")
+
+        lock = threading.Lock()
+        done_bytes = sum(ranges[int(index)][1] - ranges[int(index)][0] + 1 for index in done)
+
+        def fetch(index):
+            start, end = ranges[index]
+            sha256 = _fetch_chunk(access_token, url, fd, start, end)
+            with lock:
+                checkpoint['chunks'][str(index)] = sha256
+                _save_checkpoint(checkpoint_path, checkpoint)
+            return end - start + 1
+
+        missing = [index for index in range(len(ranges)) if str(index) not in done]
+        _save_checkpoint(checkpoint_path, checkpoint)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # result() re-raises the first chunk failure; finished chunks stay in the checkpoint
+            for future in as_completed([pool.submit(fetch, index) for index in missing]):
+                done_bytes += future.result()
+                if progress:
+                    progress(done_bytes, size)
+
+        # One pass over the file: check every chunk hash and hash the whole file
+        os.fsync(fd)
+        if os.fstat(fd).st_size != size:
+            raise RecordingDownloadError(f"Size mismatch: {os.fstat(fd).st_size} != {size}")
+        file_digest = hashlib.sha256()
+        for index, (start, end) in enumerate(ranges):
+            chunk_digest = hashlib.sha256()
+            offset = start
+            while offset <= end:
+                data = os.pread(fd, min(WRITE_SIZE, end - offset + 1), offset)
+                chunk_digest.update(data)
+                file_digest.update(data)
+                offset += len(data)
+            if chunk_digest.hexdigest() != checkpoint['chunks'][str(index)]:
+                del checkpoint['chunks'][str(index)]
+                _save_checkpoint(checkpoint_path, checkpoint)
+                raise RecordingDownloadError(f"Chunk {index} does not match its hash; run again to re-fetch it")
+    finally:
+        os.close(fd)
+
+    os.replace(part_path, filename)
+    os.remove(checkpoint_path)
+    return size, file_digest.hexdigest()
+
+
+def download_recording(access_token, meeting_id, recording_id, user_id=None, filename=None,
+                       workers=RECORDING_WORKERS, progress=None, manifest_path=RECORDINGS_MANIFEST):
+    """Download one recording and record it in the recordings manifest; returns the file"""
+    filename = filename or recording_filename(meeting_id, recording_id)
+    url = graph_url(recording_content_path(meeting_id, recording_id, user_id))
+    require_permission(access_token, 'recordings', url)
+    started = time.time()
+    size, sha256 = download_content(access_token, url, filename, workers=workers, progress=progress)
+    elapsed = max(time.time() - started, 0.001)
+    print(f"   ✅ {filename}: {size / 1e6:.1f} MB in {elapsed:.1f}s ({size / 1e6 / elapsed:.1f} MB/s)")
+    record_entry(meeting_id, recording_id, path=manifest_path, file=filename, size=size, sha256=sha256)
+    return filename
+
+
+def print_progress(done_bytes, total_bytes):
+    print(f"   {done_bytes / 1e6:.0f}/{total_bytes / 1e6:.0f} MB", end='\r', flush=True)
+
+
+def pull_meeting_recordings(access_token, meeting_id, manifest, user_id=None, queue=None):
+    """Download every recording of one meeting not yet in the manifest; returns the files
+
+    With a queue, download_recording jobs are queued instead (returns the job ids).
+    """
+    try:
+        recordings = list(iter_recordings(access_token, meeting_id, user_id=user_id))
+    except GraphError as e:
+        print(f"❌ Could not list recordings for {meeting_id[:20]}... (Status: {e.status_code})")
+        return []
+
+    print(f"{meeting_id[:20]}...: {len(recordings)} recording(s)")
+    files = []
+    for recording in recordings:
+        entry = manifest.get(manifest_key(meeting_id, recording.id))
+        if is_downloaded(entry):
+            print(f"   ⏭️  Already downloaded to {entry['file']}")
+            continue
+        if queue is not None:
+            job_id = queue.enqueue('download_recording', {
+                'meeting_id': meeting_id, 'recording_id': recording.id, 'user_id': user_id
+            }, key=f"recording:{meeting_id}/{recording.id}", requeue=True)
+            if job_id:
+                files.append(job_id)
+            continue
+        try:
+            files.append(download_recording(access_token, meeting_id, recording.id, user_id=user_id,
+                                            progress=print_progress))
+        except (GraphError, RecordingDownloadError, OSError) as e:
+            print(f"   ❌ Recording {recording.id[:20]}...: {e} (run again to resume)")
+    return files
+
+
+def main():
+    references = [arg for arg in sys.argv[1:] if arg != '--queue']
+    if len(references) == 1 and references[0].startswith('@'):
+        with open(references[0][1:], 'r', encoding='utf-8') as f:
+            references = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not references:
+        print("Usage: python recording_download.py <meeting id | join id | join URL | @file> ...")
+        return
+
+    access_token = current_access_token(scope=f"{DELEGATED_SCOPE} {RECORDING_SCOPE}")
+    if not access_token:
+        return
+
+    resolved = resolve_meeting_ids(access_token, references)
+    manifest = load_manifest(RECORDINGS_MANIFEST)
+    queue = JobQueue() if '--queue' in sys.argv else None
+    saved = 0
+    try:
+        for reference in references:
+            if not resolved[reference]:
+                print(f"❌ No meeting found for {reference}")
+                continue
+            saved += len(pull_meeting_recordings(access_token, resolved[reference], manifest, queue=queue))
+    finally:
+        if queue is not None:
+            queue.close()
+
+    if queue is not None:
+        print(f"\nQueued {saved} recording download(s) (python job_worker.py)")
+    else:
+        print(f"\nRecording download complete: {saved} new recording(s)")
+
+
+if __name__ == "__main__":
+    main()
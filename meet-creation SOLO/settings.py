@@ -0,0 +1,45 @@
+"""
+Configuration shared by every script and the teams CLI
+
+The .env file is read once, the first time this module is imported, and the
+values below are fixed from then on. Modules that read further settings with
+os.getenv() import from here first, so they see .env values whichever script
+or command imported them.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# App registration
+CLIENT_ID = os.getenv("CLIENT_ID")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+TENANT_ID = os.getenv("TENANT_ID")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "https://your-webhook-url.ngrok-free.app")
+
+# Signed-in user's tokens (written by auth.py)
+TOKEN_FILE = 'teams_tokens.json'
+
+# Local state (SQLite files)
+TOKEN_STORE_DB = os.getenv("TOKEN_STORE_DB", "tokens.db")
+MEETING_CATALOG_DB = os.getenv("MEETING_CATALOG_DB", "meetings.db")
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "jobs.db")
+POLLER_DB = os.getenv("POLLER_DB", "poller.db")
+# Unset: the Graph metadata cache is kept in memory for the run only
+GRAPH_CACHE_DB = os.getenv("GRAPH_CACHE_DB")
+
+# 'compressed' stores deduplicated, compressed objects; 'plain' keeps timestamped .vtt files
+TRANSCRIPT_STORAGE = os.getenv("TRANSCRIPT_STORAGE", "compressed")
+
+# HTTP/2 to Graph and the token endpoint (needs httpx[http2]); open both connections at startup
+GRAPH_HTTP2 = os.getenv("GRAPH_HTTP2", "0") == "1"
+GRAPH_PREWARM = os.getenv("GRAPH_PREWARM", "1") == "1"
+
+# Parallel ranged requests per recording download
+RECORDING_WORKERS = int(os.getenv("RECORDING_WORKERS", "4"))
+
+# Seconds over which transcript events for one meeting (webhook bursts, poll
+# cycles) are folded into a single transcript listing
+COALESCE_WINDOW = int(os.getenv("COALESCE_WINDOW", "30"))
@@ -0,0 +1,214 @@
+"""
+Speaker analytics across many meetings
+
+Cues from every transcript are loaded once into flat NumPy columns (meeting,
+speaker, start, end, word count). Per-speaker talk time, turns, interruptions
+and words per minute are then computed with vectorized array operations and
+grouped with bincount, so the cost is a few passes over the arrays no matter
+how many meetings there are.
+
+Transcripts are read from the archive, or from the transcript store (the
+compressed objects or plain .vtt files listed in the manifest).
+
+Requires NumPy (pip install numpy, or the analytics extra); Parquet output
+additionally needs pyarrow.
+"""
+
+import csv
+import glob
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from manifest import MANIFEST_PATH, is_downloaded, load_manifest
+from transcript_archive import ARCHIVE_DIR, TranscriptArchive
+from transcript_store import read_transcript, transcript_stem
+from vtt import parse_vtt
+
+TRANSCRIPTS_DIR = 'transcripts'
+OUTPUT_PATH = os.path.join(TRANSCRIPTS_DIR, 'speaker_stats.csv')
+
+COLUMNS = ['meeting', 'speaker', 'meetings', 'cues', 'turns', 'talk_seconds',
+           'words', 'words_per_minute', 'interruptions']
+
+
+def iter_archived_transcripts(archive_dir=ARCHIVE_DIR):
+    """Yield (meeting_id, cues) for every transcript in the archive"""
+    for index_path in sorted(glob.glob(os.path.join(archive_dir, '*', '*.idx'))):
+        with TranscriptArchive(index_path[:-len('.idx')]) as archive:
+            cues = []
+            for cue in archive.query():
+                text = cue['text']
+                cue['text'] = str(text, 'utf-8')
+                text.release()
+                cues.append(cue)
+            yield archive.meeting_id, cues
+
+
+def iter_stored_transcripts(manifest_path=MANIFEST_PATH, directory=TRANSCRIPTS_DIR):
+    """Yield (meeting id, cues) for every downloaded transcript in the store
+
+    Entries come from the manifest, whichever TRANSCRIPT_STORAGE wrote them;
+    loose .vtt files it does not list (saved before the manifest) are read
+    too, named by file.
+    """
+    listed = set()
+    for entry in load_manifest(manifest_path).values():
+        if not is_downloaded(entry):
+            continue
+        listed.add(os.path.abspath(entry['file']))
+        yield entry['meeting_id'], parse_vtt(read_transcript(entry['file']))
+
+    for path in sorted(glob.glob(os.path.join(directory, '*.vtt'))):
+        if os.path.abspath(path) not in listed:
+            yield transcript_stem(path), parse_vtt(read_transcript(path))
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Speaker analytics requires NumPy: pip install numpy (or the analytics extra)")
+
+
+def build_columns(transcripts):
+    """Flatten (meeting, cues) pairs into columnar arrays sorted by meeting and start"""
+    require_numpy()
+    meetings, speakers, starts, ends, words = [], [], [], [], []
+    for meeting, cues in transcripts:
+        for cue in cues:
+            meetings.append(meeting)
+            speakers.append(cue['speaker'] or 'Unknown')
+            starts.append(cue['start_ms'])
+            ends.append(cue['end_ms'])
+            words.append(len(cue['text'].split()))
+
+    meeting_names, meeting_codes = np.unique(np.array(meetings, dtype=object), return_inverse=True)
+    speaker_names, speaker_codes = np.unique(np.array(speakers, dtype=object), return_inverse=True)
+    start = np.array(starts, dtype=np.int64)
+    end = np.array(ends, dtype=np.int64)
+
+    order = np.lexsort((start, meeting_codes))
+    return {
+        'meeting_names': meeting_names,
+        'speaker_names': speaker_names,
+        'meeting': meeting_codes[order].astype(np.int64),
+        'speaker': speaker_codes[order].astype(np.int64),
+        'start_ms': start[order],
+        'end_ms': end[order],
+        'words': np.array(words, dtype=np.int64)[order]
+    }
+
+
+def compute_speaker_stats(columns, by_meeting=False):
+    """Aggregate per-speaker metrics (per meeting and speaker if by_meeting)"""
+    require_numpy()
+    meeting = columns['meeting']
+    speaker = columns['speaker']
+    start = columns['start_ms']
+    end = columns['end_ms']
+    if len(meeting) == 0:
+        return {name: [] for name in COLUMNS}
+
+    duration = np.clip(end - start, 0, None)
+    same_meeting = meeting[1:] == meeting[:-1]
+    speaker_change = speaker[1:] != speaker[:-1]
+
+    # A turn starts at the first cue of a meeting or whenever the speaker changes
+    new_turn = np.ones(len(meeting), dtype=bool)
+    new_turn[1:] = ~same_meeting | speaker_change
+
+    # Latest end time seen so far within each meeting: offset every meeting into its
+    # own range so one cumulative max over the whole column never crosses meetings
+    span = int(end.max()) + 1
+    running_end = np.maximum.accumulate(end + meeting * span) - meeting * span
+
+    # Interruption: a different speaker starts before the previous speech has ended
+    interrupted = np.zeros(len(meeting), dtype=bool)
+    interrupted[1:] = same_meeting & speaker_change & (start[1:] < running_end[:-1])
+
+    if by_meeting:
+        key = meeting * len(columns['speaker_names']) + speaker
+    else:
+        key = speaker
+    groups, group_index = np.unique(key, return_inverse=True)
+    size = len(groups)
+
+    talk_ms = np.bincount(group_index, weights=duration, minlength=size)
+    words = np.bincount(group_index, weights=columns['words'], minlength=size)
+    cues = np.bincount(group_index, minlength=size)
+    turns = np.bincount(group_index, weights=new_turn, minlength=size)
+    interruptions = np.bincount(group_index, weights=interrupted, minlength=size)
+
+    # Distinct meetings per group: count unique (group, meeting) pairs
+    pairs = np.unique(group_index * (int(meeting.max()) + 1) + meeting)
+    meeting_counts = np.bincount(pairs // (int(meeting.max()) + 1), minlength=size)
+
+    minutes = talk_ms / 60000.0
+    words_per_minute = np.divide(words, minutes, out=np.zeros(size), where=minutes > 0)
+
+    if by_meeting:
+        meeting_labels = columns['meeting_names'][groups // len(columns['speaker_names'])]
+        speaker_labels = columns['speaker_names'][groups % len(columns['speaker_names'])]
+    else:
+        meeting_labels = np.full(size, '', dtype=object)
+        speaker_labels = columns['speaker_names'][groups]
+
+    return {
+        'meeting': meeting_labels.tolist(),
+        'speaker': speaker_labels.tolist(),
+        'meetings': meeting_counts.tolist(),
+        'cues': cues.tolist(),
+        'turns': turns.astype(np.int64).tolist(),
+        'talk_seconds': np.round(talk_ms / 1000.0, 3).tolist(),
+        'words': words.astype(np.int64).tolist(),
+        'words_per_minute': np.round(words_per_minute, 1).tolist(),
+        'interruptions': interruptions.astype(np.int64).tolist()
+    }
+
+
+def write_table(table, path=OUTPUT_PATH):
+    """Write a stats table as CSV, or as Parquet when the path ends in .parquet"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            print("Parquet output requires pyarrow: pip install pyarrow")
+            return None
+        pyarrow.parquet.write_table(pyarrow.table({name: table[name] for name in COLUMNS}), path)
+        return path
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(table[name] for name in COLUMNS)))
+    return path
+
+
+def main():
+    if np is None:
+        print("Speaker analytics requires NumPy: pip install numpy (or the analytics extra)")
+        return
+
+    source = input("Read from (a)rchive or the transcript (s)tore? [a]: ").strip().lower() or 'a'
+    by_meeting = input("Break down per meeting? [y/N]: ").strip().lower() == 'y'
+    output = input(f"Output file [{OUTPUT_PATH}]: ").strip() or OUTPUT_PATH
+
+    transcripts = iter_stored_transcripts() if source.startswith('s') else iter_archived_transcripts()
+    columns = build_columns(transcripts)
+    print(f"Loaded {len(columns['meeting'])} cues from {len(columns['meeting_names'])} meetings")
+
+    table = compute_speaker_stats(columns, by_meeting=by_meeting)
+    path = write_table(table, output)
+    if path:
+        print(f"Speaker stats for {len(table['speaker'])} rows saved to: {path}")
+
+
+if __name__ == "__main__":
+    main()
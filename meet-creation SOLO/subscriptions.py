@@ -0,0 +1,209 @@
+"""
+Consolidated transcript subscriptions
+
+One subscription per user (users/{id}/onlineMeetings/getAllTranscripts) or
+per tenant (communications/onlineMeetings/getAllTranscripts, app-only) covers
+every meeting, so creating and renewing subscriptions costs O(users) instead
+of one subscription per meeting. Notifications name the meeting in their
+resource path; route_notification() maps them to the local meeting catalog.
+
+migrate_meeting_subscriptions() folds older per-meeting subscriptions
+(.../onlineMeetings/{id}/transcripts) into the consolidated one: each meeting
+is recorded in the catalog so it keeps being watched, then the per-meeting
+subscription is deleted.
+
+New subscriptions get a random clientState secret; every subscription we
+create or reuse is recorded with its clientState in the catalog's registry,
+which the webhook server checks notifications against (webhook_security.py).
+register_existing_subscriptions() backfills the registry from Graph for
+subscriptions made before it existed (the webhook server runs it at startup).
+"""
+
+import re
+import secrets
+from datetime import datetime, timedelta
+
+from graph_client import GraphError, get_online_meeting, graph_send, iter_graph_items
+from meeting_catalog import MeetingCatalog, normalize_time
+
+TENANT_RESOURCE = "communications/onlineMeetings/getAllTranscripts"
+
+# Graph allows transcript subscriptions of up to 3 days
+SUBSCRIPTION_LIFETIME = timedelta(days=3)
+# Renew when less than this is left
+RENEW_BEFORE = timedelta(hours=12)
+
+# users('id')/onlineMeetings('id')/transcripts('id') or the slash form
+_NOTIFICATION_RESOURCE = re.compile(
+    r"onlineMeetings(?:\('([^']+)'\)|/(.+?))/transcripts(?:\('([^']+)'\)|/([^/?]+))?")
+
+
+def user_resource(user_id):
+    return f"users/{user_id}/onlineMeetings/getAllTranscripts"
+
+
+def is_consolidated(resource):
+    return (resource or '').rstrip('/').endswith('/getAllTranscripts')
+
+
+def meeting_id_from_resource(resource):
+    """Meeting id of a per-meeting subscription resource or notification resource, or None"""
+    if not resource or is_consolidated(resource):
+        return None
+    match = _NOTIFICATION_RESOURCE.search(resource)
+    if not match:
+        return None
+    return match.group(1) or match.group(2)
+
+
+def transcript_id_from_resource(resource):
+    match = _NOTIFICATION_RESOURCE.search(resource or '')
+    if not match:
+        return None
+    return match.group(3) or match.group(4)
+
+
+def expiration_time(lifetime=SUBSCRIPTION_LIFETIME):
+    return (datetime.utcnow() + lifetime).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+def list_transcript_subscriptions(access_token):
+    """(consolidated, per_meeting) transcript subscriptions of the caller"""
+    consolidated, per_meeting = [], []
+    for sub in iter_graph_items(access_token, "subscriptions"):
+        resource = sub.get('resource') or ''
+        if is_consolidated(resource):
+            consolidated.append(sub)
+        elif meeting_id_from_resource(resource):
+            per_meeting.append(sub)
+    return consolidated, per_meeting
+
+
+def renew_subscription(access_token, subscription_id, lifetime=SUBSCRIPTION_LIFETIME):
+    return graph_send(access_token, 'PATCH', f"subscriptions/{subscription_id}",
+                      {"expirationDateTime": expiration_time(lifetime)})
+
+
+def ensure_transcript_subscription(access_token, resource, notification_url, lifecycle_url=None,
+                                   client_state=None, existing=None, legacy_client_state="transcript-webhook"):
+    """Reuse (renewing if close to expiry) or create the subscription for resource
+
+    existing is the caller's subscription list, to avoid listing them again.
+    A new subscription gets client_state or a random secret. A reused one that
+    is not in the registry yet is recorded with legacy_client_state, the value
+    older versions created it with. Returns the subscription.
+    """
+    if existing is None:
+        existing, _ = list_transcript_subscriptions(access_token)
+
+    for sub in existing:
+        if sub.get('resource', '').lstrip('/') != resource:
+            continue
+        with MeetingCatalog() as catalog:
+            if catalog.subscription_client_state(sub['id']) is None:
+                catalog.record_subscription(sub['id'], resource,
+                                            sub.get('clientState') or client_state or legacy_client_state)
+        expires = normalize_time(sub.get('expirationDateTime'))
+        if expires and expires > normalize_time(datetime.utcnow() + RENEW_BEFORE):
+            return sub
+        return renew_subscription(access_token, sub['id']) or sub
+
+    client_state = client_state or secrets.token_urlsafe(32)
+    data = {
+        "changeType": "created",
+        "notificationUrl": notification_url,
+        "resource": resource,
+        "expirationDateTime": expiration_time(),
+        "clientState": client_state
+    }
+    if lifecycle_url:
+        data["lifecycleNotificationUrl"] = lifecycle_url
+    subscription = graph_send(access_token, 'POST', "subscriptions", data)
+    with MeetingCatalog() as catalog:
+        catalog.record_subscription(subscription['id'], resource, client_state)
+    return subscription
+
+
+def register_existing_subscriptions(access_token, notification_base_url):
+    """Record subscriptions notifying notification_base_url that are missing from the registry
+
+    Covers per-meeting and user subscriptions created before the registry
+    existed. Their clientState is taken from Graph; a subscription listed
+    without one cannot be checked, so it is reported and left out (recreate
+    it with subscription_manager.py). Returns (registered, unknown) counts.
+    """
+    registered, unknown = 0, 0
+    with MeetingCatalog() as catalog:
+        for sub in iter_graph_items(access_token, "subscriptions"):
+            if not (sub.get('notificationUrl') or '').startswith(notification_base_url):
+                continue
+            if catalog.subscription_client_state(sub['id']) is not None:
+                continue
+            if not sub.get('clientState'):
+                print(f"Subscription {sub['id']} has no clientState to check; "
+                      f"its notifications are dropped until it is recreated")
+                unknown += 1
+                continue
+            catalog.record_subscription(sub['id'], (sub.get('resource') or '').lstrip('/'), sub['clientState'])
+            registered += 1
+    return registered, unknown
+
+
+def ensure_user_subscription(access_token, user_id, notification_url, lifecycle_url=None,
+                             client_state=None, existing=None):
+    """The single getAllTranscripts subscription for one user"""
+    return ensure_transcript_subscription(
+        access_token, user_resource(user_id), notification_url, lifecycle_url,
+        client_state, existing, legacy_client_state=f"transcript-webhook-{user_id}")
+
+
+def renew_expiring_subscriptions(access_token, within=RENEW_BEFORE):
+    """Renew consolidated subscriptions expiring within the given window; returns their ids"""
+    consolidated, _ = list_transcript_subscriptions(access_token)
+    cutoff = normalize_time(datetime.utcnow() + within)
+    renewed = []
+    for sub in consolidated:
+        if normalize_time(sub.get('expirationDateTime')) <= cutoff:
+            renew_subscription(access_token, sub['id'])
+            renewed.append(sub['id'])
+    return renewed
+
+
+def migrate_meeting_subscriptions(access_token, user_id, notification_url, lifecycle_url=None,
+                                  delete=True):
+    """Move per-meeting subscriptions onto the user's consolidated subscription
+
+    Returns {'subscription': ..., 'migrated': [meeting ids], 'failed': [meeting ids]}.
+    A per-meeting subscription is only deleted once its meeting is in the catalog.
+    """
+    consolidated, per_meeting = list_transcript_subscriptions(access_token)
+    subscription = ensure_user_subscription(
+        access_token, user_id, notification_url, lifecycle_url, existing=consolidated)
+
+    migrated, failed = [], []
+    with MeetingCatalog() as catalog:
+        for sub in per_meeting:
+            meeting_id = meeting_id_from_resource(sub['resource'])
+            try:
+                if catalog.get(meeting_id) is None:
+                    catalog.record_meeting(get_online_meeting(access_token, meeting_id))
+                if delete:
+                    graph_send(access_token, 'DELETE', f"subscriptions/{sub['id']}")
+                    catalog.forget_subscription(sub['id'])
+                migrated.append(meeting_id)
+            except GraphError as e:
+                print(f"Could not migrate subscription for {meeting_id[:30]}...: {e.status_code}")
+                failed.append(meeting_id)
+
+    return {'subscription': subscription, 'migrated': migrated, 'failed': failed}
+
+
+def route_notification(notification, catalog):
+    """Map one change notification to (meeting_id, transcript_id, catalog row or None)"""
+    resource = notification.get('resource') or ''
+    resource_data = notification.get('resourceData') or {}
+    meeting_id = meeting_id_from_resource(resource) or meeting_id_from_resource(resource_data.get('@odata.id'))
+    transcript_id = (transcript_id_from_resource(resource)
+                     or transcript_id_from_resource(resource_data.get('@odata.id'))
+                     or resource_data.get('id'))
+    return meeting_id, transcript_id, catalog.get(meeting_id) if meeting_id else None
@@ -0,0 +1,68 @@
+"""
+teams - one command for the meeting and transcript tools
+
+    teams auth [users.txt]          sign in (or onboard everyone listed)
+    teams create                    create a meeting
+    teams pull [refs... | @file]    download transcripts
+    teams recordings refs...        download meeting recordings (resumable)
+    teams export [refs...]          export attendance reports (and call records)
+    teams poll [--shards N]         poll for new transcripts
+    teams serve                     run the webhook server (needs Flask)
+    teams diagnose                  check meetings, subscriptions and transcripts
+    teams doctor [--budget S]       run every check concurrently, JSON report
+    teams sync [organizers.txt]     app-only sync across organizers
+    teams worker [N] [--follow]     run job queue workers
+
+Only the module behind the chosen command is imported - Flask only for
+serve - and .env is read once, by settings.py, when that module loads.
+'teams --help' imports nothing beyond the standard library. To see where a
+command's startup time goes:
+
+    python -X importtime -m teams_cli pull 2> importtime.log
+"""
+
+import importlib
+import sys
+
+# command -> (module with a main() function, summary)
+COMMANDS = {
+    'auth': ('auth', "Sign in; pass a file of emails to onboard several users"),
+    'create': ('create_meeting_main', "Create a Teams meeting"),
+    'pull': ('pull_transcript_main', "Download transcripts (meeting ids, join ids, join URLs or @file)"),
+    'recordings': ('recording_download', "Download meeting recordings with parallel, resumable range requests"),
+    'export': ('attendance_export', "Export attendance reports and call records as tables joined by meeting"),
+    'poll': ('examples.transcript_poller', "Poll for new transcripts (--shards N for several processes)"),
+    'serve': ('examples.webhook_handler', "Run the webhook server for transcript notifications"),
+    'diagnose': ('utils.diagnosis', "Check meetings, subscriptions and transcripts"),
+    'doctor': ('diagnostics', "Run token, subscription, webhook, tenant and transcript checks concurrently (JSON)"),
+    'sync': ('app_sync_main', "Pull transcripts for many organizers with an app-only token"),
+    'worker': ('job_worker', "Run job queue workers (N processes, --follow, --status)"),
+}
+
+
+def usage():
+    lines = ["usage: teams <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<12}{summary}" for name, (_, summary) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print(usage())
+        return 0
+
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        print(f"teams: unknown command '{argv[0]}'\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    module = importlib.import_module(command[0])
+    # The scripts read their own arguments from sys.argv
+    sys.argv = [f"teams {argv[0]}"] + argv[1:]
+    module.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
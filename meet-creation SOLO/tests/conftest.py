@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+
+import pytest
+
+# The modules are flat files in the directory above, as when the scripts run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import graph_client  # noqa: E402
+import http_resilience  # noqa: E402
+from meeting_cache import MeetingCache  # noqa: E402
+
+
+class FakeResponse:
+    """Just enough of requests.Response for the code under test"""
+
+    def __init__(self, status_code=200, body=None, headers=None, content=b''):
+        self.status_code = status_code
+        self.body = body
+        self.headers = dict(headers or {})
+        self.content = content
+        self.text = str(body) if body is not None else content.decode('utf-8', 'replace')
+        self.closed = False
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("No JSON body")
+        return self.body
+
+    def iter_content(self, chunk_size=1):
+        for offset in range(0, len(self.content), chunk_size):
+            yield self.content[offset:offset + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeSession:
+    """Answers requests from routes {url: (status, body) | FakeResponse | callable} and records them
+
+    A callable route is called with (method, url, **kwargs) and returns either of the other two.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        answer = self.routes[url]
+        if callable(answer):
+            answer = answer(method, url, **kwargs)
+        if isinstance(answer, tuple):
+            answer = FakeResponse(*answer)
+        return answer
+
+    def urls(self):
+        return [url for _, url, _ in self.requests]
+
+
+def ranged_server(content, etag='"v1"', fail_ranges=()):
+    """A route answering Range GETs with 206 slices of content"""
+    def answer(method, url, headers=None, **kwargs):
+        match = re.fullmatch(r'bytes=(\d+)-(\d+)', headers.get('Range', ''))
+        if match is None:
+            return FakeResponse(200, headers={'Content-Length': str(len(content))}, content=content)
+        start, end = int(match.group(1)), int(match.group(2))
+        if (start, end) in fail_ranges:
+            return FakeResponse(404, {'error': {'code': 'NotFound'}})
+        return FakeResponse(206, headers={'Content-Range': f"bytes {start}-{end}/{len(content)}", 'ETag': etag},
+                            content=content[start:end + 1])
+    return answer
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    """Each test starts with closed circuit breakers"""
+    monkeypatch.setattr(http_resilience, '_breakers', {})
+
+
+@pytest.fixture
+def graph_session(monkeypatch):
+    """A FakeSession standing in for Graph, with an empty in-memory metadata cache"""
+    session = FakeSession()
+    monkeypatch.setattr(graph_client, 'session', session)
+    monkeypatch.setattr(graph_client, 'cache', MeetingCache())
+    return session
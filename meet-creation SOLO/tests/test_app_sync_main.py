@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import app_sync_main
+from graph_client import GraphError
+from http_resilience import CircuitOpenError
+
+
+class NoPostProcessing:
+    pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_one_failing_organizer_does_not_stop_the_sync(monkeypatch):
+    def fetch(tenant_id, user_id, since, manifest):
+        if user_id == 'down':
+            raise CircuitOpenError('graph', 30)
+        if user_id == 'forbidden':
+            raise GraphError(403, 'Forbidden')
+        return [(SimpleNamespace(meeting_id='m', id=f"{user_id}-t", created=None), b'WEBVTT')]
+
+    stored = []
+
+    def store(content, meeting_id, transcript_id, created, post_processor):
+        stored.append(transcript_id)
+        return True
+
+    monkeypatch.setattr(app_sync_main, 'fetch_organizer_transcripts', fetch)
+    monkeypatch.setattr(app_sync_main, 'load_manifest', dict)
+    monkeypatch.setattr(app_sync_main, 'PostProcessor', NoPostProcessing)
+    monkeypatch.setattr(app_sync_main, 'store_downloaded_transcript', store)
+
+    organizers = [('tenant', 'down'), ('tenant', 'forbidden'), ('tenant', 'up'), ('tenant', 'also-up')]
+    assert app_sync_main.sync_organizers(organizers, max_workers=2) == 2
+    assert sorted(stored) == ['also-up-t', 'up-t']
@@ -0,0 +1,30 @@
+import attendance_export
+from graph_client import GraphError
+from http_resilience import CircuitOpenError
+from manifest import load_manifest
+
+
+def _row(meeting_id, report_id, email):
+    return {'meeting_id': meeting_id, 'report_id': report_id, 'meeting_start': '2026-01-05T09:00:00Z',
+            'meeting_end': '2026-01-05T09:30:00Z', 'participants': 1, 'record_id': email, 'email': email,
+            'display_name': email, 'user_id': email, 'role': 'Attendee', 'total_seconds': 600,
+            'first_join': '2026-01-05T09:00:00Z', 'last_leave': '2026-01-05T09:10:00Z', 'intervals': 1}
+
+
+def test_failing_meetings_are_reported_and_the_rest_exported(tmp_path, monkeypatch):
+    def fetch(access_token, meeting_id, exported, budget, user_id=None):
+        if meeting_id == 'breaker-open':
+            raise CircuitOpenError('graph', 30)
+        if meeting_id == 'no-reports':
+            raise GraphError(404, 'Not found')
+        return {f"{meeting_id}-report": [_row(meeting_id, f"{meeting_id}-report", 'ada@example.com')]}
+
+    monkeypatch.setattr(attendance_export, 'fetch_meeting_attendance', fetch)
+    meetings = [{'meeting_id': meeting_id, 'subject': meeting_id, 'start_time': '2026-01-05T09:00:00Z'}
+                for meeting_id in ('breaker-open', 'first', 'no-reports', 'second')]
+
+    out_dir = str(tmp_path / 'exports')
+    written, call_rows, _ = attendance_export.export_attendance('token', meetings, out_dir=out_dir, workers=2)
+    assert (written, call_rows) == (2, 0)
+    exported = load_manifest(attendance_export.export_paths(out_dir)['manifest'])
+    assert sorted(exported) == ['first/first-report', 'second/second-report']
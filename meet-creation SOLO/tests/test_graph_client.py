@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+import graph_client
+from graph_client import GraphError, iter_graph_items
+
+FIRST_PAGE = graph_client.graph_url('me/onlineMeetings')
+NEXT_PAGE = "https://graph.microsoft.com/v1.0/me/onlineMeetings?$top=2&$skiptoken=page2"
+LAST_PAGE = "https://graph.microsoft.com/v1.0/me/onlineMeetings?$top=2&$skiptoken=page3"
+
+
+@pytest.fixture
+def pages(graph_session):
+    graph_session.routes.update({
+        FIRST_PAGE: (200, {'value': [{'id': 1}, {'id': 2}], '@odata.nextLink': NEXT_PAGE}),
+        NEXT_PAGE: (200, {'value': [{'id': 3}, {'id': 4}], '@odata.nextLink': LAST_PAGE}),
+        LAST_PAGE: (200, {'value': [{'id': 5}]}),
+    })
+    return graph_session
+
+
+def test_follows_next_links_to_the_last_page(pages):
+    items = list(iter_graph_items('token', 'me/onlineMeetings', page_size=2, select=('id', 'subject')))
+    assert [item['id'] for item in items] == [1, 2, 3, 4, 5]
+    assert pages.urls() == [FIRST_PAGE, NEXT_PAGE, LAST_PAGE]
+    # $top and $select go on the first request only; nextLink already carries them
+    params = [kwargs['params'] for _, _, kwargs in pages.requests]
+    assert params == [{'$top': 2, '$select': 'id,subject'}, None, None]
+
+
+def test_pages_are_fetched_only_as_items_are_consumed(pages):
+    assert [item['id'] for item in itertools.islice(iter_graph_items('token', 'me/onlineMeetings'), 3)] == [1, 2, 3]
+    assert len(pages.requests) == 2
+
+
+def test_failed_page_raises_graph_error(pages):
+    pages.routes[NEXT_PAGE] = (403, {'error': {'code': 'Forbidden', 'message': 'Access denied'}})
+    with pytest.raises(GraphError) as error:
+        list(iter_graph_items('token', 'me/onlineMeetings'))
+    assert error.value.status_code == 403 and error.value.url == NEXT_PAGE
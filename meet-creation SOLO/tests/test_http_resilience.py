@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import http_resilience
+from conftest import FakeResponse, FakeSession
+from http_resilience import BREAKER_FAILURES, CircuitBreaker, CircuitOpenError, get_breaker, http_request
+
+URL = "https://graph.microsoft.com/v1.0/me/onlineMeetings"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(http_resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def failing(method, url, **kwargs):
+    raise requests.ConnectionError("refused")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    session = FakeSession({URL: failing})
+    for _ in range(BREAKER_FAILURES):
+        with pytest.raises(requests.ConnectionError):
+            http_request('GET', URL, session=session)
+
+    with pytest.raises(CircuitOpenError) as raised:
+        http_request('GET', URL, session=session)
+    assert raised.value.endpoint == 'graph'
+    assert isinstance(raised.value, requests.RequestException)
+    assert len(session.requests) == BREAKER_FAILURES  # the rejected call was never sent
+    assert get_breaker('graph').metrics()['rejected'] == 1
+
+
+def test_client_errors_count_as_the_endpoint_being_up():
+    session = FakeSession({URL: (404, {'error': {'code': 'NotFound'}})})
+    for _ in range(BREAKER_FAILURES + 1):
+        assert http_request('GET', URL, session=session).status_code == 404
+    assert get_breaker('graph').state == http_resilience.CLOSED
+
+
+def test_server_errors_open_the_breaker():
+    session = FakeSession({URL: (503, None)})
+    for _ in range(BREAKER_FAILURES):
+        http_request('GET', URL, session=session)
+    assert get_breaker('graph').state == http_resilience.OPEN
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker('graph', failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock[0] += 30
+    assert breaker.allow() == http_resilience.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # the probe is still running
+
+    breaker.record_success()
+    assert breaker.allow() == http_resilience.CLOSED
+
+
+def test_failed_probe_opens_again(clock):
+    breaker = CircuitBreaker('graph', failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == http_resilience.OPEN
+    assert breaker.metrics()['opened'] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_p95_needs_enough_samples():
+    breaker = CircuitBreaker('graph')
+    for latency in range(1, http_resilience.HEDGE_MIN_SAMPLES):
+        breaker.record_success(latency)
+    assert breaker.p95() is None
+    breaker.record_success(http_resilience.HEDGE_MIN_SAMPLES)
+    assert breaker.p95() == 19  # 95th of 1..20
+
+
+def test_hedged_read_uses_the_faster_copy_and_closes_the_slow_one():
+    breaker = get_breaker('graph')
+    for _ in range(http_resilience.HEDGE_MIN_SAMPLES):
+        breaker.record_success(0.01)
+
+    release = threading.Event()
+    slow, fast = FakeResponse(200, {'copy': 'slow'}), FakeResponse(200, {'copy': 'fast'})
+    answers = iter([slow, fast])
+
+    def answer(method, url, **kwargs):
+        response = next(answers)
+        if response is slow:
+            release.wait(5)
+        return response
+
+    session = FakeSession({URL: answer})
+    response = http_request('GET', URL, session=session, hedge=True)
+    assert response.json() == {'copy': 'fast'}
+    assert breaker.metrics()['hedged'] == 1
+
+    release.set()  # the slow copy finishes now and is closed by its done callback
+    deadline = time.monotonic() + 5
+    while not slow.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow.closed
+    assert not fast.closed
+
+
+def test_streams_and_writes_are_not_hedged():
+    breaker = get_breaker('graph')
+    for _ in range(http_resilience.HEDGE_MIN_SAMPLES):
+        breaker.record_success(0.0)
+    session = FakeSession({URL: (200, {})})
+    http_request('GET', URL, session=session, hedge=True, stream=True)
+    http_request('POST', URL, session=session, hedge=True)
+    assert breaker.metrics()['hedged'] == 0
+    assert len(session.requests) == 2
+
+
+def test_broken_stream_counts_as_a_failure():
+    class BrokenResponse(FakeResponse):
+        def iter_content(self, chunk_size=1):
+            yield b'partial'
+            raise requests.ConnectionError("reset by peer")
+
+    url = URL + "/m1/recordings/r1/content"
+    session = FakeSession({url: BrokenResponse(200)})
+    response = http_request('GET', url, session=session, stream=True)
+    with pytest.raises(requests.ConnectionError):
+        list(response.iter_content(1024))
+    assert get_breaker('graph_content').metrics()['failures'] == 1
+
+
+def test_endpoint_for():
+    assert http_resilience.endpoint_for("https://login.microsoftonline.com/common/oauth2/v2.0/token") == 'login'
+    assert http_resilience.endpoint_for(URL + "/m1/transcripts/t1/content") == 'graph_content'
+    assert http_resilience.endpoint_for(URL) == 'graph'
@@ -0,0 +1,124 @@
+import pytest
+
+import job_queue
+from job_queue import BACKOFF_BASE, BACKOFF_MAX, DONE, FAILED, LEASED, QUEUED, JobQueue, backoff_delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(job_queue.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with JobQueue(str(tmp_path / 'jobs.db')) as queue:
+        yield queue
+
+
+def test_backoff_doubles_with_jitter_up_to_the_cap():
+    for attempts in range(1, 8):
+        delay = backoff_delay(attempts)
+        full = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+        assert full / 2 <= delay <= full
+    assert backoff_delay(50) <= BACKOFF_MAX
+
+
+def test_duplicate_keys_are_ignored(queue):
+    assert queue.enqueue('download', {'n': 1}, key='k') is not None
+    assert queue.enqueue('download', {'n': 2}, key='k') is None
+    assert queue.counts() == {('download', QUEUED): 1}
+
+
+def test_leased_job_is_not_handed_out_twice(queue, clock):
+    queue.enqueue('download', {})
+    job = queue.lease(owner='w1', lease_seconds=60)
+    assert job.attempts == 1
+    assert queue.lease(owner='w2') is None
+    assert queue.ack(job, owner='w1')
+    assert queue.counts() == {('download', DONE): 1}
+
+
+def test_expired_lease_is_taken_over(queue, clock):
+    queue.enqueue('download', {'meeting': 'm'})
+    job = queue.lease(owner='w1', lease_seconds=60)
+
+    clock[0] += 61
+    retry = queue.lease(owner='w2', lease_seconds=60)
+    assert retry.id == job.id and retry.attempts == 2 and retry.payload == {'meeting': 'm'}
+    # The first worker lost its lease, so it can no longer ack or extend it
+    assert not queue.ack(job, owner='w1')
+    assert not queue.extend(job, owner='w1')
+    assert queue.extend(retry, owner='w2')
+
+
+def test_expired_lease_fails_the_job_after_max_attempts(queue, clock):
+    queue.enqueue('download', {}, max_attempts=2)
+    queue.lease(owner='w1', lease_seconds=60)
+    clock[0] += 61
+    queue.lease(owner='w2', lease_seconds=60)
+    clock[0] += 61
+    assert queue.lease(owner='w3') is None
+    assert queue.failed_jobs()[0]['last_error'] == 'lease expired'
+
+
+def test_failed_job_waits_out_its_backoff(queue, clock):
+    queue.enqueue('download', {}, max_attempts=3)
+    job = queue.lease(owner='w1')
+    assert queue.fail(job, 'HTTP 503', owner='w1')
+    assert queue.counts() == {('download', QUEUED): 1}
+
+    clock[0] += BACKOFF_BASE / 2 - 1
+    assert queue.lease(owner='w1') is None
+    clock[0] += BACKOFF_BASE / 2 + 1
+    job = queue.lease(owner='w1')
+    assert job.attempts == 2
+
+    queue.fail(job, 'HTTP 503', owner='w1')
+    clock[0] += BACKOFF_BASE * 2
+    job = queue.lease(owner='w1')
+    queue.fail(job, 'HTTP 503', owner='w1')
+    assert queue.counts() == {('download', FAILED): 1}
+
+
+def test_permanent_failure_is_not_retried(queue, clock):
+    queue.enqueue('download', {})
+    job = queue.lease(owner='w1')
+    queue.fail(job, 'bad payload', owner='w1', retry=False)
+    assert queue.counts() == {('download', FAILED): 1}
+    assert queue.retry_failed() == 1
+    assert queue.lease(owner='w1').attempts == 1
+    assert queue.counts() == {('download', LEASED): 1}
+
+
+def _orphan(queue, job, pid=2 ** 22 + 1):
+    # Pretend the lease belongs to a process on this host that has died
+    queue.conn.execute("UPDATE jobs SET lease_owner = ? WHERE id = ?",
+                       (f"{job_queue.socket.gethostname()}:{pid}", job.id))
+
+
+def test_dead_workers_leases_are_reclaimed(queue, clock, monkeypatch):
+    monkeypatch.setattr(job_queue, '_process_alive', lambda pid: False)
+    queue.enqueue('download', {}, max_attempts=3)
+    _orphan(queue, queue.lease(owner='w1', lease_seconds=600))
+    assert queue.reclaim_dead_leases() == 1
+    assert queue.lease(owner='w2').attempts == 2
+
+
+def test_job_that_keeps_killing_its_worker_fails(queue, clock, monkeypatch):
+    monkeypatch.setattr(job_queue, '_process_alive', lambda pid: False)
+    queue.enqueue('postprocess', {}, max_attempts=2)
+    for _ in range(2):
+        _orphan(queue, queue.lease(owner='w', lease_seconds=600))
+        assert queue.reclaim_dead_leases() == 1
+    assert queue.lease(owner='w') is None
+    assert queue.counts() == {('postprocess', FAILED): 1}
+    assert queue.failed_jobs()[0]['last_error'] == 'lease expired'
+
+
+def test_live_workers_leases_are_kept(queue, clock):
+    queue.enqueue('download', {})
+    job = queue.lease(lease_seconds=600)
+    assert queue.reclaim_dead_leases() == 0
+    assert queue.ack(job)
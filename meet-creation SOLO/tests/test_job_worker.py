@@ -0,0 +1,88 @@
+import os
+import time
+
+import pytest
+
+import graph_client
+import job_worker
+import recording_download
+from conftest import ranged_server
+from graph_client import GraphError
+from job_queue import DONE, FAILED, QUEUED, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker, 'HANDLERS', dict(job_worker.HANDLERS))
+    monkeypatch.setattr(job_worker, 'REQUIRED_FIELDS', dict(job_worker.REQUIRED_FIELDS))
+    with JobQueue(str(tmp_path / 'jobs.db')) as queue:
+        yield queue
+
+
+def _run(queue, kind, payload, handler, required_fields=()):
+    job_worker.register_handler(kind, handler, required_fields)
+    queue.enqueue(kind, payload)
+    return job_worker.run_job(queue, queue.lease(owner='w'), {}, owner='w')
+
+
+def test_successful_job_is_acked(queue):
+    seen = []
+    assert _run(queue, 'echo', {'value': 1}, lambda job, context: seen.append(job.payload['value']), ('value',))
+    assert seen == [1]
+    assert queue.counts() == {('echo', DONE): 1}
+
+
+def test_missing_required_field_fails_permanently(queue):
+    assert not _run(queue, 'echo', {}, lambda job, context: None, ('value',))
+    assert queue.counts() == {('echo', FAILED): 1}
+    assert 'missing value' in queue.failed_jobs()[0]['last_error']
+
+
+def test_key_error_inside_a_handler_is_retried(queue):
+    def handler(job, context):
+        return {}['not-yet-there']
+
+    assert not _run(queue, 'echo', {'value': 1}, handler, ('value',))
+    assert queue.counts() == {('echo', QUEUED): 1}
+
+
+@pytest.mark.parametrize('status, state', [(404, FAILED), (429, QUEUED), (503, QUEUED)])
+def test_graph_errors_retry_only_when_they_can_change(queue, status, state):
+    def handler(job, context):
+        raise GraphError(status, 'error')
+
+    assert not _run(queue, 'echo', {}, handler)
+    assert queue.counts() == {('echo', state): 1}
+
+
+def test_unknown_kind_fails_permanently(queue):
+    queue.enqueue('nobody-handles-this', {})
+    assert not job_worker.run_job(queue, queue.lease(owner='w'), {}, owner='w')
+    assert queue.counts() == {('nobody-handles-this', FAILED): 1}
+
+
+def test_recording_download_extends_the_lease_from_the_worker_thread(queue, graph_session, tmp_path, monkeypatch):
+    # Two chunks (CHUNK_SIZE is fixed for queued downloads), each taking longer than a third of the lease
+    content = os.urandom(recording_download.CHUNK_SIZE + 4096)
+    url = graph_client.graph_url(graph_client.recording_content_path('meeting', 'recording'))
+    serve = ranged_server(content)
+
+    def slow(method, url, **kwargs):
+        time.sleep(0.05)
+        return serve(method, url, **kwargs)
+
+    graph_session.routes[url] = slow
+    monkeypatch.setattr(job_worker, 'LEASE_SECONDS', 0.06)
+    monkeypatch.chdir(tmp_path)
+
+    queue.enqueue('download_recording', {'meeting_id': 'meeting', 'recording_id': 'recording'})
+    job = queue.lease(owner='w', lease_seconds=1)
+    extensions = []
+    extend = queue.extend
+    monkeypatch.setattr(queue, 'extend', lambda *args, **kwargs: extensions.append(extend(*args, **kwargs)))
+
+    assert job_worker.run_job(queue, job, {'queue': queue, 'owner': 'w', 'access_token': 'token'}, owner='w')
+    assert extensions and all(extensions)
+    assert queue.counts() == {('download_recording', DONE): 1}
+    with open(recording_download.recording_filename('meeting', 'recording'), 'rb') as f:
+        assert f.read() == content
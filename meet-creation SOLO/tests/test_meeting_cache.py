@@ -0,0 +1,99 @@
+import urllib.parse
+
+import pytest
+
+import graph_client
+import meeting_cache
+from graph_client import GraphError
+from meeting_cache import MISSING, NOT_FOUND, MeetingCache
+
+MEETING_ID = 'MSoxMjM0NTY3ODk='
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(meeting_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = MeetingCache()
+    cache.set('a', {'id': 'a'}, ttl=60)
+    assert cache.get('a') == {'id': 'a'}
+    clock[0] += 61
+    assert cache.get('a') is MISSING
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MeetingCache(max_entries=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_sqlite_tier_survives_a_new_cache(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    cache = MeetingCache(db_path=path)
+    cache.set('meeting', {'id': 'm'}, ttl=60)
+    cache.set_missing('gone', ttl=60)
+
+    warm = MeetingCache(db_path=path)
+    assert warm.get('meeting') == {'id': 'm'}
+    assert warm.get('gone') is NOT_FOUND
+    warm.invalidate('meeting')
+    clock[0] += 61
+    assert MeetingCache(db_path=path).purge_expired() == 1
+
+
+def test_connection_is_reopened_in_a_forked_process(tmp_path, monkeypatch):
+    cache = MeetingCache(db_path=str(tmp_path / 'cache.db'))
+    parent = cache.db
+    assert cache.db is parent
+    monkeypatch.setattr(meeting_cache.os, 'getpid', lambda: -1)
+    assert cache.db is not parent
+
+
+def _meeting_url(suffix=''):
+    return graph_client.graph_url(f"me/onlineMeetings/{urllib.parse.quote(MEETING_ID, safe='')}{suffix}")
+
+
+def test_meeting_metadata_is_served_from_the_cache(graph_session):
+    url = _meeting_url()
+    graph_session.routes[url] = (200, {'id': MEETING_ID, 'subject': 'Planning'})
+    assert graph_client.get_online_meeting('token', MEETING_ID).subject == 'Planning'
+    assert graph_client.get_online_meeting('token', MEETING_ID).subject == 'Planning'
+    assert graph_session.urls() == [url]
+
+
+def test_missing_meeting_is_negative_cached(graph_session):
+    url = _meeting_url()
+    graph_session.routes[url] = (404, {'error': {'code': 'NotFound'}})
+    for _ in range(2):
+        with pytest.raises(GraphError) as error:
+            graph_client.get_online_meeting('token', MEETING_ID)
+        assert error.value.status_code == 404
+    assert graph_session.urls() == [url]
+
+
+def test_transcript_listing_404_is_cached_for_not_found_ttl(graph_session, clock, monkeypatch):
+    monkeypatch.setattr(graph_client, 'TRANSCRIPTS_TTL', 10)
+    monkeypatch.setattr(graph_client, 'NOT_FOUND_TTL', 300)
+    url = _meeting_url('/transcripts')
+    graph_session.routes[url] = (404, {'error': {'code': 'NotFound'}})
+
+    with pytest.raises(GraphError):
+        list(graph_client.iter_transcripts('token', MEETING_ID))
+    clock[0] += 60
+    with pytest.raises(GraphError):
+        list(graph_client.iter_transcripts('token', MEETING_ID))
+    assert len(graph_session.requests) == 1
+
+    clock[0] += 241
+    graph_session.routes[url] = (200, {'value': [{'id': 't1', 'meetingId': MEETING_ID}]})
+    assert [t.id for t in graph_client.iter_transcripts('token', MEETING_ID)] == ['t1']
+    assert len(graph_session.requests) == 2
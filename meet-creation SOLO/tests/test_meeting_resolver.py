@@ -0,0 +1,76 @@
+import pytest
+
+import graph_client
+from graph_models import OnlineMeeting
+from meeting_catalog import MeetingCatalog
+from meeting_resolver import (JOIN_MEETING_ID, JOIN_URL, MEETING_ID, classify_reference, resolve_meeting_id,
+                              resolve_meeting_ids)
+
+JOIN_WEB_URL = "https://teams.microsoft.com/l/meetup-join/19%3ameeting_abc%40thread.v2/0"
+OTHER_URL = "https://teams.microsoft.com/l/meetup-join/19%3ameeting_other%40thread.v2/0"
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = str(tmp_path / 'meetings.db')
+    with MeetingCatalog(path) as catalog:
+        catalog.record_meeting(OnlineMeeting.from_graph({
+            'id': 'catalog-meeting', 'subject': 'Standup', 'startDateTime': '2026-01-05T09:00:00Z',
+            'endDateTime': '2026-01-05T09:15:00Z', 'joinWebUrl': JOIN_WEB_URL,
+            'joinMeetingIdSettings': {'joinMeetingId': '123456789'}}))
+    return path
+
+
+@pytest.mark.parametrize('reference, expected', [
+    ('123 456 789', (JOIN_MEETING_ID, '123456789')),
+    (f"  {JOIN_WEB_URL} ", (JOIN_URL, JOIN_WEB_URL)),
+    ('MSoxMjM0NTY3ODk=', (MEETING_ID, 'MSoxMjM0NTY3ODk=')),
+])
+def test_classify_reference(reference, expected):
+    assert classify_reference(reference) == expected
+
+
+def test_catalog_hits_need_no_graph_call(graph_session, catalog_path):
+    assert resolve_meeting_id('token', '123 456 789', catalog_path) == 'catalog-meeting'
+    assert resolve_meeting_id('token', JOIN_WEB_URL, catalog_path) == 'catalog-meeting'
+    assert resolve_meeting_id('token', 'graph-id', catalog_path) == 'graph-id'
+    assert graph_session.requests == []
+
+
+def test_unknown_join_url_is_looked_up_once(graph_session, catalog_path):
+    path = graph_client.meeting_filter_path(join_url=OTHER_URL, select=OnlineMeeting.SELECT)
+    graph_session.routes[graph_client.graph_url(path)] = (200, {'value': [{'id': 'graph-meeting'}]})
+    for _ in range(2):
+        assert resolve_meeting_id('token', OTHER_URL, catalog_path) == 'graph-meeting'
+    assert graph_session.urls() == [graph_client.graph_url(path)]
+
+
+def test_no_match_is_cached_as_none(graph_session, catalog_path):
+    path = graph_client.meeting_filter_path(join_meeting_id='999', select=OnlineMeeting.SELECT)
+    graph_session.routes[graph_client.graph_url(path)] = (200, {'value': []})
+    assert resolve_meeting_id('token', '999', catalog_path) is None
+    assert resolve_meeting_id('token', '999', catalog_path) is None
+    assert len(graph_session.requests) == 1
+
+
+def test_bulk_resolution_batches_what_the_catalog_lacks(graph_session, catalog_path):
+    def batch(method, url, json=None, **kwargs):
+        responses = []
+        for request in json['requests']:
+            if 'JoinWebUrl' in request['url']:
+                responses.append({'id': request['id'], 'status': 200, 'body': {'value': [{'id': 'from-url'}]}})
+            else:
+                responses.append({'id': request['id'], 'status': 404, 'body': {}})
+        return 200, {'responses': responses}
+
+    graph_session.routes[graph_client.graph_url('$batch')] = batch
+    references = ['123456789', '123 456 789', OTHER_URL, '555', 'graph-id']
+    assert resolve_meeting_ids('token', references, catalog_path) == {
+        '123456789': 'catalog-meeting', '123 456 789': 'catalog-meeting', OTHER_URL: 'from-url', '555': None,
+        'graph-id': 'graph-id'}
+    assert len(graph_session.requests) == 1
+    assert len(graph_session.requests[0][2]['json']['requests']) == 2
+
+    # Both lookups are now cached, the miss included
+    resolve_meeting_ids('token', [OTHER_URL, '555'], catalog_path)
+    assert len(graph_session.requests) == 1
@@ -0,0 +1,89 @@
+import time
+
+import poller_shards
+from poller_shards import HashRing, ShardMembership
+
+MEETINGS = [f"meeting-{i}" for i in range(2000)]
+
+
+def _owners(ring):
+    return {meeting: ring.owner(meeting) for meeting in MEETINGS}
+
+
+def test_every_meeting_has_one_owner_spread_over_the_workers():
+    owners = _owners(HashRing(['a', 'b', 'c', 'd']))
+    counts = {worker: list(owners.values()).count(worker) for worker in 'abcd'}
+    assert set(owners.values()) == set('abcd')
+    assert all(count > len(MEETINGS) / 4 * 0.5 for count in counts.values())
+
+
+def test_ownership_does_not_depend_on_member_order():
+    assert _owners(HashRing(['a', 'b', 'c'])) == _owners(HashRing(['c', 'a', 'b']))
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([]).owner('meeting-1') is None
+
+
+def test_adding_a_worker_moves_only_its_share():
+    before = _owners(HashRing(['a', 'b', 'c', 'd']))
+    after = _owners(HashRing(['a', 'b', 'c', 'd', 'e']))
+    moved = [meeting for meeting in MEETINGS if before[meeting] != after[meeting]]
+    # Only meetings taken over by the new worker move, about 1/N of them
+    assert all(after[meeting] == 'e' for meeting in moved)
+    assert 0.1 < len(moved) / len(MEETINGS) < 0.3
+
+
+def test_removing_a_worker_moves_only_its_meetings():
+    before = _owners(HashRing(['a', 'b', 'c', 'd']))
+    after = _owners(HashRing(['a', 'b', 'c']))
+    assert all(before[meeting] == 'd' for meeting in MEETINGS if before[meeting] != after[meeting])
+
+
+def test_membership_rebalances_when_workers_join_and_leave(tmp_path):
+    path = str(tmp_path / 'poller.db')
+    first = ShardMembership('first', path=path)
+    assert first.refresh_ring()
+    assert all(first.owns(meeting) for meeting in MEETINGS[:50])
+    assert not first.refresh_ring()
+
+    second = ShardMembership('second', path=path)
+    second.refresh_ring()
+    assert first.refresh_ring()
+    owned = [meeting for meeting in MEETINGS if first.owns(meeting)]
+    assert 0 < len(owned) < len(MEETINGS)
+    assert all(not second.owns(meeting) for meeting in owned)
+
+    second.leave()
+    assert first.refresh_ring()
+    assert all(first.owns(meeting) for meeting in MEETINGS[:50])
+    first.leave()
+
+
+def test_expired_members_drop_out(tmp_path, monkeypatch):
+    path = str(tmp_path / 'poller.db')
+    now = [1000.0]
+    monkeypatch.setattr(poller_shards.time, 'time', lambda: now[0])
+    stale = ShardMembership('stale', path=path, ttl=300)
+    live = ShardMembership('live', path=path, ttl=300)
+    stale.heartbeat()
+    assert sorted(live.heartbeat()) == ['live', 'stale']
+
+    now[0] += 301
+    assert live.heartbeat() == ['live']
+    stale.conn.close()
+    live.leave()
+
+
+def test_heartbeat_thread_keeps_the_lease_alive(tmp_path):
+    path = str(tmp_path / 'poller.db')
+    member = ShardMembership('worker', path=path, ttl=0.3)
+    observer = ShardMembership('observer', path=path, ttl=60)
+    member.heartbeat()
+    member.start_heartbeat(interval=0.05)
+    time.sleep(0.6)
+    assert 'worker' in observer.heartbeat()
+
+    member.leave()
+    assert observer.heartbeat() == ['observer']
+    observer.leave()
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import graph_client
+import recording_download
+from conftest import FakeResponse, ranged_server
+from recording_download import RecordingDownloadError, download_content
+
+URL = graph_client.graph_url(graph_client.recording_content_path('meeting', 'recording'))
+CONTENT = bytes(range(256)) * 40 + b'tail'
+
+
+def _ranges_requested(session):
+    return [kwargs['headers']['Range'] for _, _, kwargs in session.requests]
+
+
+def test_parallel_ranges_assemble_the_file(graph_session, tmp_path):
+    graph_session.routes[URL] = ranged_server(CONTENT)
+    filename = str(tmp_path / 'recording.mp4')
+    progress = []
+    size, sha256 = download_content('token', URL, filename, workers=3, chunk_size=1000,
+                                    progress=lambda done, total: progress.append((done, total)))
+    assert (size, sha256) == (len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+    with open(filename, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(filename + '.part') and not os.path.exists(filename + '.part.json')
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+    assert progress[-1] == (len(CONTENT), len(CONTENT))
+
+
+def test_interrupted_download_resumes_with_the_missing_chunks(graph_session, tmp_path):
+    filename = str(tmp_path / 'recording.mp4')
+    graph_session.routes[URL] = ranged_server(CONTENT, fail_ranges={(2000, 2999)})
+    with pytest.raises(graph_client.GraphError):
+        download_content('token', URL, filename, workers=1, chunk_size=1000)
+    with open(filename + '.part.json', encoding='utf-8') as f:
+        assert '2' not in json.load(f)['chunks']
+
+    graph_session.requests.clear()
+    graph_session.routes[URL] = ranged_server(CONTENT)
+    assert download_content('token', URL, filename, workers=1, chunk_size=1000)[0] == len(CONTENT)
+    assert _ranges_requested(graph_session) == ['bytes=0-0', 'bytes=2000-2999']
+
+
+def test_changed_etag_starts_over(graph_session, tmp_path):
+    filename = str(tmp_path / 'recording.mp4')
+    graph_session.routes[URL] = ranged_server(CONTENT, fail_ranges={(1000, 1999)})
+    with pytest.raises(graph_client.GraphError):
+        download_content('token', URL, filename, workers=1, chunk_size=1000)
+
+    graph_session.requests.clear()
+    graph_session.routes[URL] = ranged_server(CONTENT, etag='"v2"')
+    download_content('token', URL, filename, workers=1, chunk_size=1000)
+    assert len(_ranges_requested(graph_session)) == 1 + len(range(0, len(CONTENT), 1000))
+
+
+def test_server_without_ranges_gets_one_streamed_download(graph_session, tmp_path):
+    graph_session.routes[URL] = FakeResponse(200, headers={'Content-Length': str(len(CONTENT))}, content=CONTENT)
+    filename = str(tmp_path / 'recording.mp4')
+    assert download_content('token', URL, filename) == (len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+
+
+def test_short_streamed_download_is_not_renamed_into_place(graph_session, tmp_path):
+    def truncated(method, url, **kwargs):
+        return FakeResponse(200, headers={'Content-Length': str(len(CONTENT))}, content=CONTENT[:-10])
+
+    graph_session.routes[URL] = truncated
+    filename = str(tmp_path / 'recording.mp4')
+    with pytest.raises(RecordingDownloadError, match='Size mismatch'):
+        download_content('token', URL, filename)
+    assert not os.path.exists(filename)
+
+
+def test_oversized_chunk_is_retried_then_reported(graph_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(recording_download.time, 'sleep', lambda seconds: None)
+
+    def too_much(method, url, headers=None, **kwargs):
+        if headers['Range'] == 'bytes=0-0':
+            return FakeResponse(206, headers={'Content-Range': f"bytes 0-0/{len(CONTENT)}"}, content=CONTENT[:1])
+        return FakeResponse(206, headers={}, content=CONTENT)
+
+    graph_session.routes[URL] = too_much
+    with pytest.raises(RecordingDownloadError, match='failed after'):
+        download_content('token', URL, str(tmp_path / 'recording.mp4'), workers=1, chunk_size=len(CONTENT) // 2)
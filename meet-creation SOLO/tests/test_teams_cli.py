@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import teams_cli
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('flask', 'numpy')
+
+
+def _python(code, *args):
+    env = dict(os.environ, PYTHONPATH=MODULE_DIR)
+    return subprocess.run([sys.executable, '-c', code, *args], capture_output=True, text=True, env=env,
+                          cwd=MODULE_DIR, timeout=60)
+
+
+def _loaded_after(statement, modules=HEAVY_MODULES):
+    """Which of modules are in sys.modules after running statement in a fresh interpreter"""
+    code = f"import sys\n{statement}\nprint('loaded:' + ','.join(m for m in {tuple(modules)!r} if m in sys.modules))"
+    result = _python(code)
+    assert result.returncode == 0, result.stderr
+    loaded = result.stdout.strip().splitlines()[-1]
+    assert loaded.startswith('loaded:')
+    return [name for name in loaded[len('loaded:'):].split(',') if name]
+
+
+def test_help_lists_every_command():
+    result = _python("import sys, teams_cli; sys.exit(teams_cli.main())", '--help')
+    assert result.returncode == 0, result.stderr
+    for command in teams_cli.COMMANDS:
+        assert f"  {command}" in result.stdout
+
+
+def test_help_imports_no_command_module():
+    modules = [module for module, _ in teams_cli.COMMANDS.values()] + ['settings', 'requests', *HEAVY_MODULES]
+    assert _loaded_after("import teams_cli; teams_cli.main(['--help'])", modules) == []
+
+
+def test_pull_and_worker_load_without_flask_or_numpy():
+    for command in ('pull', 'worker'):
+        module = teams_cli.COMMANDS[command][0]
+        assert _loaded_after(f"import {module}") == [], command
+
+
+def test_unknown_command_exits_with_usage(capsys):
+    assert teams_cli.main(['nope']) == 2
+    assert 'usage: teams' in capsys.readouterr().err
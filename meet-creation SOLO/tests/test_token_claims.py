@@ -0,0 +1,68 @@
+import base64
+import json
+
+import pytest
+
+import graph_client
+import transcript_download
+from graph_client import MissingScopeError, require_permission
+from token_claims import expires_at, grants_scope, missing_permissions, token_claims
+
+
+def jwt(**payload):
+    """An unsigned JWT carrying payload - the claims are read without checking signatures"""
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii').rstrip('=')
+    return f"{part({'alg': 'none', 'typ': 'JWT'})}.{part(payload)}.signature"
+
+
+DELEGATED = jwt(scp="OnlineMeetings.ReadWrite User.Read", exp=2_000_000_000, tid='tenant', oid='user')
+APP_ONLY = jwt(roles=['OnlineMeetingTranscript.Read.All'], exp=2_000_000_000)
+
+
+def test_claims_of_a_delegated_token():
+    claims = token_claims(DELEGATED)
+    assert claims.scopes == {'OnlineMeetings.ReadWrite', 'User.Read'}
+    assert claims.tenant_id == 'tenant' and claims.object_id == 'user'
+    assert not claims.app_only
+    assert token_claims(APP_ONLY).app_only
+
+
+@pytest.mark.parametrize('token', ['opaque-token-for-a-personal-account', 'a.b', None])
+def test_unreadable_tokens_pass_every_check(token):
+    assert token_claims(token) is None
+    assert missing_permissions(token, 'transcripts') is None
+    assert grants_scope(token, 'OnlineMeetings.ReadWrite')
+    assert expires_at(token) is None
+
+
+def test_missing_permissions():
+    assert missing_permissions(DELEGATED, 'meetings_read') is None
+    assert missing_permissions(DELEGATED, 'transcripts') == ('OnlineMeetingTranscript.Read.All',)
+    assert missing_permissions(APP_ONLY, 'transcripts') is None
+
+
+def test_grants_scope_ignores_protocol_scopes():
+    assert grants_scope(DELEGATED, "https://graph.microsoft.com/OnlineMeetings.ReadWrite offline_access openid")
+    assert not grants_scope(DELEGATED, "OnlineMeetings.ReadWrite OnlineMeetingTranscript.Read.All")
+
+
+def test_expires_at():
+    assert expires_at(DELEGATED) == 2_000_000_000
+    assert expires_at(jwt(scp="User.Read")) is None
+
+
+def test_require_permission_raises_a_403():
+    with pytest.raises(MissingScopeError) as raised:
+        require_permission(DELEGATED, 'recordings', url='https://graph.microsoft.com/v1.0/me')
+    assert raised.value.status_code == 403
+    assert raised.value.kind == 'recordings'
+    require_permission(DELEGATED, 'meetings_write')
+
+
+def test_missing_scope_fails_before_any_request(graph_session):
+    with pytest.raises(MissingScopeError):
+        transcript_download.download_transcript_content(DELEGATED, 'm1', 't1')
+    with pytest.raises(MissingScopeError):
+        list(graph_client.iter_online_meetings(APP_ONLY))
+    assert graph_session.requests == []
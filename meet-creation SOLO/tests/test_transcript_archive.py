@@ -0,0 +1,52 @@
+import transcript_archive
+
+
+def _texts(cues):
+    return [str(cue['text'], 'utf-8') for cue in cues]
+
+
+def _write(tmp_path, cues, meeting_id='meeting'):
+    cues = [dict(start_ms=start, end_ms=end, speaker=speaker, text=text) for start, end, speaker, text in cues]
+    return transcript_archive.write_archive(cues, meeting_id, 'transcript', str(tmp_path))
+
+
+def test_query_includes_cues_that_started_before_the_window(tmp_path):
+    base_path = _write(tmp_path, [(0, 5000, 'A', 'zero'), (4000, 8000, 'B', 'four'),
+                                  (8000, 10500, 'A', 'eight'), (42000, 47000, 'B', 'fortytwo')])
+    with transcript_archive.TranscriptArchive(base_path) as archive:
+        assert _texts(archive.query(4500, 9000)) == ['zero', 'four', 'eight']
+        assert _texts(archive.query(4500, 9000, speaker='A')) == ['zero', 'eight']
+        assert _texts(archive.query(5500, 9000)) == ['four', 'eight']
+
+
+def test_query_finds_cues_behind_a_long_earlier_cue(tmp_path):
+    # 'short' ends before the window although a cue before it ('long') is still running
+    base_path = _write(tmp_path, [(0, 10000, 'A', 'long'), (1000, 2000, 'B', 'short'), (3000, 9000, 'B', 'mid')])
+    with transcript_archive.TranscriptArchive(base_path) as archive:
+        assert _texts(archive.query(4500, 9000)) == ['long', 'mid']
+        assert _texts(archive.query(4500, 9000, speaker='B')) == ['mid']
+
+
+def test_window_end_is_exclusive(tmp_path):
+    base_path = _write(tmp_path, [(0, 1000, 'A', 'first'), (1000, 2000, 'A', 'second')])
+    with transcript_archive.TranscriptArchive(base_path) as archive:
+        assert _texts(archive.query(0, 1000)) == ['first']
+        assert _texts(archive.query(1000, 1001)) == ['second']
+
+
+def test_query_meeting_reads_every_archive_of_the_meeting(tmp_path):
+    _write(tmp_path, [(0, 5000, 'A', 'zero'), (42000, 47000, 'B', 'fortytwo')])
+    texts = [cue['text'] for cue in transcript_archive.query_meeting('meeting', 43000, 44000,
+                                                                     archive_dir=str(tmp_path))]
+    assert texts == ['fortytwo']
+
+
+def test_text_is_the_contiguous_slice_of_overlapping_cues(tmp_path):
+    base_path = _write(tmp_path, [(0, 5000, 'A', 'zero'), (4000, 8000, 'B', 'four'), (9000, 9500, 'A', 'nine')])
+    with transcript_archive.TranscriptArchive(base_path) as archive:
+        text = archive.text(4500, 8500)
+        assert bytes(text) == b'zero\nfour'
+        text.release()
+        empty = archive.text(8100, 8900)
+        assert bytes(empty) == b''
+        empty.release()
@@ -0,0 +1,48 @@
+import os
+
+import transcript_download
+from conftest import FakeResponse
+from graph_client import graph_url, transcript_content_path
+from transcript_store import content_hash, read_transcript
+
+VTT = "WEBVTT\n\n00:00:01.000 --> 00:00:02.500\n<v Ann>Hello there</v>\n".encode('utf-8') * 50
+URL = graph_url(transcript_content_path('m1', 't1')) + "?$format=text/vtt"
+
+
+class StreamedResponse(FakeResponse):
+    """A streamed body with a raw connection reporting the bytes read off the wire"""
+
+    class Raw:
+        def tell(self):
+            return 120
+
+    raw = Raw()
+
+
+def test_download_returns_the_read_buffer_without_copying(graph_session, monkeypatch):
+    monkeypatch.setattr(transcript_download, 'READ_SIZE', 100)
+    monkeypatch.setattr(transcript_download, 'transfer_stats', transcript_download.TransferStats())
+    graph_session.routes[URL] = StreamedResponse(200, content=VTT)
+
+    content = transcript_download.download_transcript_content('token', 'm1', 't1')
+    assert isinstance(content, bytearray)
+    assert content == VTT
+    assert transcript_download.transfer_stats.content_bytes == len(VTT)
+    assert transcript_download.transfer_stats.wire_bytes == 120
+
+
+def test_failed_download_returns_none(graph_session):
+    graph_session.routes[URL] = StreamedResponse(404)
+    assert transcript_download.download_transcript_content('token', 'm1', 't1') is None
+
+
+def test_downloaded_buffer_is_stored_archived_and_indexed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(transcript_download, 'TRANSCRIPT_STORAGE', 'compressed')
+    content = bytearray(VTT)
+
+    filename = transcript_download.store_downloaded_transcript(content, 'm1', 't1', '2026-01-01T00:00:00Z')
+    assert read_transcript(filename) == VTT.decode('utf-8')
+    assert os.path.basename(filename).startswith(content_hash(VTT))
+    assert os.path.isfile(os.path.join('transcripts', 'search_index.db'))
+    assert os.path.isfile(os.path.join('transcripts', 'manifest.jsonl'))
@@ -0,0 +1,69 @@
+import pytest
+
+from transcript_index import TranscriptIndex, decode_hits, decode_varints, encode_hits, encode_varint, tokenize
+
+
+def _cues(*texts, step=1000):
+    return [dict(start_ms=i * step, end_ms=(i + 1) * step, speaker='A', text=text) for i, text in enumerate(texts)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    with TranscriptIndex(str(tmp_path / 'index.db')) as index:
+        yield index
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 63])
+def test_varint_round_trip(value):
+    out = bytearray()
+    encode_varint(value, out)
+    assert list(decode_varints(out)) == [value]
+    assert len(out) == max(1, (value.bit_length() + 6) // 7)
+
+
+def test_hits_round_trip_as_deltas():
+    hits = [(0, 0), (3, 4500), (3, 4500), (200, 3_600_000), (201, 3_600_250)]
+    out = bytearray()
+    encode_hits(hits, out)
+    assert decode_hits(bytes(out)) == hits
+    empty = bytearray()
+    encode_hits([], empty)
+    assert decode_hits(empty) == []
+
+
+def test_tokenize_keeps_contractions():
+    assert tokenize("Don't ship it, Bob's BUILD failed") == ["don't", 'ship', 'it', "bob's", 'build', 'failed']
+
+
+def test_search_ranks_by_term_frequency_and_reports_every_match(index):
+    index.add_transcript('m1', 't1', _cues('budget review', 'budget budget again', 'other things'))
+    index.add_transcript('m2', 't2', _cues('the budget once', 'other things', 'more words here'))
+    index.add_transcript('m3', 't3', _cues('nothing relevant', 'at all'))
+
+    results = index.search('budget')
+    assert [result['meeting_id'] for result in results] == ['m1', 'm2']
+    assert results[0]['score'] > results[1]['score']
+    assert [(match['cue'], match['start_ms']) for match in results[0]['matches']] == [(0, 0), (1, 1000)]
+
+
+def test_rare_terms_weigh_more_than_common_ones(index):
+    index.add_transcript('m1', 't1', _cues('roadmap planning'))
+    index.add_transcript('m2', 't2', _cues('planning session'))
+    index.add_transcript('m3', 't3', _cues('planning again'))
+
+    results = index.search('roadmap planning')
+    assert results[0]['meeting_id'] == 'm1'
+    assert {result['meeting_id'] for result in results} == {'m1', 'm2', 'm3'}
+
+
+def test_shorter_documents_rank_higher_for_the_same_frequency(index):
+    index.add_transcript('short', 't', _cues('launch date'))
+    index.add_transcript('long', 't', _cues('launch date', 'many more words in this long transcript today'))
+    assert [result['meeting_id'] for result in index.search('launch')] == ['short', 'long']
+
+
+def test_transcripts_are_indexed_once(index):
+    assert index.add_transcript('m1', 't1', _cues('hello'))
+    assert not index.add_transcript('m1', 't1', _cues('hello hello'))
+    assert len(index.search('hello')) == 1
+    assert index.search('missing') == [] and index.search('   ') == []
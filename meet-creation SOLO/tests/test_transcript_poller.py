@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from examples import transcript_poller
+from job_queue import JobQueue
+from job_worker import meeting_group
+
+LAST_CHECK = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def queue_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'jobs.db')
+    monkeypatch.setattr(transcript_poller, 'JobQueue', lambda: JobQueue(path))
+    return path
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    """Records the look-back each meeting was checked with; results are set per meeting id"""
+    calls = []
+    results = {}
+
+    def check(access_token, meeting, since):
+        calls.append((meeting['meeting_id'], since))
+        return results.get(meeting['meeting_id'], [])
+
+    monkeypatch.setattr(transcript_poller, 'check_meeting_transcripts', check)
+    return calls, results
+
+
+def meetings(*ids):
+    return [{'meeting_id': meeting_id, 'label': meeting_id, 'subscription_id': None} for meeting_id in ids]
+
+
+def test_claimed_meeting_keeps_its_look_back(queue_path, checks):
+    calls, _ = checks
+    with JobQueue(queue_path) as queue:
+        assert queue.claim_group(meeting_group('m2'), 60)  # another process is listing m2
+
+    unpolled = {}
+    transcript_poller.poll_meetings('token', meetings('m1', 'm2'), LAST_CHECK, False, unpolled=unpolled)
+    assert calls == [('m1', LAST_CHECK)]
+    assert unpolled == {'m2': LAST_CHECK}
+
+    # Next cycle: last_check moved on, but m2 is still looked at from where it was skipped
+    with JobQueue(queue_path) as queue:
+        queue.conn.execute("DELETE FROM coalesce_groups")
+    calls.clear()
+    transcript_poller.poll_meetings('token', meetings('m1', 'm2'), LAST_CHECK + timedelta(minutes=1), False,
+                                    unpolled=unpolled)
+    assert calls == [('m1', LAST_CHECK + timedelta(minutes=1)), ('m2', LAST_CHECK)]
+    assert unpolled == {}
+
+
+def test_failed_check_is_retried_from_the_same_point(queue_path, checks):
+    calls, results = checks
+    results['m1'] = None
+    unpolled = {}
+    transcript_poller.poll_meetings('token', meetings('m1'), LAST_CHECK, False, unpolled=unpolled)
+    assert unpolled == {'m1': LAST_CHECK}
+
+
+def test_meetings_no_longer_watched_are_dropped(queue_path, checks):
+    unpolled = {'gone': LAST_CHECK - timedelta(hours=1)}
+    transcript_poller.poll_meetings('token', meetings('m1'), LAST_CHECK, False, unpolled=unpolled)
+    assert unpolled == {}
+
+
+def test_new_transcripts_are_processed(queue_path, checks, monkeypatch):
+    _, results = checks
+    results['m1'] = ['t1', 't2']
+    processed = []
+    monkeypatch.setattr(transcript_poller, 'process_new_transcript',
+                        lambda meeting, transcript: processed.append((meeting['meeting_id'], transcript)))
+    assert transcript_poller.poll_meetings('token', meetings('m1'), LAST_CHECK, False)
+    assert processed == [('m1', 't1'), ('m1', 't2')]
+
+
+def test_claim_group_blocks_within_window(tmp_path):
+    with JobQueue(str(tmp_path / 'jobs.db')) as queue:
+        assert queue.claim_group(meeting_group('m1'), 60)
+        assert not queue.claim_group(meeting_group('m1'), 60)
+        assert queue.claim_group(meeting_group('m2'), 60)
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import transcript_store
+from transcript_store import content_hash, find_object, read_transcript, store_transcript, transcript_stem
+
+VTT = "WEBVTT\n\n00:00:00.000 --> 00:00:02.000\n<v Ada>Héllo everyone</v>\n"
+
+
+def _stored_files(objects_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), objects_dir)
+                  for root, _, names in os.walk(objects_dir) for name in names)
+
+
+def test_stores_compressed_under_the_content_hash(tmp_path):
+    path, digest, written = store_transcript(VTT, str(tmp_path))
+    assert digest == content_hash(VTT) == content_hash(VTT.encode('utf-8'))
+    assert path == transcript_store.object_path(digest, os.path.splitext(path)[1], str(tmp_path))
+    assert written == os.path.getsize(path) > 0
+    assert read_transcript(path) == VTT
+    assert transcript_stem(path) == digest
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    first, digest, _ = store_transcript(VTT, str(tmp_path))
+    second, same_digest, written = store_transcript(VTT.encode('utf-8'), str(tmp_path))
+    assert (second, same_digest, written) == (first, digest, 0)
+    other, other_digest, _ = store_transcript(VTT + "\n", str(tmp_path))
+    assert other_digest != digest and other != first
+    assert len(_stored_files(str(tmp_path))) == 2
+
+
+def test_gzip_objects_are_readable_without_zstandard(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcript_store, 'zstandard', None)
+    path, digest, _ = store_transcript(VTT, str(tmp_path))
+    assert path.endswith('.vtt.gz')
+    assert find_object(digest, str(tmp_path)) == path
+    assert read_transcript(path) == VTT
+
+
+def test_plain_vtt_files_are_read_as_is(tmp_path):
+    path = tmp_path / 'meeting.vtt'
+    path.write_text(VTT, encoding='utf-8')
+    assert read_transcript(str(path)) == VTT
+    assert transcript_stem(str(path)) == 'meeting'
+
+
+def test_concurrent_writers_leave_one_object_and_no_temp_files(tmp_path):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store_transcript(VTT, str(tmp_path))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({path for path, _, _ in results}) == 1
+    assert len(_stored_files(str(tmp_path))) == 1
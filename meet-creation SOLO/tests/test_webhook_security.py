@@ -0,0 +1,160 @@
+import base64
+import hashlib
+import json
+import random
+import time
+
+import pytest
+
+import webhook_security
+from meeting_catalog import MeetingCatalog
+from webhook_security import NotificationVerificationError, SigningKeys, verify_notifications, verify_validation_token
+
+AUDIENCE = 'test-client-id'
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _is_probable_prime(n, rng):
+    if n % 2 == 0:
+        return n == 2
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(20):
+        x = pow(rng.randrange(2, n - 1), d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _prime(bits, rng):
+    while True:
+        candidate = rng.getrandbits(bits) | (1 << bits - 1) | 1
+        if _is_probable_prime(candidate, rng):
+            return candidate
+
+
+class RsaKey:
+    """A throwaway RS256 signer, generated locally so no key material is checked in"""
+
+    def __init__(self, bits=1024, seed=0):
+        rng = random.Random(seed)
+        self.e = 65537
+        while True:
+            p, q = _prime(bits // 2, rng), _prime(bits // 2, rng)
+            phi = (p - 1) * (q - 1)
+            if p != q and phi % self.e:
+                break
+        self.n = p * q
+        self.d = pow(self.e, -1, phi)
+
+    def sign(self, claims, kid='key-1', alg='RS256'):
+        header = _b64(json.dumps({'alg': alg, 'kid': kid}).encode())
+        payload = _b64(json.dumps(claims).encode())
+        key_length = (self.n.bit_length() + 7) // 8
+        digest_info = webhook_security._SHA256_PREFIX + hashlib.sha256(f"{header}.{payload}".encode()).digest()
+        encoded = b'\x00\x01' + b'\xff' * (key_length - len(digest_info) - 3) + b'\x00' + digest_info
+        signature = pow(int.from_bytes(encoded, 'big'), self.d, self.n).to_bytes(key_length, 'big')
+        return f"{header}.{payload}.{_b64(signature)}"
+
+    def jwk(self, kid='key-1'):
+        return {'kty': 'RSA', 'kid': kid, 'n': _b64(self.n.to_bytes((self.n.bit_length() + 7) // 8, 'big')),
+                'e': _b64(self.e.to_bytes(3, 'big'))}
+
+
+@pytest.fixture(scope='module')
+def rsa_key():
+    return RsaKey()
+
+
+@pytest.fixture
+def keys(rsa_key):
+    return SigningKeys(keys={'key-1': (rsa_key.n, rsa_key.e)})
+
+
+def _claims(**overrides):
+    now = time.time()
+    claims = {'aud': AUDIENCE, 'iss': 'https://sts.windows.net/tenant/', 'nbf': now - 10, 'exp': now + 3600,
+              'azp': webhook_security.GRAPH_NOTIFICATION_APP_ID}
+    claims.update(overrides)
+    return claims
+
+
+def test_valid_token_returns_its_claims(rsa_key, keys):
+    claims = verify_validation_token(rsa_key.sign(_claims()), keys, AUDIENCE)
+    assert claims['aud'] == AUDIENCE
+
+
+@pytest.mark.parametrize('overrides', [
+    {'aud': 'another-app'},
+    {'azp': 'another-app'},
+    {'iss': 'https://evil.example/'},
+    {'exp': 1000},
+    {'nbf': time.time() + 3600},
+])
+def test_tokens_with_wrong_claims_are_refused(rsa_key, keys, overrides):
+    with pytest.raises(NotificationVerificationError):
+        verify_validation_token(rsa_key.sign(_claims(**overrides)), keys, AUDIENCE)
+
+
+def test_tampered_signature_is_refused(rsa_key, keys):
+    header, payload, _ = rsa_key.sign(_claims()).split('.')
+    forged_payload = _b64(json.dumps(_claims(aud='forged')).encode())
+    _, _, signature = rsa_key.sign(_claims(aud='forged')).split('.')
+    with pytest.raises(NotificationVerificationError, match='signature'):
+        verify_validation_token(f"{header}.{payload}.{signature}", keys, AUDIENCE)
+    with pytest.raises(NotificationVerificationError, match='signature'):
+        verify_validation_token(f"{header}.{forged_payload}.{_b64(b'x' * 128)}", keys, AUDIENCE)
+
+
+def test_token_from_another_key_is_refused(keys):
+    with pytest.raises(NotificationVerificationError, match='signature'):
+        verify_validation_token(RsaKey(seed=1).sign(_claims()), keys, AUDIENCE)
+
+
+def test_unknown_kid_and_other_algorithms_are_refused(rsa_key, keys):
+    with pytest.raises(NotificationVerificationError, match='Unknown signing key'):
+        verify_validation_token(rsa_key.sign(_claims(), kid='key-2'), keys, AUDIENCE)
+    with pytest.raises(NotificationVerificationError, match='algorithm'):
+        verify_validation_token(rsa_key.sign(_claims(), alg='none'), keys, AUDIENCE)
+    with pytest.raises(NotificationVerificationError, match='not a JWT'):
+        verify_validation_token('not-a-token', keys, AUDIENCE)
+
+
+def test_keys_are_fetched_once_from_the_jwks(rsa_key):
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return {'keys': [rsa_key.jwk()]}
+
+    keys = SigningKeys(fetch=fetch)
+    verify_validation_token(rsa_key.sign(_claims(exp=time.time() + 1800)), keys, AUDIENCE)
+    verify_validation_token(rsa_key.sign(_claims(exp=time.time() + 1700)), keys, AUDIENCE)
+    assert len(fetches) == 1
+
+
+def test_notifications_are_filtered_by_client_state(rsa_key, keys, tmp_path):
+    with MeetingCatalog(str(tmp_path / 'meetings.db')) as catalog:
+        catalog.record_subscription('sub-1', 'users/u/onlineMeetings/getAllTranscripts', 'secret')
+        payload = {'validationTokens': [rsa_key.sign(_claims())], 'value': [
+            {'subscriptionId': 'sub-1', 'clientState': 'secret'},
+            {'subscriptionId': 'sub-1', 'clientState': 'guess'},
+            {'subscriptionId': 'sub-2', 'clientState': 'secret'},
+        ]}
+        accepted = verify_notifications(payload, catalog, keys, AUDIENCE)
+        assert accepted == [{'subscriptionId': 'sub-1', 'clientState': 'secret'}]
+
+        payload['validationTokens'] = [rsa_key.sign(_claims(aud='another-app'))]
+        with pytest.raises(NotificationVerificationError):
+            verify_notifications(payload, catalog, keys, AUDIENCE)
@@ -0,0 +1,111 @@
+"""
+Claims of an access token, read locally
+
+Graph access tokens are JWTs whose payload says what the token may do (scp
+for delegated scopes, roles for application permissions), when it expires
+(exp), and for which tenant (tid) and user or app (oid). Reading them costs
+no request, so callers can:
+
+- refuse a call the token has no permission for: graph_client raises
+  MissingScopeError, a 403 GraphError, before anything is sent
+- refresh a token that is about to expire instead of waiting for a 401
+  (delegated_auth.current_access_token)
+
+Each token is decoded once and cached. The signature is not checked - the
+claims only save pointless requests, and Graph still validates every token.
+Tokens that are not JWTs (personal Microsoft accounts) have no readable
+claims; every check passes for them and Graph decides.
+"""
+
+import base64
+import json
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Permissions (delegated or application) that allow each kind of call; any one is enough
+PERMISSIONS = {
+    'meetings_read': ('OnlineMeetings.Read', 'OnlineMeetings.ReadWrite', 'OnlineMeetings.Read.All',
+                      'OnlineMeetings.ReadWrite.All'),
+    'meetings_write': ('OnlineMeetings.ReadWrite', 'OnlineMeetings.ReadWrite.All'),
+    'transcripts': ('OnlineMeetingTranscript.Read.All',),
+    'recordings': ('OnlineMeetingRecording.Read.All',),
+    'attendance': ('OnlineMeetingArtifact.Read.All',),
+    'call_records': ('CallRecords.Read.All',),
+}
+
+# Scopes requested alongside Graph permissions that never appear in scp
+_PROTOCOL_SCOPES = {'offline_access', 'openid', 'profile', 'email', '.default'}
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    __slots__ = ('scopes', 'roles', 'expires', 'tenant_id', 'object_id')
+
+    scopes: frozenset
+    roles: frozenset
+    expires: int
+    tenant_id: str
+    object_id: str
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(
+            scopes=frozenset((payload.get('scp') or '').split()),
+            roles=frozenset(payload.get('roles') or ()),
+            expires=int(payload.get('exp') or 0),
+            tenant_id=payload.get('tid'),
+            object_id=payload.get('oid')
+        )
+
+    @property
+    def app_only(self):
+        return not self.scopes and bool(self.roles)
+
+    @property
+    def permissions(self):
+        return self.scopes | self.roles
+
+    def expires_in(self):
+        return self.expires - time.time()
+
+    def grants_any(self, permissions):
+        return not permissions or any(permission in self.permissions for permission in permissions)
+
+
+@lru_cache(maxsize=32)
+def token_claims(access_token):
+    """TokenClaims of a JWT access token, or None for tokens that cannot be read"""
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return TokenClaims.from_payload(json.loads(base64.urlsafe_b64decode(payload)))
+    except (AttributeError, IndexError, ValueError, TypeError):
+        return None
+
+
+def scope_names(scope):
+    """'https://graph.microsoft.com/OnlineMeetings.ReadWrite offline_access' -> ['OnlineMeetings.ReadWrite']"""
+    names = [item.rsplit('/', 1)[-1] for item in (scope or '').split()]
+    return [name for name in names if name not in _PROTOCOL_SCOPES]
+
+
+def missing_permissions(access_token, kind):
+    """The permissions a call of this kind accepts when the token has none of them, else None"""
+    claims = token_claims(access_token)
+    accepted = PERMISSIONS[kind]
+    if claims is None or claims.grants_any(accepted):
+        return None
+    return accepted
+
+
+def grants_scope(access_token, scope):
+    """True unless the token is readable and lacks one of the requested scopes"""
+    claims = token_claims(access_token)
+    return claims is None or all(name in claims.permissions for name in scope_names(scope))
+
+
+def expires_at(access_token):
+    """exp claim (epoch seconds), or None when the token cannot be read"""
+    claims = token_claims(access_token)
+    return claims.expires if claims and claims.expires else None
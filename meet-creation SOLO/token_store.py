@@ -0,0 +1,99 @@
+"""
+Per-user token store
+
+Keeps one record per signed-in user in SQLite, in the same shape as
+teams_tokens.json ({'tokens', 'user_info', 'created_at'}), so many users can
+be onboarded and refreshed independently. teams_tokens.json remains the
+single-user file the scripts read by default.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from settings import TOKEN_STORE_DB
+
+TOKEN_STORE_PATH = TOKEN_STORE_DB
+
+
+class TokenStore:
+    """SQLite token records keyed by Graph user id; safe to share across threads"""
+
+    def __init__(self, path=TOKEN_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS user_tokens (
+                user_id TEXT PRIMARY KEY,
+                email TEXT COLLATE NOCASE,
+                display_name TEXT,
+                tokens TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS user_tokens_email ON user_tokens (email);
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def save(self, user_info, tokens):
+        """Insert or replace a user's tokens; user_info has id, displayName, email"""
+        now = datetime.utcnow().isoformat()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT INTO user_tokens (user_id, email, display_name, tokens, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    email = excluded.email,
+                    display_name = excluded.display_name,
+                    tokens = excluded.tokens,
+                    updated_at = excluded.updated_at
+            """, (user_info['id'], user_info.get('email'), user_info.get('displayName'),
+                  json.dumps(tokens), now, now))
+
+    def update_tokens(self, user_id, tokens):
+        """Replace a user's tokens after a refresh"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE user_tokens SET tokens = ?, updated_at = ? WHERE user_id = ?",
+                              (json.dumps(tokens), datetime.utcnow().isoformat(), user_id))
+
+    def _record(self, row):
+        if row is None:
+            return None
+        return {
+            'tokens': json.loads(row['tokens']),
+            'user_info': {'id': row['user_id'], 'displayName': row['display_name'], 'email': row['email']},
+            'created_at': row['created_at']
+        }
+
+    def get(self, user_id):
+        """Record for a user in teams_tokens.json shape, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM user_tokens WHERE user_id = ?", (user_id,)).fetchone()
+        return self._record(row)
+
+    def find_by_email(self, email):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM user_tokens WHERE email = ?", (email,)).fetchone()
+        return self._record(row)
+
+    def users(self):
+        """[(user_id, display_name, email)] for every stored user"""
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(
+                "SELECT user_id, display_name, email FROM user_tokens ORDER BY display_name")]
+
+    def delete(self, user_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM user_tokens WHERE user_id = ?", (user_id,))
@@ -0,0 +1,313 @@
+"""
+Memory-mapped transcript archive
+
+Each transcript is stored as three files under transcripts/archive/<meeting-key>/:
+  <transcript-key>.txt  - cue text in start-time order, one cue per line (UTF-8)
+  <transcript-key>.idx  - fixed-size binary index (times, byte offsets, speakers)
+  <transcript-key>.json - meeting/transcript ids and the speaker name table
+
+Readers mmap the .txt and .idx files, so time-range and speaker lookups are a
+binary search over the index and the returned text is a zero-copy memoryview.
+Cues can overlap, so the index also keeps the running maximum of end times
+(over all cues, and within each speaker's run): the first cue that can still
+be running at a time is a binary search over that non-decreasing column.
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections import Counter
+from itertools import accumulate
+from datetime import datetime
+
+from vtt import parse_vtt
+
+ARCHIVE_DIR = os.path.join('transcripts', 'archive')
+
+MAGIC = b'TXA1'
+HEADER = struct.Struct('<4sII')       # magic, cue count, speaker count
+RECORD = struct.Struct('<IIQII')      # start_ms, end_ms, text offset, text length, speaker
+RUN_ENTRY = struct.Struct('<I')       # cue number, grouped by speaker
+SPEAKER_ENTRY = struct.Struct('<II')  # first run entry, run length
+END_ENTRY = struct.Struct('<I')       # latest end_ms up to this cue (or run entry)
+
+
+def archive_key(value):
+    """Stable filesystem-safe key for a Graph id"""
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:16]
+
+
+def archive_path(meeting_id, transcript_id, archive_dir=ARCHIVE_DIR):
+    """Base path (without extension) of a transcript's archive files"""
+    return os.path.join(archive_dir, archive_key(meeting_id), archive_key(transcript_id))
+
+
+def write_archive(cues, meeting_id, transcript_id, archive_dir=ARCHIVE_DIR):
+    """Write parsed cues as an archive and return its base path"""
+    base_path = archive_path(meeting_id, transcript_id, archive_dir)
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+
+    cues = sorted(cues, key=lambda cue: cue['start_ms'])
+    speakers = sorted({cue['speaker'] for cue in cues})
+    speaker_ids = {name: i for i, name in enumerate(speakers)}
+
+    records = []
+    offset = 0
+    with open(base_path + '.txt.tmp', 'wb') as data_file:
+        for cue in cues:
+            text = cue['text'].encode('utf-8')
+            data_file.write(text + b'\n')
+            records.append((cue['start_ms'], cue['end_ms'], offset, len(text), speaker_ids[cue['speaker']]))
+            offset += len(text) + 1
+
+    # Cue numbers grouped by speaker; start order is kept within each group
+    runs = sorted(range(len(records)), key=lambda i: (records[i][4], i))
+    counts = Counter(record[4] for record in records)
+    speaker_table = []
+    position = 0
+    for speaker_id in range(len(speakers)):
+        speaker_table.append((position, counts[speaker_id]))
+        position += counts[speaker_id]
+    running_ends, run_ends = _running_end_columns(records, runs, speaker_table)
+
+    with open(base_path + '.idx.tmp', 'wb') as index_file:
+        index_file.write(HEADER.pack(MAGIC, len(records), len(speakers)))
+        for record in records:
+            index_file.write(RECORD.pack(*record))
+        for cue_number in runs:
+            index_file.write(RUN_ENTRY.pack(cue_number))
+        for entry in speaker_table:
+            index_file.write(SPEAKER_ENTRY.pack(*entry))
+        for end_ms in running_ends + run_ends:
+            index_file.write(END_ENTRY.pack(end_ms))
+
+    meta = {
+        'meeting_id': meeting_id,
+        'transcript_id': transcript_id,
+        'cues': len(records),
+        'speakers': speakers,
+        'archived_at': datetime.utcnow().isoformat()
+    }
+    with open(base_path + '.json.tmp', 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+
+    for extension in ('.txt', '.idx', '.json'):
+        os.replace(base_path + extension + '.tmp', base_path + extension)
+    return base_path
+
+
+def _running_end_columns(records, runs, speaker_table):
+    """Running max of end_ms in start order, and within each speaker's run"""
+    running_ends = list(accumulate((record[1] for record in records), max))
+    run_ends = []
+    for first, count in speaker_table:
+        run_ends += accumulate((records[runs[position]][1] for position in range(first, first + count)), max)
+    return running_ends, run_ends
+
+
+def archive_transcript(transcript_content, meeting_id, transcript_id, archive_dir=ARCHIVE_DIR):
+    """Parse VTT content and add it to the archive"""
+    try:
+        base_path = write_archive(parse_vtt(transcript_content), meeting_id, transcript_id, archive_dir)
+        print(f"Transcript archived to: {base_path}")
+        return base_path
+    except Exception as e:
+        print(f"Error archiving transcript: {e}")
+        return None
+
+
+def find_archives(meeting_id, archive_dir=ARCHIVE_DIR):
+    """List archive base paths for every archived transcript of a meeting"""
+    meeting_dir = os.path.join(archive_dir, archive_key(meeting_id))
+    if not os.path.isdir(meeting_dir):
+        return []
+    return sorted(os.path.join(meeting_dir, name[:-len('.idx')])
+                  for name in os.listdir(meeting_dir) if name.endswith('.idx'))
+
+
+class _SpeakerRun:
+    """Lazy sequence of one speaker's cue numbers, in start order"""
+
+    def __init__(self, archive, first, count):
+        self._archive = archive
+        self._first = first
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._archive.run_entry(self._first + i)
+
+
+class _StartColumn:
+    """Read-only sequence of cue start times, usable with bisect"""
+
+    def __init__(self, archive, run=None):
+        self._archive = archive
+        self._run = run
+
+    def __len__(self):
+        return len(self._run) if self._run is not None else len(self._archive)
+
+    def __getitem__(self, i):
+        cue_number = self._run[i] if self._run is not None else i
+        return self._archive.start_ms(cue_number)
+
+
+class _EndColumn:
+    """Read-only sequence of running end times, usable with bisect"""
+
+    def __init__(self, view, first, count):
+        self._view = view
+        self._first = first
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return END_ENTRY.unpack_from(self._view, (self._first + i) * END_ENTRY.size)[0]
+
+
+class TranscriptArchive:
+    """mmap-backed reader for one archived transcript"""
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        with open(base_path + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.meeting_id = meta['meeting_id']
+        self.transcript_id = meta['transcript_id']
+        self.speakers = meta['speakers']
+        self._speaker_ids = {name: i for i, name in enumerate(self.speakers)}
+
+        self._files = []
+        self._maps = []
+        self._index = self._map(base_path + '.idx')
+        self._data = self._map(base_path + '.txt')
+
+        magic, self._count, speaker_count = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a transcript archive index: {base_path}.idx")
+        self._runs_offset = HEADER.size + self._count * RECORD.size
+        self._speakers_offset = self._runs_offset + self._count * RUN_ENTRY.size
+        self._starts = _StartColumn(self)
+
+        ends_offset = self._speakers_offset + speaker_count * SPEAKER_ENTRY.size
+        self._ends = self._index[ends_offset:ends_offset + 2 * self._count * END_ENTRY.size]
+        self._running_ends = _EndColumn(self._ends, 0, self._count)
+
+    def _map(self, path):
+        f = open(path, 'rb')
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b'')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the mappings; text slices handed out must be released first"""
+        self._ends.release()
+        self._index.release()
+        self._data.release()
+        for mapped in self._maps:
+            mapped.close()
+        for f in self._files:
+            f.close()
+
+    def _record(self, cue_number):
+        return RECORD.unpack_from(self._index, HEADER.size + cue_number * RECORD.size)
+
+    def start_ms(self, cue_number):
+        """Start time of a cue, read straight from the index"""
+        return struct.unpack_from('<I', self._index, HEADER.size + cue_number * RECORD.size)[0]
+
+    def cue(self, cue_number):
+        """Cue dict whose text is a zero-copy memoryview into the archive"""
+        start_ms, end_ms, offset, length, speaker_id = self._record(cue_number)
+        return {
+            'index': cue_number,
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'speaker': self.speakers[speaker_id],
+            'text': self._data[offset:offset + length]
+        }
+
+    def run_entry(self, position):
+        """Cue number at a position of the speaker-grouped run table"""
+        return RUN_ENTRY.unpack_from(self._index, self._runs_offset + position * RUN_ENTRY.size)[0]
+
+    def _speaker_run(self, speaker):
+        speaker_id = self._speaker_ids.get(speaker)
+        if speaker_id is None:
+            return _SpeakerRun(self, 0, 0), _EndColumn(self._ends, self._count, 0)
+        first, count = SPEAKER_ENTRY.unpack_from(self._index, self._speakers_offset + speaker_id * SPEAKER_ENTRY.size)
+        return _SpeakerRun(self, first, count), _EndColumn(self._ends, self._count + first, count)
+
+    @staticmethod
+    def _bounds(starts, running_ends, start_ms, end_ms):
+        # First cue whose running end is past start_ms (nothing earlier can still be
+        # running) through the last cue starting before end_ms
+        first = bisect.bisect_right(running_ends, start_ms)
+        last = bisect.bisect_left(starts, end_ms)
+        return first, max(first, last)
+
+    def cue_range(self, start_ms, end_ms):
+        """Half-open range of cue numbers holding every cue overlapping [start_ms, end_ms)
+
+        Short cues inside the range can end before start_ms when an earlier,
+        longer cue is still running; query() leaves those out.
+        """
+        return self._bounds(self._starts, self._running_ends, start_ms, end_ms)
+
+    def query(self, start_ms=0, end_ms=2 ** 32 - 1, speaker=None):
+        """Cues overlapping [start_ms, end_ms), optionally for one speaker"""
+        if speaker is None:
+            first, last = self.cue_range(start_ms, end_ms)
+            cue_numbers = range(first, last)
+        else:
+            run, running_ends = self._speaker_run(speaker)
+            first, last = self._bounds(_StartColumn(self, run), running_ends, start_ms, end_ms)
+            cue_numbers = (run[j] for j in range(first, last))
+        return [self.cue(i) for i in cue_numbers if self._record(i)[1] > start_ms]
+
+    def text(self, start_ms, end_ms):
+        """Zero-copy slice of all cue text overlapping [start_ms, end_ms)
+
+        The slice is contiguous, so it also holds any short cue that lies
+        between overlapping ones (see cue_range).
+        """
+        first, last = self.cue_range(start_ms, end_ms)
+        if first >= last:
+            return self._data[0:0]
+        begin = self._record(first)[2]
+        _, _, offset, length, _ = self._record(last - 1)
+        return self._data[begin:offset + length]
+
+
+def query_meeting(meeting_id, start_ms=0, end_ms=2 ** 32 - 1, speaker=None, archive_dir=ARCHIVE_DIR):
+    """Cues from every archived transcript of a meeting, with text copied out as str"""
+    results = []
+    for base_path in find_archives(meeting_id, archive_dir):
+        with TranscriptArchive(base_path) as archive:
+            for cue in archive.query(start_ms, end_ms, speaker):
+                text = cue['text']
+                cue['text'] = str(text, 'utf-8')
+                text.release()
+                cue['transcript_id'] = archive.transcript_id
+                results.append(cue)
+    return results
@@ -0,0 +1,143 @@
+"""
+Downloading and storing transcript content
+
+Shared by the interactive puller, the app-only sync and the job queue
+workers: download one transcript's VTT content, then save it (compressed
+store or plain file), record it in the manifest, archive and index it.
+
+Content is requested with gzip/deflate transfer encoding and kept as the
+raw decompressed bytes: they are hashed, compressed into the store or
+written to the .vtt file as they came, with no charset detection. Only the
+archive and index, which parse cues, get a decoded copy. transfer_stats
+counts bytes on the wire against content bytes for the run summaries.
+"""
+
+import os
+import threading
+from datetime import datetime
+
+import graph_client
+from graph_client import graph_url, require_permission, transcript_content_path
+from http_resilience import http_request
+from manifest import record_entry
+from transcript_archive import archive_transcript
+from transcript_index import index_transcript
+from settings import TRANSCRIPT_STORAGE
+from transcript_store import content_hash, store_transcript
+
+
+# Bytes read per iteration of a streamed content download
+READ_SIZE = 64 * 1024
+
+
+class TransferStats:
+    """Wire bytes against content bytes over a run (shared by downloader threads)"""
+
+    def __init__(self):
+        self.transcripts = 0
+        self.wire_bytes = 0
+        self.content_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, wire_bytes, content_bytes):
+        with self._lock:
+            self.transcripts += 1
+            self.wire_bytes += wire_bytes
+            self.content_bytes += content_bytes
+
+    def summary(self):
+        if not self.transcripts:
+            return None
+        ratio = self.content_bytes / self.wire_bytes if self.wire_bytes else 1.0
+        saved = self.content_bytes - self.wire_bytes
+        return (f"{self.transcripts} transcript(s): {self.wire_bytes:,} bytes transferred for "
+                f"{self.content_bytes:,} bytes of content ({ratio:.1f}x compression, {saved:,} bytes saved)")
+
+
+transfer_stats = TransferStats()
+
+
+def _wire_bytes(response):
+    """Bytes read off the connection, before decompression"""
+    downloaded = getattr(response, 'num_bytes_downloaded', None)  # httpx (HTTP/2 session)
+    if downloaded is not None:
+        return downloaded
+    return response.raw.tell()
+
+
+def download_transcript_content(access_token, meeting_id, transcript_id, user_id=None):
+    """Download the transcript's VTT content (user_id: the organizer, for app-only tokens)
+
+    The content is returned as the bytearray it was read into, not copied to bytes;
+    everything downstream (hashing, compression, file writes, decode) takes it as is.
+    """
+    url = graph_url(transcript_content_path(meeting_id, transcript_id, user_id)) + "?$format=text/vtt"
+    require_permission(access_token, 'transcripts', url)
+    
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Accept': 'text/vtt',
+        'Accept-Encoding': 'gzip, deflate'
+    }
+    
+    with http_request('GET', url, session=graph_client.session, headers=headers, stream=True) as response:
+        if response.status_code != 200:
+            print(f"Failed to download transcript content (Status: {response.status_code})")
+            return None
+        content = bytearray()
+        for data in response.iter_content(READ_SIZE):
+            content += data
+        transfer_stats.add(_wire_bytes(response), len(content))
+    return content
+
+
+def save_transcript_to_file(transcript_content, meeting_id, transcript_id):
+    """Save transcript content (bytes) to a file"""
+    if TRANSCRIPT_STORAGE == 'compressed':
+        try:
+            filename, digest, written = store_transcript(transcript_content)
+            if written:
+                print(f"Transcript stored at: {filename} ({written} bytes compressed)")
+            else:
+                print(f"Transcript content already stored at: {filename}")
+            return filename
+        except Exception as e:
+            print(f"Error saving transcript: {e}")
+            return None
+    
+    if not os.path.exists('transcripts'):
+        os.makedirs('transcripts')
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"transcripts/transcript_{meeting_id[:8]}_{transcript_id[:8]}_{timestamp}.vtt"
+    
+    try:
+        with open(filename, 'wb') as f:
+            f.write(transcript_content)
+        print(f"Transcript saved to: {filename}")
+        return filename
+    except Exception as e:
+        print(f"Error saving transcript: {e}")
+        return None
+
+
+def store_downloaded_transcript(content, meeting_id, transcript_id, created_time, post_processor=None):
+    """Save, record, archive and index downloaded content, converting it if a post_processor is given
+
+    content is the downloaded bytes (or bytearray). Returns the file.
+    """
+    filename = save_transcript_to_file(content, meeting_id, transcript_id)
+    if not filename:
+        print("  ❌ Failed to save transcript")
+        return None
+    
+    print(f"  ✅ Successfully saved to {filename}")
+    # VTT is UTF-8; the archive and index parse cues out of text
+    text = content.decode('utf-8', errors='replace')
+    archive_transcript(text, meeting_id, transcript_id)
+    # Raises on a database error; the manifest entry below is then not written, so it is retried
+    index_transcript(text, meeting_id, transcript_id)
+    record_entry(meeting_id, transcript_id, file=filename, sha256=content_hash(content), created=created_time)
+    if post_processor is not None:
+        post_processor.submit(meeting_id, transcript_id, filename)
+    return filename
@@ -0,0 +1,257 @@
+"""
+Full-text inverted index over downloaded transcripts
+
+Terms map to postings of (transcript, cue, start time). Each transcript adds
+one row per term it contains - the term's occurrence count and its (cue,
+start) hits as a varint-encoded, delta-compressed blob - so indexing a
+transcript writes only its own rows however large the index grows. A query
+reads the rows of its terms (one range of the (term, doc) primary key each).
+Queries are ranked with BM25 and return the time offset of every match.
+
+The database is in WAL mode with a busy timeout, so job workers can index in
+parallel; a write that still fails is raised for the job queue to retry.
+"""
+
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from datetime import datetime
+
+from vtt import format_timestamp, parse_vtt
+
+INDEX_PATH = os.path.join('transcripts', 'search_index.db')
+
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Seconds a writer waits for another process's transaction
+BUSY_TIMEOUT = 30
+
+
+def tokenize(text):
+    """Lower-cased word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def encode_varint(value, out):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data):
+    """Yield every unsigned varint in a bytes-like object"""
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+def encode_hits(hits, out):
+    """Append a hit count, then (cue, start) deltas"""
+    encode_varint(len(hits), out)
+    previous_cue = 0
+    previous_start = 0
+    for cue_number, start_ms in hits:
+        encode_varint(cue_number - previous_cue, out)
+        encode_varint(max(start_ms - previous_start, 0), out)
+        previous_cue = cue_number
+        previous_start = start_ms
+
+
+def decode_hits(data):
+    """[(cue, start_ms), ...] from a blob written by encode_hits"""
+    values = decode_varints(data)
+    hits = []
+    cue_number = 0
+    start_ms = 0
+    for _ in range(next(values, 0)):
+        cue_number += next(values)
+        start_ms += next(values)
+        hits.append((cue_number, start_ms))
+    return hits
+
+
+class TranscriptIndex:
+    """SQLite-backed inverted index with compressed postings"""
+
+    def __init__(self, path=INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                meeting_id TEXT NOT NULL,
+                transcript_id TEXT NOT NULL,
+                cue_count INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                indexed_at TEXT NOT NULL,
+                UNIQUE (meeting_id, transcript_id)
+            );
+            CREATE TABLE IF NOT EXISTS term_postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                term_freq INTEGER NOT NULL,
+                hits BLOB NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def is_indexed(self, meeting_id, transcript_id):
+        row = self.conn.execute(
+            "SELECT 1 FROM documents WHERE meeting_id = ? AND transcript_id = ?",
+            (meeting_id, transcript_id)).fetchone()
+        return row is not None
+
+    def add_transcript(self, meeting_id, transcript_id, cues):
+        """Index parsed cues; transcripts already in the index are skipped"""
+        if self.is_indexed(meeting_id, transcript_id):
+            return False
+
+        term_hits = {}
+        term_freqs = Counter()
+        token_count = 0
+        for cue_number, cue in enumerate(sorted(cues, key=lambda c: c['start_ms'])):
+            tokens = tokenize(cue['text'])
+            token_count += len(tokens)
+            term_freqs.update(tokens)
+            for term in tokens:
+                hits = term_hits.setdefault(term, [])
+                if not hits or hits[-1][0] != cue_number:
+                    hits.append((cue_number, cue['start_ms']))
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO documents (meeting_id, transcript_id, cue_count, token_count, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (meeting_id, transcript_id, len(cues), token_count, datetime.utcnow().isoformat()))
+            doc_id = cursor.lastrowid
+
+            rows = []
+            for term, hits in term_hits.items():
+                blob = bytearray()
+                encode_hits(hits, blob)
+                rows.append((term, doc_id, term_freqs[term], bytes(blob)))
+            self.conn.executemany(
+                "INSERT INTO term_postings (term, doc_id, term_freq, hits) VALUES (?, ?, ?, ?)", rows)
+        return True
+
+    def search(self, query, limit=10):
+        """Rank transcripts for a query; each hit lists the matching cue offsets"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        doc_count, total_tokens = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(token_count), 0) FROM documents").fetchone()
+        if doc_count == 0:
+            return []
+        average_length = total_tokens / doc_count or 1
+
+        term_postings = []
+        for term in terms:
+            postings = [(doc_id, term_freq, decode_hits(hits)) for doc_id, term_freq, hits in self.conn.execute(
+                "SELECT doc_id, term_freq, hits FROM term_postings WHERE term = ?", (term,))]
+            if postings:
+                doc_freq = len(postings)
+                idf = math.log(1 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+                term_postings.append((term, idf, postings))
+
+        documents = {}
+        doc_ids = list({doc_id for _, _, postings in term_postings for doc_id, _, _ in postings})
+        for i in range(0, len(doc_ids), 500):
+            chunk = doc_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                    f"SELECT doc_id, meeting_id, transcript_id, token_count FROM documents "
+                    f"WHERE doc_id IN ({placeholders})", chunk):
+                documents[row[0]] = row[1:]
+
+        scores = {}
+        matches = {}
+        for term, idf, postings in term_postings:
+            for doc_id, term_freq, hits in postings:
+                norm = K1 * (1 - B + B * documents[doc_id][2] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * term_freq * (K1 + 1) / (term_freq + norm)
+                matches.setdefault(doc_id, []).extend(
+                    {'term': term, 'cue': cue_number, 'start_ms': start_ms} for cue_number, start_ms in hits)
+
+        results = []
+        for doc_id, score in scores.items():
+            meeting_id, transcript_id, _ = documents[doc_id]
+            results.append({
+                'meeting_id': meeting_id,
+                'transcript_id': transcript_id,
+                'score': round(score, 4),
+                'matches': sorted(matches[doc_id], key=lambda match: match['start_ms'])
+            })
+
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results[:limit]
+
+
+def index_transcript(transcript_content, meeting_id, transcript_id, index_path=INDEX_PATH):
+    """Parse VTT content and add it to the search index
+
+    Database errors (still locked after BUSY_TIMEOUT, disk full) are raised so
+    the download is retried; it is not recorded in the manifest until indexed.
+    """
+    try:
+        with TranscriptIndex(index_path) as index:
+            if index.add_transcript(meeting_id, transcript_id, parse_vtt(transcript_content)):
+                print(f"Transcript indexed in: {index_path}")
+            return True
+    except sqlite3.Error:
+        raise
+    except Exception as e:
+        print(f"Error indexing transcript: {e}")
+        return False
+
+
+def main():
+    query = input("Search transcripts for: ").strip()
+    if not query:
+        print("A search query is required!")
+        return
+
+    with TranscriptIndex() as index:
+        results = index.search(query)
+
+    if not results:
+        print("No matching transcripts found.")
+        return
+
+    for i, result in enumerate(results, 1):
+        print(f"\n{i}. Meeting: {result['meeting_id'][:30]}... (score {result['score']})")
+        print(f"   Transcript: {result['transcript_id'][:30]}...")
+        for match in result['matches'][:10]:
+            print(f"   {format_timestamp(match['start_ms'])}  {match['term']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compressed, content-addressed transcript storage
+
+Transcripts are stored once per distinct content under
+transcripts/objects/<first two hex chars>/<sha256>.vtt.zst (or .vtt.gz when
+the zstandard package is not installed). Re-downloading identical content
+resolves to the existing object and writes nothing. The meeting/transcript ->
+object mapping lives in the transcript manifest.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OBJECTS_DIR = os.path.join('transcripts', 'objects')
+
+COMPRESSED_EXTENSIONS = ('.zst', '.gz')
+
+
+def content_hash(transcript_content):
+    """SHA-256 hex digest of transcript content"""
+    if isinstance(transcript_content, str):
+        transcript_content = transcript_content.encode('utf-8')
+    return hashlib.sha256(transcript_content).hexdigest()
+
+
+def object_path(digest, extension, objects_dir=OBJECTS_DIR):
+    return os.path.join(objects_dir, digest[:2], digest + '.vtt' + extension)
+
+
+def find_object(digest, objects_dir=OBJECTS_DIR):
+    """Path of a stored object in any compression, or None"""
+    for extension in COMPRESSED_EXTENSIONS:
+        path = object_path(digest, extension, objects_dir)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def compress(data):
+    """Compress bytes with zstd when available, otherwise gzip; returns (extension, bytes)"""
+    if zstandard is not None:
+        return '.zst', zstandard.ZstdCompressor(level=10).compress(data)
+    return '.gz', gzip.compress(data, compresslevel=9)
+
+
+def store_transcript(transcript_content, objects_dir=OBJECTS_DIR):
+    """Store content once and return (path, digest, bytes written)"""
+    data = transcript_content.encode('utf-8') if isinstance(transcript_content, str) else transcript_content
+    digest = content_hash(data)
+
+    existing = find_object(digest, objects_dir)
+    if existing:
+        return existing, digest, 0
+
+    extension, compressed = compress(data)
+    path = object_path(digest, extension, objects_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temp file of our own: another worker may be storing the same object right now
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=digest[:16], suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path, digest, len(compressed)
+
+
+def read_transcript(path):
+    """Read transcript content from a stored object or a plain VTT file"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install zstandard to read it")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif path.endswith('.gz'):
+        data = gzip.decompress(data)
+    return data.decode('utf-8')
+
+
+def transcript_stem(path):
+    """File name without directory, compression or .vtt extension"""
+    name = os.path.basename(path)
+    for extension in COMPRESSED_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    return os.path.splitext(name)[0]
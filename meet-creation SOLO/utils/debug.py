@@ -1,76 +1,41 @@
 import requests
-import json
 import os
 from datetime import datetime, timedelta
+from itertools import islice
+import secrets
+import sys
 import time
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "https://your-webhook-url.ngrok-free.app")
-
-def get_access_token():
-    """Get fresh access token"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+from delegated_auth import refresh_access_token
+from graph_client import GraphError, iter_graph_items, iter_online_meetings, iter_transcripts
+from http_resilience import http_request
+from meeting_catalog import MeetingCatalog
+from settings import WEBHOOK_BASE_URL
 
 def check_transcript_directly(access_token, meeting_id):
     """Directly check if transcripts exist for a meeting"""
     try:
-        url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}/transcripts"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
         print(f"\n🔍 Direct transcript check for meeting {meeting_id[:20]}...")
-        print(f"   Status: {response.status_code}")
         
-        if response.status_code == 200:
-            transcripts = response.json()
-            transcript_count = len(transcripts.get('value', []))
-            print(f"   📝 Found {transcript_count} transcripts")
-            
-            if transcript_count > 0:
-                print("   🎯 TRANSCRIPTS EXIST - but notifications weren't sent!")
-                print("   This indicates a webhook/subscription issue")
-                for i, transcript in enumerate(transcripts.get('value', [])):
-                    print(f"      Transcript {i+1}: ID={transcript.get('id', 'N/A')}")
-                    print(f"                      Created: {transcript.get('createdDateTime', 'N/A')}")
-            else:
-                print("   ❌ No transcripts found - meeting may not have generated transcripts")
-            return transcripts.get('value', [])
+        transcripts = list(iter_transcripts(access_token, meeting_id))
+        print(f"   Status: 200")
+        print(f"   📝 Found {len(transcripts)} transcripts")
+        
+        if transcripts:
+            print("   🎯 TRANSCRIPTS EXIST - but notifications weren't sent!")
+            print("   This indicates a webhook/subscription issue")
+            for i, transcript in enumerate(transcripts):
+                print(f"      Transcript {i+1}: ID={transcript.id or 'N/A'}")
+                print(f"                      Created: {transcript.created or 'N/A'}")
         else:
-            print(f"   ❌ Failed: {response.json()}")
-            return []
+            print("   ❌ No transcripts found - meeting may not have generated transcripts")
+        return transcripts
+    except GraphError as e:
+        print(f"   Status: {e.status_code}")
+        print(f"   ❌ Failed: {e.payload}")
+        return []
     except Exception as e:
         print(f"   ❌ Error: {e}")
         return []
@@ -80,12 +45,18 @@ def simulate_webhook_notification(access_token, meeting_id, transcript_id=None):
     try:
         print(f"\n🧪 Testing manual webhook call...")
         
+        # The webhook server drops notifications of unregistered subscriptions: register
+        # the test one in the catalog it reads (a server on this machine) with a fresh secret
+        client_state = secrets.token_urlsafe(32)
+        with MeetingCatalog() as catalog:
+            catalog.record_subscription("test-subscription-id", "test", client_state)
+        
         # Create a test notification payload similar to what Teams would send
         test_payload = {
             "value": [
                 {
                     "subscriptionId": "test-subscription-id",
-                    "clientState": "test-client-state",
+                    "clientState": client_state,
                     "changeType": "created",
                     "resource": f"communications/onlineMeetings/{meeting_id}/transcripts",
                     "subscriptionExpirationDateTime": (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
@@ -158,41 +129,31 @@ def check_subscription_details_deep(access_token):
     try:
         print(f"\n🔬 Deep subscription analysis...")
         
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        for sub in iter_graph_items(access_token, "subscriptions"):
+            if 'transcript' in sub.get('resource', '').lower():
+                print(f"\n   📋 Subscription {sub.get('id')[:20]}...")
+                print(f"      Resource: {sub.get('resource')}")
+                print(f"      Change Type: {sub.get('changeType')}")
+                print(f"      Notification URL: {sub.get('notificationUrl')}")
+                print(f"      Client State: {sub.get('clientState')}")
+                print(f"      Expires: {sub.get('expirationDateTime')}")
+                print(f"      Creator ID: {sub.get('creatorId')}")
+                print(f"      Application ID: {sub.get('applicationId')}")
+                print(f"      Latest TLS Version: {sub.get('latestSupportedTlsVersion')}")
+                
+                # Check if subscription is about to expire
+                exp_time = datetime.fromisoformat(sub.get('expirationDateTime', '').replace('Z', '+00:00'))
+                time_left = exp_time - datetime.now().replace(tzinfo=exp_time.tzinfo)
+                
+                if time_left.total_seconds() < 3600:  # Less than 1 hour
+                    print(f"      ⚠️  WARNING: Subscription expires in {time_left}")
+                else:
+                    print(f"      ✅ Time until expiry: {time_left}")
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            subscriptions = response.json()
-            
-            for sub in subscriptions.get('value', []):
-                if 'transcript' in sub.get('resource', '').lower():
-                    print(f"\n   📋 Subscription {sub.get('id')[:20]}...")
-                    print(f"      Resource: {sub.get('resource')}")
-                    print(f"      Change Type: {sub.get('changeType')}")
-                    print(f"      Notification URL: {sub.get('notificationUrl')}")
-                    print(f"      Client State: {sub.get('clientState')}")
-                    print(f"      Expires: {sub.get('expirationDateTime')}")
-                    print(f"      Creator ID: {sub.get('creatorId')}")
-                    print(f"      Application ID: {sub.get('applicationId')}")
-                    print(f"      Latest TLS Version: {sub.get('latestSupportedTlsVersion')}")
-                    
-                    # Check if subscription is about to expire
-                    exp_time = datetime.fromisoformat(sub.get('expirationDateTime', '').replace('Z', '+00:00'))
-                    time_left = exp_time - datetime.now().replace(tzinfo=exp_time.tzinfo)
-                    
-                    if time_left.total_seconds() < 3600:  # Less than 1 hour
-                        print(f"      ⚠️  WARNING: Subscription expires in {time_left}")
-                    else:
-                        print(f"      ✅ Time until expiry: {time_left}")
-            
-            return True
-        else:
-            print(f"   ❌ Failed to get subscriptions: {response.status_code}")
-            return False
+        return True
+    except GraphError as e:
+        print(f"   ❌ Failed to get subscriptions: {e.status_code}")
+        return False
     except Exception as e:
         print(f"   ❌ Error in deep analysis: {e}")
         return False
@@ -209,7 +170,7 @@ def check_tenant_transcript_policy(access_token):
             'Content-Type': 'application/json'
         }
         
-        response = requests.get(url, headers=headers)
+        response = http_request('GET', url, headers=headers)
         if response.status_code == 200:
             org_data = response.json()
             print("   ✅ Organization data accessible")
@@ -235,7 +196,7 @@ def main():
     
     # Get access token
     print("\n1. Getting access token...")
-    access_token = get_access_token()
+    access_token = refresh_access_token()
     if not access_token:
         print("❌ Cannot proceed without access token")
         return
@@ -253,39 +214,32 @@ def main():
     # Get recent meetings and check for transcripts
     print(f"\n🔍 Checking recent meetings for transcripts...")
     try:
-        url = "https://graph.microsoft.com/v1.0/me/onlineMeetings"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        # Only the first 5 meetings are needed, so stop paging once we have them
+        recent_meetings = list(islice(iter_online_meetings(access_token), 5))
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            meetings = response.json()
-            recent_meetings = meetings.get('value', [])[:5]  # Check last 5 meetings
+        print(f"   Found {len(recent_meetings)} recent meetings")
+        
+        for i, meeting in enumerate(recent_meetings):
+            meeting_id = meeting.id
+            subject = meeting.subject or 'No subject'
+            created = meeting.created or 'Unknown'
             
-            print(f"   Found {len(recent_meetings)} recent meetings")
+            print(f"\n   📅 Meeting {i+1}: {subject}")
+            print(f"      ID: {meeting_id[:30]}...")
+            print(f"      Created: {created}")
+            allow_transcription = meeting.allow_transcription
+            print(f"      Transcription Allowed: {'Not set' if allow_transcription is None else allow_transcription}")
             
-            for i, meeting in enumerate(recent_meetings):
-                meeting_id = meeting.get('id')
-                subject = meeting.get('subject', 'No subject')
-                created = meeting.get('creationDateTime', 'Unknown')
-                
-                print(f"\n   📅 Meeting {i+1}: {subject}")
-                print(f"      ID: {meeting_id[:30]}...")
-                print(f"      Created: {created}")
-                print(f"      Transcription Allowed: {meeting.get('allowTranscription', 'Not set')}")
-                
-                # Check for transcripts
-                transcripts = check_transcript_directly(access_token, meeting_id)
-                
-                # If transcripts exist, test manual webhook
-                if transcripts:
-                    transcript_id = transcripts[0].get('id')
-                    # simulate_webhook_notification(access_token, meeting_id, transcript_id)
-        else:
-            print(f"   ❌ Failed to get meetings: {response.status_code}")
+            # Check for transcripts
+            transcripts = check_transcript_directly(access_token, meeting_id)
+            
+            # If transcripts exist, test manual webhook
+            if transcripts:
+                transcript_id = transcripts[0].id
+                # simulate_webhook_notification(access_token, meeting_id, transcript_id)
     
+    except GraphError as e:
+        print(f"   ❌ Failed to get meetings: {e.status_code}")
     except Exception as e:
         print(f"   ❌ Error checking meetings: {e}")
     
@@ -1,88 +1,50 @@
-import requests
-import json
 import os
 from datetime import datetime
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-
-def get_access_token():
-    """Get fresh access token"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+from delegated_auth import refresh_access_token
+from graph_client import GraphError, get_online_meeting, iter_graph_items, iter_transcripts
+from http_resilience import http_request
+from meeting_catalog import MeetingCatalog
+from subscriptions import meeting_id_from_resource
 
 def get_fresh_meeting_id_from_subscriptions(access_token):
     """Find the meeting ID from our fresh subscription"""
     try:
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        subscriptions = list(iter_graph_items(access_token, "subscriptions"))
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            subscriptions = response.json()
+        print(f"📋 Found {len(subscriptions)} total subscriptions")
+        
+        for sub in subscriptions:
+            client_state = sub.get('clientState', '') or ''  # Handle None
+            resource = sub.get('resource', '') or ''  # Handle None
             
-            print(f"📋 Found {len(subscriptions.get('value', []))} total subscriptions")
+            print(f"   Subscription: {sub.get('id')}")
+            print(f"      Client State: {client_state}")
+            print(f"      Resource: {resource[:80]}...")
             
-            for sub in subscriptions.get('value', []):
-                client_state = sub.get('clientState', '') or ''  # Handle None
-                resource = sub.get('resource', '') or ''  # Handle None
-                
-                print(f"   Subscription: {sub.get('id')}")
-                print(f"      Client State: {client_state}")
-                print(f"      Resource: {resource[:80]}...")
-                
-                # Look for our fresh meeting subscription
-                if 'fresh-meeting' in client_state and '/onlineMeetings/' in resource:
-                    meeting_id = resource.split('/onlineMeetings/')[1].split('/transcripts')[0]
-                    print(f"🎯 Found fresh meeting ID: {meeting_id[:30]}...")
-                    print(f"   Subscription ID: {sub.get('id')}")
-                    print(f"   Client State: {client_state}")
-                    return meeting_id
-                
-                # Also check for any transcript subscriptions and extract meeting IDs
-                if '/onlineMeetings/' in resource and '/transcripts' in resource:
-                    meeting_id = resource.split('/onlineMeetings/')[1].split('/transcripts')[0]
-                    print(f"   📝 Contains meeting ID: {meeting_id[:30]}...")
-                    # Return the most recent one if we don't find a fresh-meeting one
-                    if not any('fresh-meeting' in s.get('clientState', '') or '' for s in subscriptions.get('value', [])):
-                        return meeting_id
+            # Look for our fresh meeting subscription
+            meeting_id = meeting_id_from_resource(resource)
+            if 'fresh-meeting' in client_state and meeting_id:
+                print(f"🎯 Found fresh meeting ID: {meeting_id[:30]}...")
+                print(f"   Subscription ID: {sub.get('id')}")
+                print(f"   Client State: {client_state}")
+                return meeting_id
             
-            print("❌ No fresh meeting subscription found, will check latest meeting")
-            return None
-        else:
-            print(f"❌ Failed to get subscriptions: {response.status_code}")
-            return None
+            # Also check for any transcript subscriptions and extract meeting IDs
+            if meeting_id:
+                print(f"   📝 Contains meeting ID: {meeting_id[:30]}...")
+                # Return the most recent one if we don't find a fresh-meeting one
+                if not any('fresh-meeting' in s.get('clientState', '') or '' for s in subscriptions):
+                    return meeting_id
+        
+        print("❌ No fresh meeting subscription found, will check latest meeting")
+        return None
+    except GraphError as e:
+        print(f"❌ Failed to get subscriptions: {e.status_code}")
+        return None
     except Exception as e:
         print(f"❌ Error finding fresh meeting: {e}")
         return None
@@ -90,32 +52,28 @@ def get_fresh_meeting_id_from_subscriptions(access_token):
 def get_latest_meeting_id(access_token):
     """Get the most recent meeting ID as fallback"""
     try:
-        # Try to get meetings from subscriptions first
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        # Meetings created by this SDK are in the local catalog
+        with MeetingCatalog() as catalog:
+            latest = catalog.latest(1)
+        if latest:
+            latest_meeting_id = latest[0]['meeting_id']
+            print(f"🎯 Using latest catalog meeting ID: {latest_meeting_id[:30]}...")
+            return latest_meeting_id
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            subscriptions = response.json()
-            
-            # Get all meeting IDs from transcript subscriptions
-            meeting_ids = []
-            for sub in subscriptions.get('value', []):
-                resource = sub.get('resource', '') or ''
-                if '/onlineMeetings/' in resource and '/transcripts' in resource:
-                    meeting_id = resource.split('/onlineMeetings/')[1].split('/transcripts')[0]
-                    created_time = sub.get('expirationDateTime', '')
-                    meeting_ids.append((meeting_id, created_time))
-            
-            if meeting_ids:
-                # Sort by creation time and get the most recent
-                meeting_ids.sort(key=lambda x: x[1], reverse=True)
-                latest_meeting_id = meeting_ids[0][0]
-                print(f"🎯 Using latest meeting ID: {latest_meeting_id[:30]}...")
-                return latest_meeting_id
+        # Otherwise get all meeting IDs from transcript subscriptions
+        meeting_ids = []
+        for sub in iter_graph_items(access_token, "subscriptions"):
+            meeting_id = meeting_id_from_resource(sub.get('resource'))
+            if meeting_id:
+                created_time = sub.get('expirationDateTime', '')
+                meeting_ids.append((meeting_id, created_time))
+        
+        if meeting_ids:
+            # Sort by creation time and get the most recent
+            meeting_ids.sort(key=lambda x: x[1], reverse=True)
+            latest_meeting_id = meeting_ids[0][0]
+            print(f"🎯 Using latest meeting ID: {latest_meeting_id[:30]}...")
+            return latest_meeting_id
         
         print("❌ Could not find any meeting IDs")
         return None
@@ -126,35 +84,20 @@ def get_latest_meeting_id(access_token):
 def check_meeting_details(access_token, meeting_id):
     """Get detailed meeting information"""
     try:
-        url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
+        meeting = get_online_meeting(access_token, meeting_id)
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            meeting = response.json()
-            
-            print(f"\n📅 MEETING DETAILS:")
-            print(f"   Subject: {meeting.get('subject')}")
-            print(f"   Start Time: {meeting.get('startDateTime')}")
-            print(f"   End Time: {meeting.get('endDateTime')}")
-            print(f"   Join URL: {meeting.get('joinWebUrl', 'N/A')[:60]}...")
-            # print(f"   Allow Transcription: {meeting.get('allowTranscription')}")
-            # print(f"   Allow Recording: {meeting.get('allowRecording')}")
-            # print(f"   Record Automatically: {meeting.get('recordAutomatically')}")
-            
-            # Check if meeting has participants info
-            # participants = meeting.get('participants', {})
-            # if participants:
-            #     print(f"   Participants Info: {json.dumps(participants, indent=4)}")
-            
-            return meeting
-        else:
-            print(f"❌ Failed to get meeting details: {response.status_code}")
-            print(f"   Error: {response.json()}")
-            return None
+        print(f"\n📅 MEETING DETAILS:")
+        print(f"   Subject: {meeting.subject}")
+        print(f"   Start Time: {meeting.start}")
+        print(f"   End Time: {meeting.end}")
+        print(f"   Join URL: {(meeting.join_url or 'N/A')[:60]}...")
+        # print(f"   Allow Transcription: {meeting.allow_transcription}")
+        
+        return meeting
+    except GraphError as e:
+        print(f"❌ Failed to get meeting details: {e.status_code}")
+        print(f"   Error: {e.payload}")
+        return None
     except Exception as e:
         print(f"❌ Error getting meeting details: {e}")
         return None
@@ -162,55 +105,47 @@ def check_meeting_details(access_token, meeting_id):
 def check_meeting_transcripts(access_token, meeting_id):
     """Check for transcripts and get their details"""
     try:
-        url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}/transcripts"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
         print(f"\n📝 TRANSCRIPT CHECK:")
-        print(f"   Status Code: {response.status_code}")
+        try:
+            transcript_list = list(iter_transcripts(access_token, meeting_id))
+        except GraphError as e:
+            print(f"   Status Code: {e.status_code}")
+            print(f"   ❌ Failed to get transcripts: {e.status_code}")
+            print(f"   Error: {e.payload}")
+            return []
         
-        if response.status_code == 200:
-            transcripts = response.json()
-            transcript_list = transcripts.get('value', [])
-            
-            print(f"   📊 Found {len(transcript_list)} transcripts")
-            
-            if len(transcript_list) == 0:
-                print("   ❌ No transcripts found - this explains why no notifications were sent!")
-                print("   💡 Possible reasons:")
-                print("      - Meeting didn't have enough speech (need 30+ seconds)")
-                print("      - Meeting wasn't properly ended")
-                print("      - Transcription service didn't process the audio")
-                print("      - Meeting is too recent (transcripts can take 5-15 minutes)")
-                return []
-            
-            # Process each transcript
-            for i, transcript in enumerate(transcript_list):
-                print(f"\n   📄 Transcript {i+1}:")
-                print(f"      ID: {transcript.get('id')}")
-                print(f"      Created: {transcript.get('createdDateTime')}")
-                print(f"      Meeting ID: {transcript.get('meetingId')}")
-                
-                # Try to get the actual transcript content
-                content_url = transcript.get('transcriptContentUrl')
-                if content_url:
-                    print(f"      Content URL: {content_url[:80]}...")
-                    content = get_transcript_content(access_token, meeting_id, transcript.get('id'))
-                    if content:
-                        print(f"      📋 CONTENT PREVIEW:")
-                        preview = content[:300] + "..." if len(content) > 300 else content
-                        print(f"         {preview}")
-                else:
-                    print(f"      ❌ No content URL available")
-            
-            return transcript_list
-        else:
-            print(f"   ❌ Failed to get transcripts: {response.status_code}")
-            print(f"   Error: {response.json()}")
+        print(f"   Status Code: 200")
+        print(f"   📊 Found {len(transcript_list)} transcripts")
+        
+        if len(transcript_list) == 0:
+            print("   ❌ No transcripts found - this explains why no notifications were sent!")
+            print("   💡 Possible reasons:")
+            print("      - Meeting didn't have enough speech (need 30+ seconds)")
+            print("      - Meeting wasn't properly ended")
+            print("      - Transcription service didn't process the audio")
+            print("      - Meeting is too recent (transcripts can take 5-15 minutes)")
             return []
+        
+        # Process each transcript
+        for i, transcript in enumerate(transcript_list):
+            print(f"\n   📄 Transcript {i+1}:")
+            print(f"      ID: {transcript.id}")
+            print(f"      Created: {transcript.created}")
+            print(f"      Meeting ID: {transcript.meeting_id}")
+            
+            # Try to get the actual transcript content
+            content_url = transcript.content_url
+            if content_url:
+                print(f"      Content URL: {content_url[:80]}...")
+                content = get_transcript_content(access_token, meeting_id, transcript.id)
+                if content:
+                    print(f"      📋 CONTENT PREVIEW:")
+                    preview = content[:300] + "..." if len(content) > 300 else content
+                    print(f"         {preview}")
+            else:
+                print(f"      ❌ No content URL available")
+        
+        return transcript_list
     except Exception as e:
         print(f"   ❌ Error checking transcripts: {e}")
         return []
@@ -224,7 +159,7 @@ def get_transcript_content(access_token, meeting_id, transcript_id):
             'Accept': 'text/vtt'  # WebVTT format
         }
         
-        response = requests.get(url, headers=headers)
+        response = http_request('GET', url, headers=headers)
         if response.status_code == 200:
             return response.text
         else:
@@ -238,35 +173,25 @@ def check_subscription_status(access_token):
     """Check the status of our fresh subscriptions"""
     try:
         # breakpoint()
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            subscriptions = response.json()
+        print(f"\n🔔 SUBSCRIPTION STATUS:")
+        for sub in iter_graph_items(access_token, "subscriptions"):
+            client_state = sub.get('clientState', '')
+            # if 'fresh-meeting' in client_state or 'global-transcript' in client_state:
+            print(f"   📋 {client_state}:")
+            print(f"      ID: {sub.get('id')}")
+            print(f"      Resource: {sub.get('resource')}")
+            # print(f"      Webhook: {sub.get('notificationUrl')}")
+            # print(f"      Expires: {sub.get('expirationDateTime')}")
             
-            print(f"\n🔔 SUBSCRIPTION STATUS:")
-            for sub in subscriptions.get('value', []):
-                client_state = sub.get('clientState', '')
-                # if 'fresh-meeting' in client_state or 'global-transcript' in client_state:
-                print(f"   📋 {client_state}:")
-                print(f"      ID: {sub.get('id')}")
-                print(f"      Resource: {sub.get('resource')}")
-                # print(f"      Webhook: {sub.get('notificationUrl')}")
-                # print(f"      Expires: {sub.get('expirationDateTime')}")
-                
-                # Check time until expiry
-                exp_time = datetime.fromisoformat(sub.get('expirationDateTime', '').replace('Z', '+00:00'))
-                time_left = exp_time - datetime.now().replace(tzinfo=exp_time.tzinfo)
-                print(f"      Time left: {time_left}\n\n")
-            
-            return True
-        else:
-            print(f"❌ Failed to get subscription status: {response.status_code}")
-            return False
+            # Check time until expiry
+            exp_time = datetime.fromisoformat(sub.get('expirationDateTime', '').replace('Z', '+00:00'))
+            time_left = exp_time - datetime.now().replace(tzinfo=exp_time.tzinfo)
+            print(f"      Time left: {time_left}\n\n")
+        
+        return True
+    except GraphError as e:
+        print(f"❌ Failed to get subscription status: {e.status_code}")
+        return False
     except Exception as e:
         print(f"❌ Error checking subscription status: {e}")
         return False
@@ -275,7 +200,7 @@ def main():
     print("🔍 CHECKING FRESH MEETING AND TRANSCRIPTS")
     print("=" * 60)
     
-    access_token = get_access_token()
+    access_token = refresh_access_token()
     if not access_token:
         return
     
@@ -1,135 +1,131 @@
-import requests
-import json
 import os
 from datetime import datetime, timedelta
+import sys
 import time
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "https://your-webhook-url.ngrok-free.app")
-
-def get_access_token():
-    """Get fresh access token"""
-    try:
-        with open('teams_tokens.json', 'r') as f:
-            data = json.load(f)
-        
-        tokens = data['tokens']
-        
-        token_url = "https://login.microsoftonline.com/common/oauth2/v2.0/token"
-        token_data = {
-            'client_id': CLIENT_ID,
-            'client_secret': CLIENT_SECRET,
-            'scope': 'https://graph.microsoft.com/OnlineMeetings.ReadWrite https://graph.microsoft.com/OnlineMeetingTranscript.Read.All offline_access',
-            'refresh_token': tokens['refresh_token'],
-            'grant_type': 'refresh_token'
-        }
-        
-        response = requests.post(token_url, data=token_data)
-        new_tokens = response.json()
-        
-        if 'access_token' in new_tokens:
-            return new_tokens['access_token']
-        else:
-            print("Failed to refresh token:", new_tokens)
-            return None
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+from delegated_auth import refresh_access_token
+from graph_client import GraphError, get_online_meeting, graph_get, iter_transcripts
+from meeting_catalog import MeetingCatalog
+from settings import WEBHOOK_BASE_URL
+from subscriptions import list_transcript_subscriptions, meeting_id_from_resource, migrate_meeting_subscriptions
 
 def check_all_recent_meetings_for_transcripts(access_token):
     """Check all recent meetings for new transcripts"""
     try:
-        url = "https://graph.microsoft.com/v1.0/subscriptions"
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json'
-        }
-        
         print("🔍 CHECKING ALL RECENT MEETINGS FOR NEW TRANSCRIPTS")
         print("=" * 65)
         
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            subscriptions = response.json()
+        # Meetings still waiting on transcripts come from the local catalog
+        with MeetingCatalog() as catalog:
+            rows = catalog.meetings_to_watch(datetime.utcnow() - timedelta(days=7))
+        meeting_ids = {row['meeting_id'] for row in rows}
+        for meeting_id in meeting_ids:
+            print(f"📋 Found catalog meeting: {meeting_id[:30]}...")
+        
+        # Older meetings are only known through their per-meeting subscriptions
+        _, per_meeting = list_transcript_subscriptions(access_token)
+        for sub in per_meeting:
+            meeting_id = meeting_id_from_resource(sub['resource'])
+            if meeting_id not in meeting_ids:
+                meeting_ids.add(meeting_id)
+                print(f"📋 Found meeting subscription: {meeting_id[:30]}...")
+        
+        print(f"\n🎯 Checking {len(meeting_ids)} meetings for transcripts...")
+        
+        for i, meeting_id in enumerate(meeting_ids):
+            print(f"\n📅 Meeting {i+1}: {meeting_id[:30]}...")
             
-            meeting_ids = set()
-            for sub in subscriptions.get('value', []):
-                resource = sub.get('resource', '') or ''
-                if '/onlineMeetings/' in resource and '/transcripts' in resource:
-                    meeting_id = resource.split('/onlineMeetings/')[1].split('/transcripts')[0]
-                    meeting_ids.add(meeting_id)
-                    print(f"📋 Found meeting subscription: {meeting_id[:30]}...")
+            # Get meeting details
+            try:
+                meeting = get_online_meeting(access_token, meeting_id)
+            except GraphError as e:
+                print(f"   ❌ Failed to get meeting: {e.status_code}")
+                continue
             
-            print(f"\n🎯 Checking {len(meeting_ids)} meetings for transcripts...")
+            print(f"   Subject: {meeting.subject or 'No Subject'}")
+            print(f"   Start Time: {meeting.start or 'Unknown'}")
             
-            for i, meeting_id in enumerate(meeting_ids):
-                print(f"\n📅 Meeting {i+1}: {meeting_id[:30]}...")
-                
-                # Get meeting details
-                meeting_url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}"
-                meeting_response = requests.get(meeting_url, headers=headers)
+            # Check for transcripts
+            try:
+                transcripts = list(iter_transcripts(access_token, meeting_id))
+            except GraphError as e:
+                print(f"   ❌ Failed to get transcripts: {e.status_code}")
+                continue
+            
+            print(f"   📝 Transcripts: {len(transcripts)}")
+            
+            for j, transcript in enumerate(transcripts):
+                created_time = transcript.created or 'Unknown'
+                print(f"      Transcript {j+1}: Created {created_time}")
                 
-                if meeting_response.status_code == 200:
-                    meeting = meeting_response.json()
-                    subject = meeting.get('subject', 'No Subject')
-                    start_time = meeting.get('startDateTime', 'Unknown')
-                    print(f"   Subject: {subject}")
-                    print(f"   Start Time: {start_time}")
-                    
-                    # Check for transcripts
-                    transcript_url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{meeting_id}/transcripts"
-                    transcript_response = requests.get(transcript_url, headers=headers)
+                # Check if this is very recent (last 30 minutes)
+                try:
+                    created_dt = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
+                    now = datetime.now(created_dt.tzinfo)
+                    age = now - created_dt
                     
-                    if transcript_response.status_code == 200:
-                        transcripts = transcript_response.json()
-                        transcript_count = len(transcripts.get('value', []))
-                        print(f"   📝 Transcripts: {transcript_count}")
-                        
-                        if transcript_count > 0:
-                            for j, transcript in enumerate(transcripts.get('value', [])):
-                                created_time = transcript.get('createdDateTime', 'Unknown')
-                                print(f"      Transcript {j+1}: Created {created_time}")
-                                
-                                # Check if this is very recent (last 30 minutes)
-                                try:
-                                    created_dt = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
-                                    now = datetime.now(created_dt.tzinfo)
-                                    age = now - created_dt
-                                    
-                                    if age.total_seconds() < 1800:  # Less than 30 minutes
-                                        print(f"         🚨 RECENT TRANSCRIPT! Age: {age}")
-                                        print(f"         🔔 This should have triggered a notification!")
-                                except:
-                                    pass
-                    else:
-                        print(f"   ❌ Failed to get transcripts: {transcript_response.status_code}")
-                else:
-                    print(f"   ❌ Failed to get meeting: {meeting_response.status_code}")
-            
-            return True
-        else:
-            print(f"❌ Failed to get subscriptions: {response.status_code}")
-            return False
+                    if age.total_seconds() < 1800:  # Less than 30 minutes
+                        print(f"         🚨 RECENT TRANSCRIPT! Age: {age}")
+                        print(f"         🔔 This should have triggered a notification!")
+                except:
+                    pass
+        
+        return True
+    except GraphError as e:
+        print(f"❌ Failed to get subscriptions: {e.status_code}")
+        return False
     except Exception as e:
         print(f"❌ Error checking meetings: {e}")
         return False
 
+def review_subscription_layout(access_token):
+    """Report consolidated vs per-meeting subscriptions and offer to migrate"""
+    try:
+        consolidated, per_meeting = list_transcript_subscriptions(access_token)
+        print("\n🔍 SUBSCRIPTION LAYOUT")
+        print("=" * 65)
+        print(f"   Consolidated (getAllTranscripts): {len(consolidated)}")
+        for sub in consolidated:
+            print(f"      {sub.get('resource')} expires {sub.get('expirationDateTime')}")
+        print(f"   Per-meeting: {len(per_meeting)}")
+        
+        if not per_meeting:
+            return True
+        
+        answer = input("\nMigrate per-meeting subscriptions into one user subscription? (y/N): ").strip().lower()
+        if answer != 'y':
+            return True
+        
+        user_id = graph_get(access_token, "me", select=('id',))['id']
+        result = migrate_meeting_subscriptions(
+            access_token, user_id,
+            notification_url=f"{WEBHOOK_BASE_URL}/teams/webhook",
+            lifecycle_url=f"{WEBHOOK_BASE_URL}/teams/lifecycle"
+        )
+        print(f"✅ Subscription {result['subscription'].get('id')} now covers all meetings")
+        print(f"   Migrated: {len(result['migrated'])}, failed: {len(result['failed'])}")
+        return True
+    except GraphError as e:
+        print(f"❌ Failed to review subscriptions: {e.status_code}")
+        print(f"   Error: {e.payload}")
+        return False
+
 def main():
     print("🔍 FINAL COMPREHENSIVE DIAGNOSIS")
     print("=" * 60)
     
-    access_token = get_access_token()
+    access_token = refresh_access_token()
     if not access_token:
         return
     
     # Check all recent meetings
     check_all_recent_meetings_for_transcripts(access_token)
     
+    # One user-level subscription instead of one per meeting
+    review_subscription_layout(access_token)
+    
     # Test webhook one more time
     # test_webhook_with_realistic_payload(access_token)
     
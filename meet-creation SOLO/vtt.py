@@ -0,0 +1,58 @@
+import re
+
+# Teams transcripts put the speaker in a voice span: <v Jane Doe>Hello</v>
+VOICE_PATTERN = re.compile(r'<v(?:\.[^ >]*)?\s+([^>]*)>')
+TAG_PATTERN = re.compile(r'</?[^>]+>')
+
+
+def parse_timestamp(value):
+    """Convert a WebVTT timestamp (HH:MM:SS.mmm or MM:SS.mmm) to milliseconds"""
+    parts = value.strip().split(':')
+    seconds, _, millis = parts[-1].partition('.')
+    total = int(seconds) * 1000 + int(millis.ljust(3, '0')[:3] or 0)
+    if len(parts) >= 2:
+        total += int(parts[-2]) * 60 * 1000
+    if len(parts) == 3:
+        total += int(parts[0]) * 3600 * 1000
+    return total
+
+
+def format_timestamp(millis, separator='.'):
+    """Convert milliseconds to HH:MM:SS.mmm (use separator=',' for SRT)"""
+    hours, rest = divmod(int(millis), 3600 * 1000)
+    minutes, rest = divmod(rest, 60 * 1000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+
+def parse_vtt(content):
+    """Parse WebVTT transcript content into a list of cues
+
+    Each cue is a dict with start_ms, end_ms, speaker and text keys.
+    """
+    cues = []
+    for block in re.split(r'\r?\n\s*\r?\n', content):
+        lines = [line.strip() for line in block.strip().splitlines()]
+        timing_index = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing_index is None:
+            continue
+
+        start, _, end = lines[timing_index].partition('-->')
+        try:
+            start_ms = parse_timestamp(start)
+            end_ms = parse_timestamp(end.split()[0])
+        except (ValueError, IndexError):
+            continue
+
+        raw_text = ' '.join(line for line in lines[timing_index + 1:] if line)
+        voice = VOICE_PATTERN.search(raw_text)
+        speaker = voice.group(1).strip() if voice else ''
+        text = TAG_PATTERN.sub('', raw_text).strip()
+
+        cues.append({
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'speaker': speaker,
+            'text': text
+        })
+    return cues
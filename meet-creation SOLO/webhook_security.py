@@ -0,0 +1,199 @@
+"""
+Checks that webhook notifications really come from Microsoft Graph
+
+Two checks run on every POST to the webhook server:
+
+- clientState: each subscription is created with a random secret, recorded
+  in the catalog's subscription registry (subscriptions.py). A notification
+  whose clientState does not match the registry's value for its
+  subscriptionId - or that names a subscription we never created - is dropped.
+- validationTokens: rich notifications (and those with encrypted content)
+  carry JWTs signed by the Microsoft identity platform. Each token's RS256
+  signature is checked against the platform's published signing keys, and
+  its audience (our CLIENT_ID), issuer, lifetime and azp (the Graph change
+  notification app) are checked too.
+
+The signing keys are fetched once and cached for KEYS_TTL seconds (or the
+max-age the key endpoint sends). A token signed with a key we have not seen
+- the platform rotated its keys - refetches them, at most once every
+KEY_REFRESH_MIN seconds. A verified token is remembered until it expires,
+so a batch of notifications repeating the same token is checked once.
+Verification therefore costs an RSA public-key operation at most, never a
+network call per notification.
+
+Tests and offline runs pass their own keys: SigningKeys(keys={kid: (n, e)})
+or SigningKeys(fetch=callable returning a JWKS dict).
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import threading
+import time
+
+from http_resilience import http_request
+from settings import CLIENT_ID
+
+JWKS_URL = os.getenv("WEBHOOK_JWKS_URL", "https://login.microsoftonline.com/common/discovery/v2.0/keys")
+# Seconds the signing keys are trusted without refetching, and minimum gap between refetches
+KEYS_TTL = int(os.getenv("WEBHOOK_KEYS_TTL", "86400"))
+KEY_REFRESH_MIN = 300
+# Seconds of clock difference allowed on exp/nbf
+CLOCK_SKEW = 300
+
+# App id Microsoft Graph signs change notification tokens as (the azp claim)
+GRAPH_NOTIFICATION_APP_ID = "0bf30f3b-4a52-48df-9a82-234910c4a086"
+ISSUER_PREFIXES = ("https://sts.windows.net/", "https://login.microsoftonline.com/")
+
+# ASN.1 DigestInfo prefix of a SHA-256 hash in an RSASSA-PKCS1-v1_5 signature
+_SHA256_PREFIX = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+class NotificationVerificationError(Exception):
+    """A notification's validation token or clientState did not check out"""
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def _b64int(value):
+    return int.from_bytes(_b64decode(value), 'big')
+
+
+class SigningKeys:
+    """RSA public keys by kid, fetched once and refreshed when stale or rotated"""
+
+    def __init__(self, url=JWKS_URL, fetch=None, ttl=KEYS_TTL, keys=None):
+        self.url = url
+        self.ttl = ttl
+        self._fetch = fetch or self._fetch_jwks
+        self._keys = dict(keys) if keys else {}
+        # Keys passed in are never refetched
+        self._fetched_at = float('inf') if keys else 0.0
+        self._max_age = ttl
+        self._lock = threading.Lock()
+
+    def _fetch_jwks(self):
+        response = http_request('GET', self.url, endpoint='login')
+        response.raise_for_status()
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        if match:
+            self._max_age = min(int(match.group(1)), self.ttl)
+        return response.json()
+
+    def refresh(self):
+        """Fetch the key set now (the webhook server does this at startup)"""
+        jwks = self._fetch()
+        keys = {}
+        for key in jwks.get('keys', []):
+            if key.get('kty') == 'RSA' and key.get('kid') and key.get('n') and key.get('e'):
+                keys[key['kid']] = (_b64int(key['n']), _b64int(key['e']))
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def get(self, kid):
+        """(n, e) of the key, refetching the set when it is stale or kid is new; None if unknown"""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if age >= self._max_age or (kid not in self._keys and age >= KEY_REFRESH_MIN):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the old keys while the endpoint is unreachable
+                    print(f"Could not refresh webhook signing keys: {e}")
+                    self._fetched_at = time.monotonic() - self._max_age + KEY_REFRESH_MIN
+            return self._keys.get(kid)
+
+
+_default_keys = None
+# validation token -> claims of tokens that passed every check
+_verified = {}
+_verified_lock = threading.Lock()
+
+
+def signing_keys():
+    """The process-wide SigningKeys, created on first use"""
+    global _default_keys
+    if _default_keys is None:
+        _default_keys = SigningKeys()
+    return _default_keys
+
+
+def _rsa_sha256_verify(message, signature, n, e):
+    key_length = (n.bit_length() + 7) // 8
+    if len(signature) != key_length:
+        return False
+    decoded = pow(int.from_bytes(signature, 'big'), e, n).to_bytes(key_length, 'big')
+    digest_info = _SHA256_PREFIX + hashlib.sha256(message).digest()
+    expected = b'\x00\x01' + b'\xff' * (key_length - len(digest_info) - 3) + b'\x00' + digest_info
+    return hmac.compare_digest(decoded, expected)
+
+
+def verify_validation_token(token, keys=None, audience=None):
+    """Check one validationTokens JWT; returns its claims or raises NotificationVerificationError"""
+    now = time.time()
+    with _verified_lock:
+        cached = _verified.get(token)
+    if cached is not None and cached.get('exp', 0) + CLOCK_SKEW > now:
+        return cached
+
+    try:
+        header_part, payload_part, signature_part = token.split('.')
+        header = json.loads(_b64decode(header_part))
+        claims = json.loads(_b64decode(payload_part))
+        signature = _b64decode(signature_part)
+    except (AttributeError, ValueError):
+        raise NotificationVerificationError("Validation token is not a JWT")
+
+    if header.get('alg') != 'RS256':
+        raise NotificationVerificationError(f"Unexpected signing algorithm {header.get('alg')}")
+    key = (keys or signing_keys()).get(header.get('kid'))
+    if key is None:
+        raise NotificationVerificationError(f"Unknown signing key {header.get('kid')}")
+    if not _rsa_sha256_verify(f"{header_part}.{payload_part}".encode('ascii'), signature, *key):
+        raise NotificationVerificationError("Validation token signature does not verify")
+
+    exp = claims.get('exp', 0)
+    if exp + CLOCK_SKEW < now or claims.get('nbf', 0) - CLOCK_SKEW > now:
+        raise NotificationVerificationError("Validation token is expired or not yet valid")
+    if claims.get('aud') != (audience or CLIENT_ID):
+        raise NotificationVerificationError(f"Validation token is for another app ({claims.get('aud')})")
+    if not str(claims.get('iss', '')).startswith(ISSUER_PREFIXES):
+        raise NotificationVerificationError(f"Unexpected issuer {claims.get('iss')}")
+    if claims.get('azp') != GRAPH_NOTIFICATION_APP_ID:
+        raise NotificationVerificationError("Validation token was not issued to Microsoft Graph")
+
+    with _verified_lock:
+        # Drop expired entries now and then so the cache stays small
+        if len(_verified) > 256:
+            for expired in [cached for cached, cached_claims in _verified.items()
+                            if cached_claims.get('exp', 0) + CLOCK_SKEW < now]:
+                del _verified[expired]
+        _verified[token] = claims
+    return claims
+
+
+def verify_notifications(notification_data, catalog, keys=None, audience=None):
+    """The notifications whose clientState matches the registry
+
+    Raises NotificationVerificationError when a validation token in the
+    payload fails, so the whole POST can be refused. Notifications with an
+    unknown subscription or a wrong clientState are left out and reported.
+    """
+    for token in notification_data.get('validationTokens') or []:
+        verify_validation_token(token, keys, audience)
+
+    accepted = []
+    for notification in notification_data.get('value', []):
+        subscription_id = notification.get('subscriptionId')
+        expected = catalog.subscription_client_state(subscription_id) if subscription_id else None
+        received = notification.get('clientState') or ''
+        if expected is None or not hmac.compare_digest(received.encode(), expected.encode()):
+            print(f"Dropped notification with unrecognized clientState for subscription {subscription_id}")
+            continue
+        accepted.append(notification)
+    return accepted
@@ -3,8 +3,8 @@ Example of the 3-step flow using the abstracted functions
 Based on your original scripts
 """
 
-from teams_auth import generate_pkce, get_auth_url, exchange_code_for_tokens
-from teams_api import create_teams_meeting, extract_meeting_details
+from team_auth import generate_pkce, get_auth_url, exchange_code_for_tokens
+from team_api import create_teams_meeting, extract_meeting_details
 
 # Step 1: Generate auth URL (like your first script)
 def step1_get_auth_url():
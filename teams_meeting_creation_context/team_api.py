@@ -1,5 +1,26 @@
+import urllib.parse
+from dataclasses import dataclass
+
 import requests
 
+# Properties extract_meeting_details needs; sent as $select on meeting GETs
+MEETING_DETAILS_SELECT = ('subject', 'startDateTime', 'endDateTime', 'joinWebUrl', 'joinMeetingIdSettings')
+
+# Join URL / Join Meeting ID -> Graph meeting id; these never change, so lookups are kept per process
+_resolved_meeting_ids = {}
+
+
+@dataclass
+class MeetingDetails:
+    __slots__ = ('join_url', 'meeting_id', 'passcode', 'subject', 'start_time', 'end_time')
+
+    join_url: str
+    meeting_id: str
+    passcode: str
+    subject: str
+    start_time: str
+    end_time: str
+
 def create_teams_meeting(access_token, subject="Test Meeting", start_time="2025-08-20T10:00:00.0000000Z", end_time="2025-08-20T11:00:00.0000000Z"):
     """Create Teams meeting using access token"""
     url = "https://graph.microsoft.com/v1.0/me/onlineMeetings"
@@ -18,16 +39,74 @@ def create_teams_meeting(access_token, subject="Test Meeting", start_time="2025-
     response = requests.post(url, json=data, headers=headers)
     return response.status_code, response.json()
 
+def get_teams_meeting(access_token, meeting_id, select=MEETING_DETAILS_SELECT):
+    """Get a Teams meeting, asking Graph only for the selected properties"""
+    url = f"https://graph.microsoft.com/v1.0/me/onlineMeetings/{urllib.parse.quote(meeting_id, safe='')}"
+    
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    params = {'$select': ','.join(select)} if select else None
+    response = requests.get(url, headers=headers, params=params)
+    return response.status_code, response.json()
+
+def find_teams_meeting(access_token, join_url=None, join_meeting_id=None, select=('id',) + MEETING_DETAILS_SELECT):
+    """Find a Teams meeting by join URL or Join Meeting ID with one filtered query"""
+    url = "https://graph.microsoft.com/v1.0/me/onlineMeetings"
+    
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    
+    value = (join_url or join_meeting_id).replace("'", "''")
+    if join_url:
+        params = {'$filter': f"JoinWebUrl eq '{value}'"}
+    else:
+        params = {'$filter': f"joinMeetingIdSettings/joinMeetingId eq '{value}'"}
+    if select:
+        params['$select'] = ','.join(select)
+    
+    response = requests.get(url, headers=headers, params=params)
+    if response.status_code != 200:
+        return response.status_code, response.json()
+    
+    meetings = response.json().get('value', [])
+    if not meetings:
+        return 404, {'error': {'code': 'NotFound', 'message': 'No meeting matches this join URL or Join Meeting ID'}}
+    return 200, meetings[0]
+
+def resolve_teams_meeting_id(access_token, reference):
+    """Graph meeting id for a meeting id, Join Meeting ID (digits) or join URL; None if not found"""
+    reference = reference.strip()
+    if reference.lower().startswith(('https://', 'http://')):
+        lookup = {'join_url': reference}
+    elif reference.replace(' ', '').isdigit():
+        lookup = {'join_meeting_id': reference.replace(' ', '')}
+    else:
+        return reference
+    
+    key = next(iter(lookup.values()))
+    if key not in _resolved_meeting_ids:
+        status, response = find_teams_meeting(access_token, select=('id',), **lookup)
+        if status != 200:
+            return None
+        _resolved_meeting_ids[key] = response['id']
+    return _resolved_meeting_ids[key]
+
 def extract_meeting_details(meeting_response):
     """Extract useful meeting details from API response"""
     if 'joinWebUrl' not in meeting_response:
         return None
     
-    return {
-        'join_url': meeting_response['joinWebUrl'],
-        'meeting_id': meeting_response['joinMeetingIdSettings']['joinMeetingId'],
-        'passcode': meeting_response['joinMeetingIdSettings']['passcode'],
-        'subject': meeting_response['subject'],
-        'start_time': meeting_response['startDateTime'],
-        'end_time': meeting_response['endDateTime']
-    }
+    join_settings = meeting_response.get('joinMeetingIdSettings') or {}
+    return MeetingDetails(
+        join_url=meeting_response['joinWebUrl'],
+        meeting_id=join_settings.get('joinMeetingId'),
+        passcode=join_settings.get('passcode'),
+        subject=meeting_response.get('subject'),
+        start_time=meeting_response.get('startDateTime'),
+        end_time=meeting_response.get('endDateTime')
+    )